@@ -89,6 +89,10 @@ class BaseWatcher(QObject):
 # fileChanged(int, QString)  [added, deleted, modified, rename, remove]
 ###############################################################################
 
+    # False in the watchers that can't notify the changes inside the
+    # folders added with add_watch
+    watches_folders = True
+
     def __init__(self):
         super(BaseWatcher, self).__init__()
         self._single_file_watcher = None
@@ -121,4 +125,4 @@ class BaseWatcher(QObject):
 
     def _emit_signal_on_change(self, event, path):
         DEBUG("About to emit the signal" + repr(event))
-        #self.emit(SIGNAL("fileChanged(int, QString)"), event, path)
+        self.emit(SIGNAL("fileChanged(int, QString)"), event, path)
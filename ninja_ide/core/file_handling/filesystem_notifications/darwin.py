@@ -34,6 +34,8 @@ MODIFIED = base_watcher.MODIFIED
 
 class NinjaFileSystemWatcher(base_watcher.BaseWatcher):
 
+    watches_folders = False
+
     def __init__(self):
         super(NinjaFileSystemWatcher, self).__init__()
         #self.observer = fsevents.Observer()
@@ -21,7 +21,8 @@ import os
 
 from PyQt4.QtCore import QThread
 from pyinotify import ProcessEvent, IN_CREATE, IN_DELETE, IN_DELETE_SELF, \
-                        IN_MODIFY, WatchManager, Notifier, ExcludeFilter
+                        IN_MODIFY, IN_MOVED_TO, IN_MOVED_FROM, \
+                        WatchManager, Notifier, ExcludeFilter
 
 from ninja_ide.tools.logger import NinjaLogger
 logger = NinjaLogger('ninja_ide.core.file_handling.filesystem_notifications.linux')
@@ -37,7 +38,8 @@ MODIFIED = base_watcher.MODIFIED
 #from ninja_ide.core.file_handling.filesystem_notifications.base_watcher import ADDED, \
 #                                            DELETED, REMOVE, RENAME, MODIFIED
 
-mask = IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MODIFY
+mask = IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MODIFY | IN_MOVED_TO | \
+    IN_MOVED_FROM
 
 
 class NinjaProcessEvent(ProcessEvent):
@@ -5,6 +5,8 @@ from PyQt4.QtCore import SIGNAL
 
 class NinjaFileSystemWatcher(base_watcher.BaseWatcher):
 
+    watches_folders = False
+
     def __init__(self):
         self.watching_paths = {}
         super(NinjaFileSystemWatcher, self).__init__()
@@ -149,6 +149,8 @@ LAST_OPENED_FILES = []
 NOTIFICATION_POSITION = 0
 
 LAST_CLEAN_LOCATOR = None
+# The locator removes the old files of its database after the next crawl
+CLEAN_LOCATOR = False
 
 
 ###############################################################################
@@ -350,11 +352,12 @@ def should_clean_locator_knowledge():
 
 #Clean Locator Knowledge
 def clean_locator_db(qsettings):
+    """Request the locator to clean its database, keeping the symbols of
+    the files that exist and that were crawled recently."""
+    global CLEAN_LOCATOR
     last_clean = should_clean_locator_knowledge()
     if last_clean is not None:
-        file_path = os.path.join(resources.NINJA_KNOWLEDGE_PATH, 'locator.db')
-        if os.path.isfile(file_path):
-            os.remove(file_path)
+        CLEAN_LOCATOR = True
         qsettings.setValue("preferences/general/cleanLocator", last_clean)
 
 
@@ -22,15 +22,111 @@
 import re
 import ast
 import _ast
+import hashlib
+from bisect import bisect_right
 
 from ninja_ide.tools.logger import NinjaLogger
 from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.intellisensei.analyzer import parse_cache
 
 
 logger = NinjaLogger('ninja_ide.tools.completion.analyzer')
 
 MAX_THRESHOLD = 3
 
+# Lines that start a new top level statement (not indented, not a comment)
+_TOP_LEVEL = re.compile('^[A-Za-z_@]')
+_FIRST_WORD = re.compile('^[@\w]+')
+# Top level statements that are part of the previous block
+_CONTINUATION_WORDS = ('else', 'elif', 'except', 'finally')
+# Messages of the syntax errors that replacing a line can't fix
+_UNCLOSED = ('EOF', 'never closed', 'unterminated triple-quoted')
+# Key of the repaired statements in the spans, the next analysis doesn't
+# find them with the fingerprint of their text
+_REPAIRED_KEY = 'repaired:%s'
+# Statements with blocks of code that belong to the enclosing scope
+_BLOCKS = tuple([getattr(ast, name) for name in
+                 ('If', 'For', 'While', 'With', 'TryExcept', 'TryFinally',
+                  'Try') if hasattr(ast, name)])
+
+try:
+    unicode
+except NameError:
+    # Python 3
+    basestring = unicode = str  # lint:ok
+
+
+def fingerprint(text):
+    """Return a hash of the text stable between processes."""
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return hashlib.md5(text).hexdigest()
+
+
+def block_body(symbol):
+    """Return the statements inside all the blocks of a compound
+    statement (if/else, for, while, with, try/except/finally)."""
+    statements = list(symbol.body)
+    for handler in getattr(symbol, 'handlers', ()):
+        statements += handler.body
+    statements += getattr(symbol, 'orelse', [])
+    statements += getattr(symbol, 'finalbody', [])
+    return statements
+
+
+def _unclosed(error):
+    """Return True if the SyntaxError error is caused by a string or some
+    brackets not closed until the end of the source."""
+    message = str(error.msg)
+    return any([text in message for text in _UNCLOSED])
+
+
+def _parse_at(text, start):
+    """Parse text with the line numbers it has starting in the line start.
+
+    Only the text is parsed, the line numbers of the errors are the ones
+    inside text."""
+    parse_cache.get_cache().add_partial_parse()
+    tree = ast.parse(text)
+    if start:
+        ast.increment_lineno(tree, start)
+    return tree
+
+
+def _group_by_span(tree, spans):
+    """Return {index of the span: [statements]} with the top level
+    statements of the ast tree inside each span of lines."""
+    starts = [start for start, end in spans]
+    groups = {}
+    for symbol in tree.body:
+        index = bisect_right(starts, symbol.lineno - 1) - 1
+        groups.setdefault(index, []).append(symbol)
+    return groups
+
+
+def split_top_level(lines):
+    """Return the (start, end) lines of each top level statement.
+
+    Decorators are kept with the function or class they decorate and
+    else/elif/except/finally with the statement they belong to."""
+    spans = []
+    start = None
+    decorated = False
+    for index, line in enumerate(lines):
+        if _TOP_LEVEL.match(line) is None:
+            continue
+        if _FIRST_WORD.match(line).group() in _CONTINUATION_WORDS:
+            continue
+        if start is None:
+            start = 0
+        elif not decorated:
+            spans.append((start, index))
+            start = index
+        decorated = line.startswith('@')
+    if start is not None:
+        spans.append((start, len(lines)))
+    return spans
+
 
 class Analyzer(object):
 
@@ -52,51 +148,66 @@ class Analyzer(object):
     }
 
     def __init__(self):
-        self._fixed_line = -1
         self.content = None
+        # Lines referenced by the types of the statements being analyzed
+        self._lines = None
 #        self._functions = {}
 
-    def _get_valid_module(self, source, retry=0):
-        """Try to parse the module and fix some errors if it has some."""
-        astModule = None
+    def _get_valid_module(self, source):
+        """Parse the module, if it has syntax errors parse each top level
+        statement on its own to keep the ones without errors."""
         try:
-            astModule = ast.parse(source)
-            self._fixed_line = -1
-        except SyntaxError as reason:
-            line = reason.lineno - 1
-            if line != self._fixed_line and reason.text is not None:
-                self._fixed_line = line
-                new_line = ''
-                split_source = source.splitlines()
-                indent = re.match('^\s+', str(split_source[line]))
-                if indent is not None:
-                    new_line = "%s%s" % (indent.group(), 'pass')
-                split_source[line] = new_line
-                source = '\n'.join(split_source)
-                if retry < MAX_THRESHOLD:
-                    astModule = self._get_valid_module(source, retry + 1)
-        return astModule
+            return parse_cache.get_cache().parse(source)
+        except (SyntaxError, TypeError, ValueError):
+            pass
+        lines = source.split('\n')
+        spans = split_top_level(lines) or [(0, len(lines))]
+        body = []
+        for start, end in spans:
+            astModule = self._parse_span('\n'.join(lines[start:end]), start)
+            if astModule is not None:
+                body += astModule.body
+        return ast.Module(body=body)
+
+    def _parse_span(self, text, start, error=None):
+        """Parse a top level statement starting in the line start, replacing
+        with 'pass' the lines with syntax errors (up to MAX_THRESHOLD lines).
+
+        error is the one raised parsing text, if it was already parsed.
+        Return None if the statement can not be fixed."""
+        lines = text.split('\n')
+        fixed = set()
+        while True:
+            if error is None:
+                try:
+                    return _parse_at('\n'.join(lines), start)
+                except (SyntaxError, TypeError, ValueError) as reason:
+                    error = reason
+            if not isinstance(error, SyntaxError) or error.lineno is None \
+               or error.text is None or _unclosed(error):
+                return None
+            line = error.lineno - 1
+            if line < 0 or line >= len(lines) or line in fixed or \
+               len(fixed) == MAX_THRESHOLD:
+                return None
+            fixed.add(line)
+            indent = re.match('^\s+', lines[line])
+            if indent is not None:
+                lines[line] = "%s%s" % (indent.group(), 'pass')
+            else:
+                lines[line] = ''
+            error = None
 
     def analyze(self, source, old_module=None):
-        """Analyze the source provided and create the proper structure."""
-        astModule = self._get_valid_module(source)
-        if astModule is None:
-            return model.Module()
-        self.content = source.split('\n')
+        """Analyze the source provided and create the proper structure.
 
-        module = model.Module()
-        for symbol in astModule.body:
-            if symbol.__class__ is ast.Assign:
-                assigns = self._process_assign(symbol)[0]
-                module.add_attributes(assigns)
-            elif symbol.__class__ in (ast.Import, ast.ImportFrom):
-                module.add_imports(self._process_import(symbol))
-            elif symbol.__class__ is ast.ClassDef:
-                module.add_class(self._process_class(symbol))
-            elif symbol.__class__ is ast.FunctionDef:
-                module.add_function(self._process_function(symbol))
-#            elif symbol.__class__ is ast.Expr:
-#                self._process_expression(symbol.value)
+        If old_module was created by a previous analysis of this file, only
+        the top level statements whose text changed are parsed again, the
+        rest of the symbols are taken from old_module."""
+        self.content = source.split('\n')
+        module = self._analyze_spans(source, old_module)
+        if module is None:
+            module = self._analyze_ast(self._get_valid_module(source))
         if old_module is not None:
             self._resolve_module(module, old_module)
 
@@ -104,6 +215,144 @@ class Analyzer(object):
 #        self._functions = {}
         return module
 
+    def _analyze_ast(self, astModule):
+        """Create the module with the symbols of the whole source."""
+        module = model.Module()
+        self._lines = model.LineBuffer()
+        for symbol in astModule.body:
+            self._add_symbol_data(module, self._process_symbol(symbol))
+        self._lines.freeze()
+        self._lines = None
+        return module
+
+    def _analyze_spans(self, source, old_module=None):
+        """Analyze each top level statement on its own reusing the data
+        of the statements that didn't change since old_module.
+
+        The statements are taken from the ast shared in the parse cache if
+        source was already parsed, or it is the first analysis.
+
+        The statements with syntax errors are fixed or discarded, the
+        rest of the module is kept. Return None if the source can not be
+        analyzed this way."""
+        spans = split_top_level(self.content)
+        if not spans:
+            return None
+        old_spans = {}
+        if old_module is not None:
+            old_spans = getattr(old_module, 'spans', {})
+        cache = parse_cache.get_cache()
+        tree = None
+        if old_module is None:
+            try:
+                tree = cache.parse(source)
+            except (SyntaxError, TypeError, ValueError):
+                pass
+        else:
+            tree = cache.lookup(source)
+        groups = {}
+        if tree is not None:
+            groups = _group_by_span(tree, spans)
+        module = model.Module()
+        entries = []
+        # [(index in entries, text, error)] of the statements with errors
+        broken = []
+        for index, (start, end) in enumerate(spans):
+            text = '\n'.join(self.content[start:end]).rstrip()
+            key = fingerprint(text)
+            entry = old_spans.get(key, None)
+            if entry is not None and key not in module.spans:
+                self._move_span(entry, start)
+            elif tree is not None:
+                entry = self._process_span(groups.get(index, []), start)
+            else:
+                try:
+                    astModule = _parse_at(text, start)
+                except (SyntaxError, TypeError, ValueError) as reason:
+                    broken.append((len(entries), text, reason))
+                    entries.append([start, []])
+                    continue
+                entry = self._process_span(astModule.body, start)
+            module.spans[key] = entry
+            entries.append(entry)
+        # The fixed statements are not reused, they are parsed again until
+        # the errors are corrected, but they are in the spans sent to the
+        # processes that resolve the module
+        fixed = True
+        for index, text, error in broken:
+            start = entries[index][0]
+            astModule = self._parse_span(text, start, error)
+            if astModule is None:
+                fixed = False
+            else:
+                entries[index] = self._process_span(astModule.body, start)
+                module.spans[_REPAIRED_KEY % fingerprint(text)] = \
+                    entries[index]
+        if not fixed:
+            # A string or brackets spanning several lines can be split in
+            # statements that don't parse alone, when the whole source does
+            try:
+                astModule = cache.parse(source)
+            except (SyntaxError, TypeError, ValueError):
+                astModule = None
+            if astModule is not None:
+                return self._analyze_ast(astModule)
+        for entry in entries:
+            for symbol_data in entry[1]:
+                self._add_symbol_data(module, symbol_data)
+        return module
+
+    def _process_span(self, statements, start):
+        """Return the [start, symbols] of the parsed statements of a top
+        level span."""
+        self._lines = model.LineBuffer()
+        entry = [start, [self._process_symbol(symbol)
+                         for symbol in statements]]
+        self._lines.freeze()
+        self._lines = None
+        return entry
+
+    def _move_span(self, entry, start):
+        """Update the line numbers of a reused span to its new position."""
+        delta = start - entry[0]
+        if delta == 0:
+            return
+        entry[0] = start
+        entry[1] = [_move_symbol_data(symbol_data, delta)
+                    for symbol_data in entry[1]]
+
+    def _process_symbol(self, symbol):
+        """Return a (kind, data) tuple with the info of a top level symbol."""
+        if symbol.__class__ is ast.Assign:
+            return ('attributes', self._process_assign(symbol)[0])
+        elif symbol.__class__ in (ast.Import, ast.ImportFrom):
+            return ('imports', self._process_import(symbol))
+        elif symbol.__class__ is ast.ClassDef:
+            return ('class', self._process_class(symbol))
+        elif symbol.__class__ is ast.FunctionDef:
+            return ('function', self._process_function(symbol))
+        elif symbol.__class__ in _BLOCKS:
+            # The names defined inside belong to the module
+            return ('block', [self._process_symbol(sym)
+                              for sym in block_body(symbol)])
+#        elif symbol.__class__ is ast.Expr:
+#            self._process_expression(symbol.value)
+        return (None, None)
+
+    def _add_symbol_data(self, module, symbol_data):
+        kind, data = symbol_data
+        if kind == 'attributes':
+            module.add_attributes(data)
+        elif kind == 'imports':
+            module.add_imports(data)
+        elif kind == 'class':
+            module.add_class(data)
+        elif kind == 'function':
+            module.add_function(data)
+        elif kind == 'block':
+            for item in data:
+                self._add_symbol_data(module, item)
+
     def _resolve_module(self, module, old_module):
         module.update_classes(old_module.classes)
         module.update_functions(old_module.functions)
@@ -166,13 +415,14 @@ class Analyzer(object):
                 if type_value is None:
                     continue
             data_type = self.__mapping.get(type_value, model.late_resolution)
+            line = self._lines.add(line_content)
             if var.__class__ == ast.Attribute:
-                data = (var.attr, symbol.lineno, data_type, line_content,
-                    type_value)
+                data = (var.attr, symbol.lineno, data_type, line,
+                    type_value, self._lines)
                 attributes.append(data)
             elif var.__class__ == ast.Name:
-                data = (var.id, symbol.lineno, data_type, line_content,
-                    type_value)
+                data = (var.id, symbol.lineno, data_type, line,
+                    type_value, self._lines)
                 assigns.append(data)
 #            if type_value is ast.Call:
 #                self._process_expression(symbol.value)
@@ -198,7 +448,7 @@ class Analyzer(object):
         for base in symbol.bases:
             if base == 'object':
                 continue
-            name = expand_attribute(base)
+            name = model.expand_attribute(base)
             clazz.add_parent(name)
         #TODO: Decotator
 #        for decorator in symbol.decorator_list:
@@ -250,17 +500,7 @@ class Analyzer(object):
             assign.add_data(symbol.lineno, data_type[0], None, data_type[1])
             function.args[assign.name] = assign
         for sym in symbol.body:
-            if sym.__class__ is ast.Assign:
-                result = self._process_assign(sym)
-                function.add_attributes(result[0])
-                if parent is not None:
-                    parent.add_attributes(result[1])
-            elif sym.__class__ is ast.FunctionDef:
-                function.add_function(self._process_function(sym))
-
-            if sym.__class__ is not ast.Assign:
-                self._search_recursive_for_types(function, sym, parent)
-
+            self._search_recursive_for_types(function, sym, parent)
         return function
 
     def _parse_tuple_in_func_arg(self, symbol_tuple, function, lineno=0):
@@ -272,7 +512,8 @@ class Analyzer(object):
             function.args[assign.name] = assign
 
     def _search_recursive_for_types(self, function, symbol, parent=None):
-        """Search for return recursively inside the function."""
+        """Search for assignments, returns and nested functions recursively
+        inside the function."""
         if symbol.__class__ is ast.Assign:
             result = self._process_assign(symbol)
             function.add_attributes(result[0])
@@ -282,24 +523,52 @@ class Analyzer(object):
             type_value = symbol.value.__class__
             lineno = symbol.lineno
             data_type = self.__mapping.get(type_value, None)
-            line_content = self.content[lineno - 1]
+            line = self._lines.add(self.content[lineno - 1])
             if data_type != model.late_resolution:
                 type_value = None
-            function.add_return(lineno, data_type, line_content, type_value)
-        elif symbol.__class__ in (ast.If, ast.For, ast.TryExcept):
-            for sym in symbol.body:
-                self._search_recursive_for_types(function, sym, parent)
-            for else_item in symbol.orelse:
-                self._search_recursive_for_types(function, else_item, parent)
-        elif symbol.__class__ is ast.TryFinally:
-            for sym in symbol.body:
+            function.add_return(lineno, data_type, line, type_value,
+                                self._lines)
+        elif symbol.__class__ is ast.FunctionDef:
+            function.add_function(self._process_function(symbol))
+        elif symbol.__class__ in _BLOCKS:
+            for sym in block_body(symbol):
                 self._search_recursive_for_types(function, sym, parent)
-            for else_item in symbol.finalbody:
-                self._search_recursive_for_types(function, else_item, parent)
 #        elif symbol.__class__ is ast.Expr:
 #            self._process_expression(symbol.value)
 
 
+def _move_symbol_data(symbol_data, delta):
+    """Return the (kind, data) of a symbol moved delta lines."""
+    kind, data = symbol_data
+    if kind == 'attributes':
+        data = [(d[0], d[1] + delta) + tuple(d[2:]) for d in data]
+    elif kind in ('class', 'function'):
+        _shift_lines(data, delta)
+    elif kind == 'block':
+        data = [_move_symbol_data(item, delta) for item in data]
+    return (kind, data)
+
+
+def _shift_lines(structure, delta):
+    """Move the line numbers of the data owned by structure."""
+    for assign in structure.attributes.values():
+        if assign.parent is structure:
+            _shift_type_data(assign.data, delta)
+    for function in structure.functions.values():
+        if function.parent is structure and \
+           function.__class__ is model.Function:
+            for arg in function.args.values():
+                _shift_type_data(arg.data, delta)
+            _shift_type_data(function.return_type, delta)
+            _shift_lines(function, delta)
+
+
+def _shift_type_data(types, delta):
+    for type_data in types:
+        if type_data.lineno is not None:
+            type_data.lineno += delta
+
+
 class CodeParser(ast.NodeVisitor):
 
     def analyze(self, astmodule):
@@ -18,10 +18,16 @@
 import os
 import time
 from threading import Thread, Lock
-from multiprocessing import Process, Queue
+from multiprocessing import Process, Queue, RawValue, cpu_count
 
 from ninja_ide.intellisensei.analyzer import model
-from ninja_ide.intellisense.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import dependency_graph
+from ninja_ide.intellisensei.analyzer import inference
+from ninja_ide.intellisensei.analyzer import module_cache
+from ninja_ide.intellisensei.analyzer import package_map
+from ninja_ide.intellisensei.analyzer import protocol
+from ninja_ide.intellisensei.completion import completer
 
 
 try:
@@ -33,6 +39,17 @@ except NameError:
 __completion_daemon_instance = None
 WAITING_BEFORE_START = 5
 PROJECTS = {}
+# Amount of processes resolving modules
+POOL_SIZE = max(1, min(4, cpu_count() - 1))
+
+# Priorities of the pending modules, lower goes first
+PRIORITY_FOCUSED = 0
+PRIORITY_EDITOR = 1
+PRIORITY_PROJECT = 2
+
+# Messages the daemon sends to itself to do the work in its own thread
+_INVALIDATE = 'invalidate'
+_RELINK = 'relink'
 
 
 def CompletionDaemon():
@@ -50,31 +67,89 @@ class __CompletionDaemon(Thread):
         self.analyzer = analyzer.Analyzer()
         self.modules = {}
         self.projects_modules = {}
-        self._relations = {}
+        # Modules of the projects imported by each module
+        self.graph = dependency_graph.DependencyGraph()
+        # {path_id: packages} the module asked to link with other modules
+        self._linked_packages = {}
         self.reference_counter = 0
+        self.cache = module_cache.ModuleCache()
+        self.package_map = package_map.PackageMap()
+        # Modules read from disk: {path: (mtime, size)}
+        self._disk_modules = {}
         self.keep_alive = True
         self.lock = Lock()
         self.queue_receive = Queue()
-        self.queue_send = Queue()
-        self.daemon = _DaemonProcess(self.queue_send, self.queue_receive)
-        self.daemon.start()
+        # Scheduling of the modules between the resolver processes
+        self._dispatch_lock = Lock()
+        self._focused = None
+        self._sequence = 0
+        # {path_id: [priority, sequence, kind, recursive_or_resolution]}
+        self._pending = {}
+        # {path_id: worker index} of the modules being resolved
+        self._running = {}
+        # {path_id: version} of the last version of the opened documents
+        self._versions = {}
+        # {path_id: (worker index, spans)} of the worker that has the module
+        self._owners = {}
+        self._workers = []
+        self._idle = []
+        for index in range(POOL_SIZE):
+            worker = _DaemonProcess(Queue(), self.queue_receive, index)
+            worker.start()
+            self._workers.append(worker)
+            self._idle.append(index)
 
     def run(self):
         global WAITING_BEFORE_START
-        time.sleep(WAITING_BEFORE_START)
+        # With the modules in the cache there is no need to wait for the
+        # IDE to finish loading before start crawling the projects
+        if self.cache.is_empty():
+            time.sleep(WAITING_BEFORE_START)
         while self.keep_alive:
-            path_id, module, resolve = self.queue_receive.get()
+            message = self.queue_receive.get()
+            kind, path_id = message[0], message[1]
             if path_id is None:
                 continue
+            if kind == _INVALIDATE:
+                self._invalidate(path_id)
+                continue
+            elif kind == _RELINK:
+                self._relink_dependents(path_id)
+                continue
+            self._worker_done(path_id, message[-1])
             self.lock.acquire()
-            self.modules[path_id] = module
+            module = self.modules.get(path_id, None)
+            if module is not None and kind != protocol.UNKNOWN:
+                protocol.apply_patches(module, message[2])
             self.lock.release()
+            if module is None or kind == protocol.CANCELLED:
+                # The newer version is already pending
+                continue
+            if kind == protocol.UNKNOWN:
+                # The process lost this module, send it complete again
+                self._dispatch_lock.acquire()
+                self._owners.pop(path_id, None)
+                self._dispatch_lock.release()
+                self.inspect_module(path_id, module)
+                continue
+            resolve = message[3]
+            stat = self._disk_modules.pop(path_id, None)
+            if stat is not None:
+                self.cache.put(path_id, module, stat)
             if resolve:
-                resolution = self._resolve_with_other_modules(resolve)
-                self._relations[path_id] = []
-                for package in resolution:
-                    self._relations[path_id].append(resolution[package])
-                self.queue_send.put((path_id, module, False, resolution))
+                self._linked_packages[path_id] = resolve
+                self._link_module(path_id)
+
+    def _link_module(self, path_id):
+        """Resolve the packages requested by the module with the modules
+        of the projects and send them to the process to link them."""
+        resolution = self._resolve_with_other_modules(
+            self._linked_packages.get(path_id, ()))
+        self.lock.acquire()
+        self.graph.set_dependencies(path_id, resolution.values())
+        self.lock.release()
+        if resolution:
+            self._schedule(path_id, protocol.LINK, resolution)
 
     def _resolve_with_other_modules(self, packages):
         resolution = {}
@@ -103,30 +178,81 @@ class __CompletionDaemon(Thread):
         return resolution
 
     def _analyze_file(self, filename):
+        if filename in self.modules:
+            return True
         try:
-            if filename not in self.modules:
-                source = ''
-                with open(filename) as f:
-                    source = f.read()
-                module = self.analyzer.analyze(source)
-                self.inspect_module(filename, module, False)
+            if self._load_from_cache(filename):
                 return True
+            stat = self.cache.file_stat(filename)
+            source = ''
+            with open(filename) as f:
+                source = f.read()
+            module = self.analyzer.analyze(source)
+            if module.need_resolution():
+                self._disk_modules[filename] = stat
+            else:
+                self.cache.put(filename, module, stat)
+            self.inspect_module(filename, module, False)
+            return True
         except Exception as reason:
             print(reason)
         return False
 
+    def _load_from_cache(self, filename):
+        """Load the resolved module and the modules linked to it from
+        the cache, return False if filename needs to be analyzed."""
+        cached = self.cache.get(filename)
+        if cached is None:
+            return False
+        module, links = cached
+        links = [path for path in links if os.path.isfile(path)]
+        self.lock.acquire()
+        self.modules[filename] = module
+        model.invalidate_lookups()
+        self.graph.set_dependencies(filename, links)
+        self.lock.release()
+        for path in links:
+            self._analyze_file(path)
+        return True
+
     def unload_module(self, path_id):
-        relations = self._relations.pop(path_id, None)
-        if relations is not None:
-            relations.append(path_id)
-            for module in relations:
-                valid = False
-                for rel in self._relations:
-                    other_modules = self._relations[rel]
-                    if module in other_modules:
-                        valid = True
-                if not valid:
-                    self.modules.pop(module, None)
+        """Remove the module and the modules that were only kept because
+        it imports them."""
+        self.lock.acquire()
+        released = self.graph.release(path_id)
+        for path in released:
+            self.modules.pop(path, None)
+            self._linked_packages.pop(path, None)
+            self._versions.pop(path, None)
+        model.invalidate_lookups()
+        self.lock.release()
+        for path in released:
+            self._unload_from_worker(path)
+
+    def invalidate_module(self, path_id):
+        """The file of path_id changed, analyze it again if it is not
+        opened and link again the modules that import it."""
+        self.queue_receive.put((_INVALIDATE, path_id))
+
+    def _invalidate(self, path_id):
+        if path_id not in self.graph:
+            return
+        if not self.graph.is_pinned(path_id):
+            self.lock.acquire()
+            self.modules.pop(path_id, None)
+            model.invalidate_lookups()
+            self.lock.release()
+            if os.path.isfile(path_id):
+                self._analyze_file(path_id)
+        self._relink_dependents(path_id)
+
+    def _relink_dependents(self, path_id):
+        self.lock.acquire()
+        dependents = self.graph.transitive_dependents(path_id)
+        self.lock.release()
+        for dependent in dependents:
+            if dependent in self.modules:
+                self._link_module(dependent)
 
     def process_path(self):
         for project in PROJECTS:
@@ -135,25 +261,146 @@ class __CompletionDaemon(Thread):
             project = os.path.abspath(project)
             package = os.path.basename(project)
             self.projects_modules[package] = project
-            for root, dirs, files in os.walk(project, followlinks=True):
-                if '__init__.py' in files:
-                    package = root[len(project) + 1:].replace(
-                        os.path.sep, '.')
-                    self.projects_modules[package] = root
+            self.projects_modules.update(self.package_map.crawl(project))
+
+    def inspect_module(self, path_id, module, recursive=True, version=None):
+        """Resolve the new version of a module, the modules analyzed
+        recursively are the ones opened in the editors.
 
-    def inspect_module(self, path_id, module, recursive=True):
+        version is the version of the document, a module older than the
+        last one received is ignored."""
         self.lock.acquire()
+        if version is not None:
+            if version < self._versions.get(path_id, version):
+                self.lock.release()
+                return
+            self._versions[path_id] = version
+        old_module = self.modules.get(path_id, None)
         self.modules[path_id] = module
+        model.invalidate_lookups()
+        if recursive:
+            self.graph.pin(path_id)
         self.lock.release()
-        self.queue_send.put((path_id, module, recursive, None))
+        self._schedule(path_id, protocol.UPDATE, recursive)
+        if old_module is not None and old_module is not module and \
+           _exported_names(old_module) != _exported_names(module):
+            self.queue_receive.put((_RELINK, path_id))
+
+    def set_focused_module(self, path_id):
+        """The module of the current editor is resolved before the others."""
+        self._focused = path_id
+
+    def _schedule(self, path_id, kind, data):
+        """Add the module to the pending work of the resolvers.
+
+        A newer version of the module replaces the one that was pending,
+        and resolving its linked modules is not needed anymore. The worker
+        resolving an older version is asked to cancel it."""
+        self._dispatch_lock.acquire()
+        if kind == protocol.UPDATE and path_id in self._running:
+            self._workers[self._running[path_id]].cancelled.value = 1
+        pending = self._pending.get(path_id, None)
+        if pending is not None and pending[2] == protocol.UPDATE and \
+           kind == protocol.LINK:
+            self._dispatch_lock.release()
+            return
+        priority = PRIORITY_EDITOR
+        if kind == protocol.UPDATE and not data:
+            priority = PRIORITY_PROJECT
+        if pending is not None:
+            priority = min(priority, pending[0])
+            if kind == pending[2] == protocol.UPDATE:
+                # Keep resolving it recursively if it was requested
+                data = data or pending[3]
+        self._sequence += 1
+        self._pending[path_id] = [priority, self._sequence, kind, data]
+        self._dispatch()
+        self._dispatch_lock.release()
+
+    def _worker_done(self, path_id, index):
+        self._dispatch_lock.acquire()
+        self._running.pop(path_id, None)
+        self._idle.append(index)
+        self._dispatch()
+        self._dispatch_lock.release()
+
+    def _dispatch(self):
+        """Give pending work to the idle workers, must be called with
+        the dispatch lock acquired.
+
+        Each idle worker takes the pending module with more priority,
+        preferring the modules it already has, otherwise it takes (steals)
+        the module from the worker that has it and receives it complete."""
+        for index in list(self._idle):
+            if not self._pending:
+                break
+            selected = self._select_work(index)
+            if selected is None:
+                continue
+            self._idle.remove(index)
+            self._send_to_worker(index, selected,
+                                 self._pending.pop(selected))
+
+    def _select_work(self, index):
+        selected = None
+        selected_key = None
+        for path_id in self._pending:
+            if path_id in self._running:
+                continue
+            priority, sequence, kind, data = self._pending[path_id]
+            owner = self._owners.get(path_id, (None, ()))[0]
+            if kind == protocol.LINK and owner != index:
+                # Only the worker with the module can link it
+                continue
+            if path_id == self._focused:
+                priority = PRIORITY_FOCUSED
+            key = (priority, owner != index, sequence)
+            if selected_key is None or key < selected_key:
+                selected, selected_key = path_id, key
+        return selected
+
+    def _send_to_worker(self, index, path_id, pending):
+        kind, data = pending[2], pending[3]
+        worker = self._workers[index]
+        if kind == protocol.LINK:
+            message = (protocol.LINK, path_id, data)
+        else:
+            module = self.modules.get(path_id, None)
+            if module is None:
+                self._idle.append(index)
+                return
+            owner, known_spans = self._owners.get(path_id, (None, ()))
+            if owner is not None and owner != index:
+                self._workers[owner].queue_receive.put(
+                    (protocol.UNLOAD, path_id))
+                known_spans = ()
+            message = protocol.create_update(path_id, module, known_spans,
+                                             data)
+            self._owners[path_id] = (index, set(module.spans))
+        self._running[path_id] = index
+        worker.cancelled.value = 0
+        worker.queue_receive.put(message)
+
+    def _unload_from_worker(self, path_id):
+        self._dispatch_lock.acquire()
+        self._pending.pop(path_id, None)
+        owner = self._owners.pop(path_id, None)
+        if owner is not None:
+            self._workers[owner[0]].queue_receive.put(
+                (protocol.UNLOAD, path_id))
+        self._dispatch_lock.release()
+
+    def resolvers_alive(self):
+        return all([worker.is_alive() for worker in self._workers])
 
     def get_module(self, path_id):
         return self.modules.get(path_id, None)
 
     def _shutdown_process(self):
-        self.queue_send.put((None, None, None, None))
-        self.daemon.terminate()
-        self.queue_receive.put((None, None, None))
+        for worker in self._workers:
+            worker.queue_receive.put((None, None))
+            worker.terminate()
+        self.queue_receive.put((None, None))
 
     def force_stop(self):
         self.keep_alive = False
@@ -164,37 +411,70 @@ class __CompletionDaemon(Thread):
             self.join()
 
 
+class _Cancelled(Exception):
+    """A newer version of the module being resolved arrived."""
+
+
 class _DaemonProcess(Process):
 
-    def __init__(self, queue_receive, queue_send):
+    def __init__(self, queue_receive, queue_send, index=0):
         super(_DaemonProcess, self).__init__()
         self.queue_receive = queue_receive
         self.queue_send = queue_send
+        self.index = index
+        # Set by the daemon when the current work is superseded
+        self.cancelled = RawValue('b', 0)
         self.iteration = 0
         self.packages = []
+        self.resolved_bases = {}
+        self.modules = {}
+        self.analyzer = analyzer.Analyzer()
 
     def run(self):
         while True:
             self.iteration = 0
-            path_id, module, recursive, resolution = self.queue_receive.get()
-            if path_id is None and module is None:
+            message = self.queue_receive.get()
+            kind, path_id = message[0], message[1]
+            if kind is None:
                 break
 
             try:
-                if resolution is not None:
-                    self.packages = resolution
+                if kind == protocol.UNLOAD:
+                    self.modules.pop(path_id, None)
+                    continue
+                module = self._get_module(message)
+                if module is None:
+                    self.queue_send.put((protocol.UNKNOWN, path_id,
+                                         self.index))
+                    continue
+                recursive = False
+                snapshot = protocol.take_snapshot(module)
+                if kind == protocol.LINK:
+                    self.packages = message[2]
                     self.iteration = 2
                     self._resolve_module(module)
+                    inference.infer_call_types(module)
                 elif module.need_resolution():
+                    recursive = message[-1]
                     self._resolve_module(module)
                     self.iteration = 1
                     self._resolve_module(module)
-                else:
-                    continue
+                    inference.infer_call_types(module)
+                patches = protocol.collect_patches(module, snapshot,
+                                                   self.resolved_bases)
                 if self.packages and recursive:
-                    self.queue_send.put((path_id, module, self.packages))
+                    self.queue_send.put((protocol.RESOLVED, path_id, patches,
+                                         self.packages, self.index))
                 else:
-                    self.queue_send.put((path_id, module, []))
+                    self.queue_send.put((protocol.RESOLVED, path_id, patches,
+                                         [], self.index))
+            except _Cancelled:
+                # Send what was resolved to keep the same module than
+                # the daemon, the types are checked against its lines
+                patches = protocol.collect_patches(module, snapshot,
+                                                   self.resolved_bases)
+                self.queue_send.put((protocol.CANCELLED, path_id, patches,
+                                     self.index))
             except Exception as reason:
                 # Try to not die whatever happend
                 message = 'Daemon Fail with: %r', reason
@@ -202,6 +482,21 @@ class _DaemonProcess(Process):
                 raise
             finally:
                 self.packages = []
+                self.resolved_bases = {}
+
+    def _get_module(self, message):
+        """Return the module of path_id updated with the message."""
+        kind, path_id = message[0], message[1]
+        if kind == protocol.MODULE:
+            module = message[2]
+        elif kind == protocol.UPDATE:
+            module = protocol.build_module(
+                message, self.modules.get(path_id, None), self.analyzer)
+        else:
+            return self.modules.get(path_id, None)
+        if module is not None:
+            self.modules[path_id] = module
+        return module
 
     def _resolve_module(self, module):
         self._resolve_attributes(module, module)
@@ -212,14 +507,19 @@ class _DaemonProcess(Process):
             self._resolve_attributes(clazz, module)
             self._resolve_functions(clazz, module)
 
+    def _check_cancelled(self):
+        if self.cancelled.value:
+            raise _Cancelled()
+
     def _resolve_inheritance(self, clazz, module):
         for base in clazz.bases:
+            self._check_cancelled()
             name = base.split('.', 1)
             main_attr = name[0]
             child_attrs = ''
             if len(name) == 2:
                 child_attrs = name[1]
-            result = module.get_type(main_attr, child_attrs)
+            result = module.resolve_type(main_attr, child_attrs)
             data = model.late_resolution
             if result.get('found', True):
                 data_type = module.imports[main_attr].get_data_type()
@@ -233,6 +533,7 @@ class _DaemonProcess(Process):
             elif result.get('object', False).__class__ is model.Clazz:
                 data = result['object']
             clazz.bases[base] = data
+            self.resolved_bases[(clazz.name, base)] = data
         clazz.update_with_parent_data()
 
     def _resolve_functions(self, structure, module):
@@ -257,6 +558,7 @@ class _DaemonProcess(Process):
             self._resolve_types(assign.data, module, assign)
 
     def _resolve_types(self, types, module, structure=None, split_by='='):
+        self._check_cancelled()
         if self.iteration == 0:
             self._resolve_with_imports(types, module, split_by)
             self._resolve_with_local_names(types, module, split_by)
@@ -299,7 +601,8 @@ class _DaemonProcess(Process):
                 self.packages.append(package)
 
     def _resolve_with_local_names(self, types, module, splitby):
-        #TODO: resolve with functions returns
+        # The calls to the functions are resolved later with their
+        # returns, see: inference.infer_call_types
         for data in types:
             if data.data_type != model.late_resolution:
                 continue
@@ -329,7 +632,7 @@ class _DaemonProcess(Process):
                 if structure.__class__ is model.Assign:
                     scope.pop(0)
                 scope.reverse()
-                result = module.get_type(main_attr, child_attr, scope)
+                result = module.resolve_type(main_attr, child_attr, scope)
                 data_type = model.late_resolution
                 if isinstance(result['type'], basestring) and len(result) < 3:
                     if child_attr and \
@@ -348,6 +651,12 @@ class _DaemonProcess(Process):
             self._get_scope(structure.parent, scope)
 
 
+def _exported_names(module):
+    """Return the names other modules can link with."""
+    return (set(module.classes), set(module.functions),
+            set(module.attributes))
+
+
 def shutdown_daemon():
     daemon = CompletionDaemon()
     daemon.force_stop()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from collections import deque
+
+
+class DependencyGraph(object):
+    """Links between the modules known by the completion daemon.
+
+    An edge goes from a module to each module of the projects it imports.
+    The modules opened in the editors are pinned, the other modules are
+    kept only while a module depending on them is kept."""
+
+    def __init__(self):
+        # {path: set(paths imported by path)}
+        self._dependencies = {}
+        # {path: set(paths importing path)}
+        self._dependents = {}
+        self._pinned = set()
+
+    def __contains__(self, path):
+        return path in self._dependencies or path in self._dependents or \
+            path in self._pinned
+
+    def pin(self, path):
+        self._pinned.add(path)
+
+    def is_pinned(self, path):
+        return path in self._pinned
+
+    def set_dependencies(self, path, dependencies):
+        """Replace the modules imported by path, only the edges that
+        changed are updated."""
+        dependencies = set(dependencies)
+        dependencies.discard(path)
+        old = self._dependencies.get(path, set())
+        for removed in old - dependencies:
+            self._remove_dependent(removed, path)
+        for added in dependencies - old:
+            self._dependents.setdefault(added, set()).add(path)
+        if dependencies:
+            self._dependencies[path] = dependencies
+        else:
+            self._dependencies.pop(path, None)
+
+    def dependencies(self, path):
+        """Return the modules imported by path."""
+        return set(self._dependencies.get(path, ()))
+
+    def dependents(self, path):
+        """Return the modules importing path."""
+        return set(self._dependents.get(path, ()))
+
+    def transitive_dependents(self, path):
+        """Return the modules importing path directly or through other
+        modules, the nearest ones first."""
+        return self._walk(path, self._dependents)
+
+    def transitive_dependencies(self, path):
+        """Return the modules imported by path directly or through other
+        modules, the nearest ones first."""
+        return self._walk(path, self._dependencies)
+
+    def release(self, path):
+        """Unpin path and return the set of modules that are not needed
+        anymore: path if no other module imports it and the modules that
+        were only kept for it. They are removed from the graph.
+
+        Only path and the modules it imports are visited, a module is kept
+        while it is imported from outside of them (its dependents are its
+        reference count), and so are the modules it imports. The import
+        cycles only kept by themselves are released too."""
+        self._pinned.discard(path)
+        candidates = set([path])
+        pending = deque([path])
+        while pending:
+            for node in self._dependencies.get(pending.popleft(), ()):
+                if node not in candidates and node not in self._pinned:
+                    candidates.add(node)
+                    pending.append(node)
+        kept = set([node for node in candidates
+                    if self._imported_outside(node, candidates)])
+        pending = deque(kept)
+        while pending:
+            for node in self._dependencies.get(pending.popleft(), ()):
+                if node in candidates and node not in kept:
+                    kept.add(node)
+                    pending.append(node)
+        released = candidates - kept
+        for current in released:
+            for dependent in self._dependents.pop(current, ()):
+                self._dependencies.get(dependent, set()).discard(current)
+            for dependency in self._dependencies.pop(current, ()):
+                if dependency not in released:
+                    self._remove_dependent(dependency, current)
+        return released
+
+    def _imported_outside(self, path, nodes):
+        for dependent in self._dependents.get(path, ()):
+            if dependent not in nodes:
+                return True
+        return False
+
+    def _remove_dependent(self, path, dependent):
+        dependents = self._dependents.get(path, None)
+        if dependents is not None:
+            dependents.discard(dependent)
+            if not dependents:
+                del self._dependents[path]
+
+    def _walk(self, path, edges):
+        result = []
+        visited = set([path])
+        pending = deque([path])
+        while pending:
+            for node in edges.get(pending.popleft(), ()):
+                if node not in visited:
+                    visited.add(node)
+                    result.append(node)
+                    pending.append(node)
+        return result
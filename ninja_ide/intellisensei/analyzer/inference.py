@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Infer the type of the values returned by the calls to the functions and
+classes of the module, using the return types of the functions, and the
+type of the names assigned or returned with the type of the variables.
+
+    def create():
+        item = Foo()
+        return item      # create returns Foo
+
+    item = create()      # item is Foo
+
+The return types of the functions can depend on other calls, so the module
+is traversed until nothing changes (or MAX_PASSES)."""
+
+import re
+import _ast
+
+from ninja_ide.intellisensei.analyzer import model
+
+try:
+    unicode
+except NameError:
+    # Python 3
+    basestring = unicode = str  # lint:ok
+
+
+MAX_PASSES = 4
+
+# The called name at the start of the value: "name.attr(..."
+_CALLED_NAME = re.compile('^([A-Za-z_][\w.]*)\s*\(')
+_NAME = re.compile('^([A-Za-z_]\w*)\s*$')
+
+
+def infer_call_types(module):
+    """Set the type of the calls and names resolved inside module,
+    return the amount of types inferred."""
+    inferred = 0
+    for i in range(MAX_PASSES):
+        changes = _infer_structure(module, [module])
+        if not changes:
+            break
+        inferred += changes
+    return inferred
+
+
+def _infer_structure(structure, scopes):
+    changes = 0
+    for assign in structure.attributes.values():
+        changes += _infer_types(assign.data, '=', scopes)
+    for function in structure.functions.values():
+        if function.__class__ is not model.Function:
+            continue
+        function_scopes = scopes + [function]
+        changes += _infer_types(function.return_type, 'return',
+                                function_scopes)
+        changes += _infer_structure(function, function_scopes)
+    for clazz in getattr(structure, 'classes', {}).values():
+        changes += _infer_structure(clazz, scopes + [clazz])
+    return changes
+
+
+def _infer_types(types, split_by, scopes):
+    changes = 0
+    for type_data in types:
+        if type_data.data_type != model.late_resolution or \
+           type_data.operation not in (_ast.Call, _ast.Name):
+            continue
+        value = type_data.line_content.split(split_by, 1)
+        if len(value) < 2:
+            continue
+        value = value[1].strip()
+        if type_data.operation is _ast.Call:
+            called = _CALLED_NAME.match(value)
+            data_type = called and _call_type(called.group(1), value,
+                                              scopes)
+        else:
+            name = _NAME.match(value)
+            data_type = name and _variable_type(name.group(1), scopes)
+        if data_type is not None and data_type != model.late_resolution:
+            type_data.data_type = data_type
+            changes += 1
+    return changes
+
+
+def find_callable(name, scopes):
+    """Return the Function or Clazz called with name from the innermost
+    scope of scopes (from the module to the innermost structure)."""
+    attrs = name.split('.')
+    target = None
+    if attrs[0] == 'self':
+        for structure in reversed(scopes):
+            if structure.__class__ is model.Clazz:
+                target = structure
+                break
+    else:
+        target = _find_name(attrs[0], scopes)
+    for attr in attrs[1:]:
+        if target.__class__ is not model.Clazz:
+            return None
+        value = target.functions.get(attr, None)
+        if value is None:
+            assign = target.attributes.get(attr, None)
+            value = assign and assign.get_data_type()
+        target = value
+    if target.__class__ in (model.Function, model.Clazz):
+        return target
+    return None
+
+
+def _find_name(name, scopes):
+    module = scopes[0]
+    for structure in reversed(scopes):
+        # The names of the classes are not visible from their methods
+        if structure.__class__ is model.Clazz:
+            continue
+        if name in structure.functions:
+            return structure.functions[name]
+        if structure is module and name in module.classes:
+            return module.classes[name]
+        if name in structure.attributes:
+            data_type = structure.attributes[name].get_data_type()
+            if data_type.__class__ is model.Clazz:
+                return data_type
+            return None
+    return None
+
+
+def _variable_type(name, scopes):
+    for structure in reversed(scopes):
+        if structure.__class__ is model.Clazz:
+            continue
+        if name in structure.attributes:
+            return structure.attributes[name].get_data_type()
+        if structure.__class__ is model.Function and name in structure.args:
+            return structure.args[name].get_data_type()
+    return None
+
+
+def _call_type(name, value, scopes):
+    """Return the type of the call value to name, a call to an attribute
+    of a name that is a module ("mod = get(); mod.Lock()") is left as the
+    dotted call the completion introspects ("threading.Lock()")."""
+    data_type = _returned_type(find_callable(name, scopes))
+    if data_type is None and '.' in name:
+        head = name.split('.', 1)[0]
+        variable = _variable_type(head, scopes)
+        if isinstance(variable, basestring):
+            data_type = variable + value[len(head):]
+    return data_type
+
+
+def _returned_type(target):
+    if target.__class__ is model.Clazz:
+        return target
+    elif target.__class__ is model.Function:
+        return target.get_data_type()
+    return None
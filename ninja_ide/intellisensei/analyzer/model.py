@@ -16,10 +16,34 @@
 # along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
 
 import ast
+from array import array
+try:
+    intern
+except NameError:
+    # Python 3
+    from sys import intern  # lint:ok
 
 
 MODULES = None
 late_resolution = 0
+# Changes when the modules or their types change, see: Module.get_type
+_lookups_generation = 0
+# Results cached by Module.get_type in each module before discarding them
+MAX_LOOKUPS = 512
+
+
+def intern_name(name):
+    """Share the same string for the names repeated in all the modules."""
+    if name.__class__ is str:
+        return intern(name)
+    return name
+
+
+def invalidate_lookups():
+    """Discard the results cached by Module.get_type in all the modules,
+    must be called when a module is replaced or its types change."""
+    global _lookups_generation
+    _lookups_generation += 1
 
 
 def filter_data_type(data_types):
@@ -51,22 +75,90 @@ def remove_function_arguments(line):
     return line
 
 
-class TypeData(object):
+class _Slotted(object):
+    """Pickle the objects of the classes defining __slots__."""
+
+    __slots__ = ()
+
+    def _slots(self):
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                yield name
+
+    def __getstate__(self):
+        return dict([(name, getattr(self, name)) for name in self._slots()
+                     if hasattr(self, name)])
+
+    def __setstate__(self, state):
+        for name in state:
+            setattr(self, name, state[name])
+
+
+class LineBuffer(_Slotted):
+    """Lines of the source referenced by the types of a module (or of a
+    top level statement), stored once in a single string.
+
+    The types keep the index of their line, while the module is analyzed
+    the lines are in a list, freeze() joins them."""
 
-    def __init__(self, lineno, data_type, line_content):
+    __slots__ = ('text', 'starts', '_lines', '_indexes')
+
+    def __init__(self):
+        self.text = None
+        self.starts = None
+        self._lines = []
+        self._indexes = {}
+
+    def add(self, line):
+        """Return the index of line in the buffer."""
+        index = self._indexes.get(line, None)
+        if index is None:
+            index = self._indexes[line] = len(self._lines)
+            self._lines.append(line)
+        return index
+
+    def get(self, index):
+        if self.text is None:
+            return self._lines[index]
+        return self.text[self.starts[index]:self.starts[index + 1] - 1]
+
+    def freeze(self):
+        starts = [0]
+        for line in self._lines:
+            starts.append(starts[-1] + len(line) + 1)
+        self.text = '\n'.join(self._lines) + '\n'
+        self.starts = array('L', starts)
+        self._lines = self._indexes = None
+
+
+class TypeData(_Slotted):
+
+    __slots__ = ('lineno', 'data_type', 'operation', 'from_import',
+                 'is_native', '_lines', '_line')
+
+    def __init__(self, lineno, data_type, line_content, oper, lines=None):
+        """line_content is the text of the line, or its index in lines
+        (a LineBuffer) when it is given."""
         self.lineno = lineno
-        self.data_type = data_type
-        self.line_content = line_content
-        #if data_type != late_resolution:
-            #oper = None
-        #self.operation = oper
-        #self.from_import = False
+        self.data_type = intern_name(data_type)
+        self._lines = lines
+        self._line = line_content
+        if data_type != late_resolution:
+            oper = None
+        self.operation = oper
+        self.from_import = False
         if isinstance(data_type, str):
             self.is_native = True
         else:
             self.is_native = False
         #self.can_resolve = True
 
+    @property
+    def line_content(self):
+        if self._lines is None:
+            return self._line
+        return self._lines.get(self._line)
+
     def get_data_type(self):
         return self.data_type
 
@@ -77,19 +169,29 @@ class TypeData(object):
         return repr(self.data_type)
 
 
-class Structure(object):
+class Structure(_Slotted):
+
+    __slots__ = ('attributes', 'functions', 'parent')
 
     def __init__(self):
         self.attributes = {}
         self.functions = {}
         self.parent = None
 
+    def __getstate__(self):
+        state = super(Structure, self).__getstate__()
+        if state['parent'].__class__ is Module:
+            # Avoid serializing the whole module with each structure,
+            # the module sets the parent again, see: Module.__setstate__
+            state['parent'] = None
+        return state
+
     def add_function(self, function):
         function.parent = self
         self.functions[function.name] = function
 
     def add_attributes(self, attributes):
-        #attributes = {name: [(lineno, type),...]}
+        #attributes = [(name, lineno, type, line, oper[, lines]),...]
         for attribute in attributes:
             if attribute[0] in self.attributes:
                 assign = self.attributes[attribute[0]]
@@ -168,16 +270,37 @@ class Structure(object):
 
 class Module(Structure):
 
+    __slots__ = ('imports', 'classes', 'spans', '_lookups',
+                 '_lookups_generation')
+
     def __init__(self):
         super(Module, self).__init__()
         self.imports = {}
         self.classes = {}
+        # {fingerprint: [first_line, [(kind, symbol_data), ...]]}
+        self.spans = {}
+        # {(main_attr, child_attrs, scope): result} of get_type
+        self._lookups = {}
+        self._lookups_generation = _lookups_generation
+
+    def __getstate__(self):
+        state = super(Module, self).__getstate__()
+        state['_lookups'] = {}
+        return state
+
+    def __setstate__(self, state):
+        super(Module, self).__setstate__(state)
+        for clazz in self.classes.values():
+            clazz.parent = self
+        for function in self.functions.values():
+            if function.__class__ is Function:
+                function.parent = self
 
     def add_imports(self, imports):
         for imp in imports:
             line_content = "import %s" % imp[1]
             info = TypeData(None, imp[1], line_content, None)
-            self.imports[imp[0]] = info
+            self.imports[intern_name(imp[0])] = info
 
     def add_class(self, clazz):
         clazz.parent = self
@@ -191,6 +314,26 @@ class Module(Structure):
                 clazz.update_attributes(classes[clazz_name].attributes)
 
     def get_type(self, main_attr, child_attrs='', scope=None):
+        """Return the cached result of resolve_type.
+
+        The names not found inside a scope are not cached, the scope of
+        the request is the one being edited and they can be added to it by
+        the next analysis."""
+        if self._lookups_generation != _lookups_generation:
+            self._lookups = {}
+            self._lookups_generation = _lookups_generation
+        key = (main_attr, child_attrs, tuple(scope or ()))
+        result = self._lookups.get(key, None)
+        if result is None:
+            result = self.resolve_type(main_attr, child_attrs, scope)
+            if scope and not result['found'] and result['type'] is None:
+                return dict(result)
+            if len(self._lookups) >= MAX_LOOKUPS:
+                self._lookups = {}
+            self._lookups[key] = result
+        return dict(result)
+
+    def resolve_type(self, main_attr, child_attrs='', scope=None):
         result = {'found': False, 'type': None}
         canonical_attrs = remove_function_arguments(child_attrs)
         if not scope:
@@ -312,11 +455,15 @@ class Module(Structure):
 
 class Clazz(Structure):
 
+    __slots__ = ('name', 'bases', '_update_bases', '_merged_bases')
+
     def __init__(self, name):
         super(Clazz, self).__init__()
-        self.name = name
+        self.name = intern_name(name)
         self.bases = {}
         self._update_bases = []
+        # {base: data} of the external bases already merged
+        self._merged_bases = {}
 #        self.decorators = []
 
     def add_parent(self, parent):
@@ -350,6 +497,9 @@ class Clazz(Structure):
                 self.functions.update(parent.functions)
                 self.bases[base] = None
             elif isinstance(parent, tuple):
+                if self._merged_bases.get(base, None) is parent:
+                    continue
+                self._merged_bases[base] = parent
                 parent_name = parent[0]
                 data = parent[1]
                 attributes = {}
@@ -374,15 +524,17 @@ class Clazz(Structure):
 
 class Function(Structure):
 
+    __slots__ = ('name', 'args', 'decorators', 'return_type')
+
     def __init__(self, name):
         super(Function, self).__init__()
-        self.name = name
+        self.name = intern_name(name)
         self.args = {}
         self.decorators = []
         self.return_type = []
 
-    def add_return(self, lineno, data_type, line_content, oper):
-        info = TypeData(lineno, data_type, line_content, oper)
+    def add_return(self, lineno, data_type, line_content, oper, lines=None):
+        info = TypeData(lineno, data_type, line_content, oper, lines)
         if info not in self.return_type:
             self.return_type.append(info)
 
@@ -396,15 +548,17 @@ class Function(Structure):
             return None
 
 
-class Assign(object):
+class Assign(_Slotted):
+
+    __slots__ = ('name', 'data', 'parent')
 
     def __init__(self, name):
-        self.name = name
+        self.name = intern_name(name)
         self.data = []
         self.parent = None
 
-    def add_data(self, lineno, data_type, line_content, oper):
-        info = TypeData(lineno, data_type, line_content, oper)
+    def add_data(self, lineno, data_type, line_content, oper, lines=None):
+        info = TypeData(lineno, data_type, line_content, oper, lines)
         if info not in self.data:
             self.data.append(info)
 
@@ -417,7 +571,9 @@ class Assign(object):
             return None
 
 
-class LinkedModule(object):
+class LinkedModule(_Slotted):
+
+    __slots__ = ('name', 'resolve_attrs')
 
     def __init__(self, path, attrs):
         self.name = path
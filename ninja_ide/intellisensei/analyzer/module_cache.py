@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import zlib
+import sqlite3
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle  # lint:ok
+
+from ninja_ide import resources
+from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.analyzer.module_cache')
+
+# Increase this value when the structure of the model objects changes
+CACHE_VERSION = 4
+
+db_path = os.path.join(resources.NINJA_KNOWLEDGE_PATH, 'modules.db')
+
+
+class ModuleCache(object):
+    """Keep the resolved modules of the projects in the disk, to avoid
+    analyzing them again after restarting the IDE.
+
+    Each module is stored with the mtime and size that the file had when it
+    was analyzed, a module is only returned if the file didn't change."""
+
+    def __init__(self, path=None):
+        self._path = path or db_path
+        self._initialize_db()
+
+    def _connect(self):
+        return sqlite3.connect(self._path)
+
+    def _initialize_db(self):
+        try:
+            cache_db = self._connect()
+            cur = cache_db.cursor()
+            cur.execute("create table if not exists "
+                        "modules(path text PRIMARY KEY, mtime integer, "
+                        "size integer, version integer, links text, "
+                        "data blob)")
+            cache_db.commit()
+            cache_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not initialize the modules cache: %r' %
+                         reason)
+
+    def file_stat(self, path):
+        """Return the (mtime, size) used to validate the cache of path."""
+        stat = os.stat(path)
+        return (int(stat.st_mtime), stat.st_size)
+
+    def is_empty(self):
+        try:
+            cache_db = self._connect()
+            cur = cache_db.cursor()
+            cur.execute("SELECT path FROM modules WHERE version=? LIMIT 1",
+                        (CACHE_VERSION,))
+            result = cur.fetchone()
+            cache_db.close()
+        except sqlite3.Error:
+            return True
+        return result is None
+
+    def get(self, path):
+        """Return a tuple (module, linked_paths) or None if there is not
+        a valid module for path."""
+        try:
+            mtime, size = self.file_stat(path)
+            cache_db = self._connect()
+            cur = cache_db.cursor()
+            cur.execute("SELECT mtime, size, version, links, data "
+                        "FROM modules WHERE path=?", (path,))
+            row = cur.fetchone()
+            cache_db.close()
+        except (OSError, sqlite3.Error) as reason:
+            logger.error('Could not read the modules cache: %r' % reason)
+            return None
+        if row is None or row[2] != CACHE_VERSION or \
+           (row[0], row[1]) != (mtime, size):
+            return None
+        try:
+            module = pickle.loads(zlib.decompress(bytes(row[4])))
+        except Exception as reason:
+            logger.error('Module %r could not be loaded from cache: %r' %
+                         (path, reason))
+            return None
+        links = [link for link in row[3].split('\n') if link]
+        return (module, links)
+
+    def put(self, path, module, stat):
+        """Store the module of path analyzed when the file had stat."""
+        try:
+            data = zlib.compress(
+                pickle.dumps(module, pickle.HIGHEST_PROTOCOL))
+            links = '\n'.join(get_linked_paths(module))
+            cache_db = self._connect()
+            cur = cache_db.cursor()
+            cur.execute("INSERT OR REPLACE INTO modules "
+                        "values (?, ?, ?, ?, ?, ?)",
+                        (path, stat[0], stat[1], CACHE_VERSION, links,
+                         sqlite3.Binary(data)))
+            cache_db.commit()
+            cache_db.close()
+        except Exception as reason:
+            logger.error('Module %r could not be cached: %r' %
+                         (path, reason))
+
+
+def get_linked_paths(module):
+    """Return the paths of the other modules referenced by module."""
+    paths = set()
+    _collect_linked_paths(module, paths)
+    for clazz in module.classes.values():
+        _collect_linked_paths(clazz, paths)
+    return sorted(paths)
+
+
+def _collect_linked_paths(structure, paths):
+    for assign in structure.attributes.values():
+        _collect_from_types(assign.data, paths)
+    for function in structure.functions.values():
+        if function.__class__ is not model.Function:
+            continue
+        _collect_from_types(function.return_type, paths)
+        _collect_linked_paths(function, paths)
+
+
+def _collect_from_types(types, paths):
+    for type_data in types:
+        if type_data.data_type.__class__ is model.LinkedModule:
+            paths.add(type_data.data_type.name)
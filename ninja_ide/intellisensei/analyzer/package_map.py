@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+import sqlite3
+from collections import deque
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir  # lint:ok
+    except ImportError:
+        scandir = None  # lint:ok
+
+from ninja_ide import resources
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.analyzer.package_map')
+
+db_path = os.path.join(resources.NINJA_KNOWLEDGE_PATH, 'packages.db')
+
+
+class PackageMap(object):
+    """Find the packages of a project folder.
+
+    The content of each directory is stored with its mtime, the next crawls
+    only list again the directories whose mtime changed. Symbolic links
+    are followed, each directory is visited once to avoid loops."""
+
+    def __init__(self, path=None):
+        self._path = path or db_path
+        self._initialize_db()
+
+    def _connect(self):
+        return sqlite3.connect(self._path)
+
+    def _initialize_db(self):
+        try:
+            packages_db = self._connect()
+            cur = packages_db.cursor()
+            cur.execute("create table if not exists "
+                        "directories(path text PRIMARY KEY, project text, "
+                        "mtime real, package integer, subdirs text)")
+            cur.execute("create index if not exists directories_project "
+                        "on directories(project)")
+            packages_db.commit()
+            packages_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not initialize the packages map: %r' %
+                         reason)
+
+    def crawl(self, project):
+        """Return {package: folder} with the packages inside project."""
+        start = time.time()
+        known = self._load(project)
+        packages = {}
+        visited = set()
+        changed = []
+        pending = deque([project])
+        while pending:
+            path = pending.popleft()
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = (stat.st_dev, stat.st_ino)
+            if key in visited:
+                continue
+            visited.add(key)
+            entry = known.pop(path, None)
+            if entry is None or entry[0] != stat.st_mtime:
+                try:
+                    is_package, subdirs = list_directory(path)
+                except OSError:
+                    continue
+                changed.append((path, project, stat.st_mtime,
+                                int(is_package), '\n'.join(subdirs)))
+            else:
+                is_package, subdirs = entry[1], entry[2]
+            if is_package:
+                package = path[len(project) + 1:].replace(os.path.sep, '.')
+                packages[package] = path
+            pending.extend([os.path.join(path, name) for name in subdirs])
+        self._save(changed, list(known))
+        logger.info('Crawled %s in %.3f seconds: %d directories, '
+                    '%d listed again, %d packages' %
+                    (project, time.time() - start, len(visited),
+                     len(changed), len(packages)))
+        return packages
+
+    def _load(self, project):
+        """Return {path: (mtime, is_package, subdirs)} of project."""
+        try:
+            packages_db = self._connect()
+            cur = packages_db.cursor()
+            cur.execute("SELECT path, mtime, package, subdirs "
+                        "FROM directories WHERE project=?", (project,))
+            rows = cur.fetchall()
+            packages_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not read the packages map: %r' % reason)
+            return {}
+        return dict([(path, (mtime, bool(package),
+                             [name for name in subdirs.split('\n') if name]))
+                     for path, mtime, package, subdirs in rows])
+
+    def _save(self, changed, removed):
+        if not changed and not removed:
+            return
+        try:
+            packages_db = self._connect()
+            cur = packages_db.cursor()
+            cur.executemany("INSERT OR REPLACE INTO directories "
+                            "values (?, ?, ?, ?, ?)", changed)
+            cur.executemany("DELETE FROM directories WHERE path=?",
+                            [(path,) for path in removed])
+            packages_db.commit()
+            packages_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not save the packages map: %r' % reason)
+
+
+def list_directory(path):
+    """Return (is_package, subdirectories) of the directory path."""
+    is_package = False
+    subdirs = []
+    if scandir is not None:
+        for entry in scandir(path):
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.name == '__init__.py':
+                    is_package = True
+            except OSError:
+                continue
+    else:
+        for name in os.listdir(path):
+            if os.path.isdir(os.path.join(path, name)):
+                subdirs.append(name)
+            elif name == '__init__.py':
+                is_package = True
+    return (is_package, sorted(subdirs))
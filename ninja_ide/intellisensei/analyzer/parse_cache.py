@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Parse each version of a document only once for all its consumers.
+
+The symbols of the locator, the editor, the combo of symbols, the tree of
+symbols and the analyzer of the completions are obtained from the same
+text, the ast of the text and the tables of symbols obtained from it are
+kept by the hash of the text to share them.
+
+The shared ast and tables must not be modified by the consumers."""
+
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.analyzer.parse_cache')
+
+# Versions of the documents kept (the least recently used are dropped)
+MAX_DOCUMENTS = 32
+
+try:
+    unicode
+except NameError:
+    # Python 3
+    unicode = str  # lint:ok
+
+
+class _Document(object):
+    """The ast of a version of a document (or the error parsing it) and
+    the tables of symbols obtained from it."""
+
+    __slots__ = ('tree', 'error', 'tables', 'requests')
+
+    def __init__(self):
+        self.tree = None
+        self.error = None
+        # {name of the table: table}
+        self.tables = {}
+        # Times the ast of this text was requested
+        self.requests = 0
+
+
+class ParseCache(object):
+    """Keep the ast of the last versions of the documents, by the hash of
+    their text. The cache is shared by several threads.
+
+    The statistics count the parses of the text of each version of a
+    document (each edit), with the cache it should be 1 parse per edit."""
+
+    def __init__(self, max_documents=MAX_DOCUMENTS):
+        self._max_documents = max_documents
+        # {key of the text: _Document}
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self.parses = 0
+        self.partial_parses = 0
+        self.hits = 0
+        self.edits = 0
+
+    def _key(self, source):
+        """The type of the text is part of the key, ast.parse can give
+        another result for the unicode of the same bytes (a coding
+        declaration is an error in a unicode text of Python 2)."""
+        kind = 'b'
+        if isinstance(source, unicode):
+            kind = 'u'
+            source = source.encode('utf-8')
+        return kind + hashlib.md5(source).hexdigest()
+
+    def _get_document(self, key, create=True):
+        with self._lock:
+            document = self._documents.pop(key, None)
+            if document is None:
+                if not create:
+                    return None
+                document = _Document()
+                self.edits += 1
+                if len(self._documents) >= self._max_documents:
+                    self._documents.popitem(last=False)
+            self._documents[key] = document
+            return document
+
+    def parse(self, source):
+        """Return the ast of source, raise the error of ast.parse if it
+        can't be parsed."""
+        document = self._get_document(self._key(source))
+        self._parse(document, source)
+        if document.error is not None:
+            raise document.error
+        return document.tree
+
+    def _parse(self, document, source):
+        document.requests += 1
+        if document.tree is not None or document.error is not None:
+            self.hits += 1
+            return
+        self.parses += 1
+        try:
+            document.tree = ast.parse(source)
+        except (SyntaxError, TypeError, ValueError) as reason:
+            document.error = reason
+        logger.debug('Parses: %d of %d edits (%d partial), hits: %d' % (
+            self.parses, self.edits, self.partial_parses, self.hits))
+
+    def lookup(self, source):
+        """Return the ast of source if it was already parsed, or None."""
+        document = self._get_document(self._key(source), False)
+        if document is None or document.tree is None:
+            return None
+        document.requests += 1
+        self.hits += 1
+        return document.tree
+
+    def get_table(self, source, name, build):
+        """Return the table name of source, created with build(tree) the
+        first time. Raise the error of ast.parse if it can't be parsed."""
+        document = self._get_document(self._key(source))
+        table = document.tables.get(name, None)
+        if table is None:
+            self._parse(document, source)
+            if document.error is not None:
+                raise document.error
+            table = document.tables[name] = build(document.tree)
+        else:
+            document.requests += 1
+            self.hits += 1
+        return table
+
+    def add_partial_parse(self):
+        """Count a parse of a part of a document, done outside the cache."""
+        self.partial_parses += 1
+
+    def parses_per_edit(self):
+        """Return the average of parses (whole or partial) per edit."""
+        if not self.edits:
+            return 0.0
+        return float(self.parses + self.partial_parses) / self.edits
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+_cache = ParseCache()
+
+
+def get_cache():
+    """Return the cache shared by all the consumers."""
+    return _cache
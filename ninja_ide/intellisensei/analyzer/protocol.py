@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Messages exchanged between the completion daemon and the process that
+resolves the types of the modules.
+
+The process keeps its own copy of each module, so the daemon only sends
+the top level statements (spans) that the process doesn't have yet, and
+the process answers with the types that were resolved, to be patched in
+the module of the daemon:
+
+    daemon -> process:
+        (MODULE, path_id, module, recursive)
+        (UPDATE, path_id, [(span_key, first_line), ...], {span_key: span},
+            recursive)
+        (LINK, path_id, {package: path})
+        (UNLOAD, path_id)
+    process -> daemon:
+        (RESOLVED, path_id, patches, packages, worker_index)
+        (UNKNOWN, path_id, worker_index)
+        (CANCELLED, path_id, patches, worker_index)
+
+The daemon cancels the resolution of a module when a newer version of it
+arrives, the process answers with the types resolved until then.
+"""
+
+from ninja_ide.intellisensei.analyzer import model
+
+
+MODULE = 'module'
+UPDATE = 'update'
+LINK = 'link'
+UNLOAD = 'unload'
+RESOLVED = 'resolved'
+UNKNOWN = 'unknown'
+CANCELLED = 'cancelled'
+
+
+class ClassReference(object):
+    """Replace a Clazz of the module in the patches, the daemon uses its
+    own Clazz object with the same name."""
+
+    def __init__(self, name):
+        self.name = name
+
+
+def create_update(path_id, module, known_spans, recursive=True):
+    """Return the message to send module to the process, known_spans are
+    the span keys the process already has for path_id."""
+    if not module.spans:
+        return (MODULE, path_id, module, recursive)
+    spans = sorted([(key, module.spans[key][0]) for key in module.spans],
+                   key=lambda span: span[1])
+    new_spans = dict([(key, module.spans[key]) for key in module.spans
+                      if key not in known_spans])
+    return (UPDATE, path_id, spans, new_spans, recursive)
+
+
+def build_module(message, old_module, analyzer):
+    """Create in the process the module described by an UPDATE message.
+
+    Return None if the spans that were not sent are not in old_module."""
+    spans, new_spans = message[2], message[3]
+    old_spans = {}
+    if old_module is not None:
+        old_spans = old_module.spans
+    module = model.Module()
+    for key, start in spans:
+        entry = new_spans.get(key, None)
+        if entry is None:
+            entry = old_spans.get(key, None)
+            if entry is None:
+                return None
+            analyzer._move_span(entry, start)
+        module.spans[key] = entry
+        for symbol_data in entry[1]:
+            analyzer._add_symbol_data(module, symbol_data)
+    if old_module is not None:
+        analyzer._resolve_module(module, old_module)
+    return module
+
+
+def iter_types(structure, address=()):
+    """Yield (address, TypeData) for each type in structure.
+
+    The address is a tuple of steps used by find_type to get the same
+    TypeData in another copy of the module."""
+    for name in structure.attributes:
+        assign = structure.attributes[name]
+        for index, type_data in enumerate(assign.data):
+            yield (address + ('a', name, index), type_data)
+    for name in structure.functions:
+        function = structure.functions[name]
+        if function.__class__ is not model.Function:
+            continue
+        function_address = address + ('f', name)
+        for index, type_data in enumerate(function.return_type):
+            yield (function_address + ('r', index), type_data)
+        for arg in function.args:
+            for index, type_data in enumerate(function.args[arg].data):
+                yield (function_address + ('g', arg, index), type_data)
+        for item in iter_types(function, function_address):
+            yield item
+    for name in getattr(structure, 'classes', {}):
+        for item in iter_types(structure.classes[name], ('c', name)):
+            yield item
+
+
+def find_type(module, address):
+    """Return the TypeData in module for address, None if not found."""
+    structure = module
+    index = 0
+    try:
+        while index < len(address):
+            step = address[index]
+            if step == 'c':
+                structure = structure.classes[address[index + 1]]
+                index += 2
+            elif step == 'f':
+                structure = structure.functions[address[index + 1]]
+                index += 2
+            elif step == 'a':
+                assign = structure.attributes[address[index + 1]]
+                return assign.data[address[index + 2]]
+            elif step == 'g':
+                assign = structure.args[address[index + 1]]
+                return assign.data[address[index + 2]]
+            elif step == 'r':
+                return structure.return_type[address[index + 1]]
+            else:
+                return None
+    except (KeyError, IndexError, AttributeError):
+        pass
+    return None
+
+
+def take_snapshot(module):
+    """Return the current data type of each TypeData in module."""
+    return dict([(address, type_data.data_type)
+                 for address, type_data in iter_types(module)])
+
+
+def collect_patches(module, snapshot, resolved_bases=None):
+    """Return the types of module that changed since snapshot.
+
+    resolved_bases is {(class_name, base): data} with the inheritance of
+    the classes resolved in the process."""
+    patches = []
+    for address, type_data in iter_types(module):
+        data_type = type_data.data_type
+        if address in snapshot and snapshot[address] is data_type:
+            continue
+        patches.append((address, type_data.line_content,
+                        _encode(module, data_type)))
+    for (class_name, base), data in (resolved_bases or {}).items():
+        patches.append((('b', class_name, base), None,
+                        _encode(module, data)))
+    return patches
+
+
+def apply_patches(module, patches):
+    """Update the types of module with the patches sent by the process."""
+    updated_classes = set()
+    for address, line_content, data in patches:
+        data_type = _decode(module, data)
+        if data_type is None and data is not None:
+            # The class is not longer in the module
+            continue
+        if address[0] == 'b':
+            clazz = module.classes.get(address[1], None)
+            if clazz is not None:
+                clazz.bases[address[2]] = data_type
+                updated_classes.add(clazz)
+            continue
+        type_data = find_type(module, address)
+        if type_data is None or type_data.line_content != line_content:
+            # The module changed while the process was resolving it
+            continue
+        type_data.data_type = data_type
+    for clazz in _parents_first(updated_classes):
+        clazz.update_with_parent_data()
+    model.invalidate_lookups()
+
+
+def _parents_first(classes):
+    """Return the classes sorted to merge each one after its bases, the
+    class merges the data its bases have at that moment."""
+    ordered = []
+    visited = set()
+
+    def visit(clazz):
+        if clazz in visited:
+            return
+        visited.add(clazz)
+        for base in clazz.bases.values():
+            if base.__class__ is model.Clazz and base in classes:
+                visit(base)
+        ordered.append(clazz)
+
+    for clazz in classes:
+        visit(clazz)
+    return ordered
+
+
+def _encode(module, data_type):
+    if data_type.__class__ is model.Clazz:
+        if module.classes.get(data_type.name, None) is data_type:
+            return ClassReference(data_type.name)
+        return model.late_resolution
+    return data_type
+
+
+def _decode(module, data_type):
+    if data_type.__class__ is ClassReference:
+        return module.classes.get(data_type.name, None)
+    return data_type
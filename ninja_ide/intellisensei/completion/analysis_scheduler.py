@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+
+# Seconds without changes in a document before analyzing it
+DEBOUNCE_DELAY = 0.4
+
+
+class AnalysisScheduler(object):
+    """Delay the analysis of the documents until the user stops typing.
+
+    Each request is tagged with the version of the document, a request
+    replaces the pending one of the same document and restarts its delay,
+    so a burst of changes produces only one analysis of the last version.
+    The requests not newer than the last version analyzed are discarded.
+
+    analyze is called as analyze(path, source, indent, use_tabs, version),
+    the owner calls run_pending when the delay of next_delay expires."""
+
+    def __init__(self, analyze, delay=DEBOUNCE_DELAY, clock=time.time):
+        self._analyze = analyze
+        self._delay = delay
+        self._clock = clock
+        # {path: (deadline, version, source, indent, use_tabs)}
+        self._pending = {}
+        # {path: version} of the last analysis of each document
+        self._analyzed = {}
+
+    def schedule(self, path, source, indent, use_tabs, version):
+        """Request the analysis of version of the document path.
+
+        Return False if the request is superseded by a newer version."""
+        pending = self._pending.get(path, None)
+        if (path in self._analyzed and version <= self._analyzed[path]) or \
+           (pending is not None and version < pending[1]):
+            return False
+        self._pending[path] = (self._clock() + self._delay, version, source,
+                               indent, use_tabs)
+        return True
+
+    def next_delay(self):
+        """Return the seconds until the next analysis is due, or None if
+        there is nothing pending."""
+        if not self._pending:
+            return None
+        deadline = min([pending[0] for pending in self._pending.values()])
+        return max(0, deadline - self._clock())
+
+    def run_pending(self):
+        """Analyze the documents whose delay expired, return how many."""
+        now = self._clock()
+        due = [path for path in self._pending
+               if self._pending[path][0] <= now]
+        for path in due:
+            self.flush(path)
+        return len(due)
+
+    def flush(self, path):
+        """Analyze now the pending version of path, if any."""
+        pending = self._pending.pop(path, None)
+        if pending is None:
+            return False
+        deadline, version, source, indent, use_tabs = pending
+        self._analyzed[path] = version
+        self._analyze(path, source, indent, use_tabs, version)
+        return True
+
+    def cancel(self, path):
+        """Discard the pending analysis and the versions of path."""
+        self._pending.pop(path, None)
+        self._analyzed.pop(path, None)
+
+    def is_pending(self, path):
+        return path in self._pending
@@ -21,18 +21,25 @@
 
 import re
 import token as tkn
-from tokenize import generate_tokens, TokenError
+from threading import Thread
 try:
-    from StringIO import StringIO
-except:
-    from io import StringIO  # lint:ok
+    from Queue import Queue
+except ImportError:
+    from queue import Queue  # lint:ok
 
 from ninja_ide.core import settings
 from ninja_ide.gui.editor import helpers
-from ninja_ide.tools.completion import model
-from ninja_ide.tools.completion import analyzer
-from ninja_ide.tools.completion import completer
-from ninja_ide.tools.completion import completion_daemon
+from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import analyzer_daemon
+from ninja_ide.intellisensei.completion import completion_db
+from ninja_ide.intellisensei.completion import completion_index
+from ninja_ide.intellisensei.completion import introspection_service
+from ninja_ide.intellisensei.completion import token_cache
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.completion.code_completion')
 
 
 #Because my python doesn't have it, and is not in the web docs either
@@ -44,26 +51,42 @@ class CodeCompletion(object):
 
     def __init__(self):
         self.analyzer = analyzer.Analyzer()
-        self.cdaemon = completion_daemon.CompletionDaemon()
+        self.cdaemon = analyzer_daemon.CompletionDaemon()
         # Set modules reference to model
         model.MODULES = self.cdaemon.modules
+        self.introspection = introspection_service.IntrospectionService()
+        # Modules of the interpreter parsed without importing them
+        completion_db.start_indexer(settings.PYTHON_EXEC)
+        self.database = completion_db.CompletionDatabase(
+            completion_db.database_path(settings.PYTHON_EXEC))
         self.module_id = None
         self.patIndent = re.compile('^\s+')
-        self.patClass = re.compile("class (\w+?)\(")
-        self.patFunction = re.compile("(\w+?)\(")
-        self.patWords = re.compile('\W+')
         self._valid_op = (')', '}', ']')
         self._invalid_op = ('(', '{', '[')
         self._invalid_words = ('if', 'elif', 'for', 'while', 'in', 'return',
             'and', 'or', 'del', 'except', 'from', 'import', 'is', 'print',
             'super', 'yield')
         self.keywords = settings.SYNTAX['python']['keywords']
+        # Names of the current module: the symbols found by the analyzer
+        # and the words in the buffer
+        self.index = completion_index.CompletionIndex()
+        self.buffer_names = completion_index.BufferNames(self.index,
+                                                         self.keywords)
+        self._module_names = {}
+        # Tokens of the text before the cursor of the last request
+        self.token_cache = token_cache.TokenCache()
+        # Requests that need the daemon or the introspection
+        self._request_id = 0
+        self._completion_thread = _CompletionThread(self)
+        self._completion_thread.start()
 
     def unload_module(self):
         self.cdaemon.unload_module(self.module_id)
 
     def analyze_file(self, path, source=None, indent=settings.INDENT,
-        useTabs=settings.USE_TABS):
+        useTabs=settings.USE_TABS, version=None):
+        """Analyze the module of path, version is the version of the
+        document used to discard the work of older versions."""
         if source is None:
             with open(path) as f:
                 source = f.read()
@@ -75,32 +98,40 @@ class CodeCompletion(object):
             source += '%spass;' % indent
 
         self.module_id = path
-        if not self.cdaemon.daemon.is_alive():
-            completion_daemon.shutdown_daemon()
+        if not self.cdaemon.resolvers_alive():
+            analyzer_daemon.shutdown_daemon()
             del self.cdaemon
-            self.cdaemon = completion_daemon.CompletionDaemon()
+            self.cdaemon = analyzer_daemon.CompletionDaemon()
             # Set modules reference to model
             model.MODULES = self.cdaemon.modules
         module = self.cdaemon.get_module(self.module_id)
         module = self.analyzer.analyze(source, module)
-        self.cdaemon.inspect_module(self.module_id, module)
+        self._update_module_names(module)
+        self.cdaemon.set_focused_module(self.module_id)
+        self.cdaemon.inspect_module(self.module_id, module, version=version)
+
+    def _update_module_names(self, module):
+        """Update the index with the symbols of module that changed."""
+        names = {'classes': set(module.classes),
+                 'functions': set(module.functions),
+                 'modules': set(module.imports),
+                 'attributes': set(module.attributes)}
+        for kind in names:
+            old_names = self._module_names.get(kind, set())
+            self.index.remove(kind, old_names - names[kind])
+            self.index.add(kind, names[kind] - old_names)
+        self._module_names = names
 
     def _tokenize_text(self, code):
-        # TODO Optimization, only iterate until the previous line of a class??
-        token_code = []
         try:
-            for tkn_type, tkn_str, pos, _, line, \
-                in generate_tokens(StringIO(code).readline):
-                token_code.append((tkn_type, tkn_str, pos, line))
-        except TokenError:
-            #This is an expected situation, where i don't want to do anything
-            #possible an unbalanced brace like: func(os.p| (| = cursor-end)
-            pass
+            tokens = self.token_cache.tokenize(code)
         except IndentationError:
             return []
-        while token_code[-1][0] in (tkn.ENDMARKER, tkn.DEDENT, tkn.NEWLINE):
-            token_code.pop()
-        return token_code
+        end = len(tokens)
+        while end and tokens[end - 1][0] in (tkn.ENDMARKER, tkn.DEDENT,
+                                             tkn.NEWLINE):
+            end -= 1
+        return tokens[:end]
 
     def _search_for_scope(self, token_code):
         if not token_code or not token_code[-1][3].startswith(' '):
@@ -193,6 +224,34 @@ class CodeCompletion(object):
         return final_word, (var_segment != "")
 
     def get_completion(self, code, offset):
+        request = self._prepare_request(code, offset)
+        data = self._resolve_completions(request, self._get_type(request))
+        if data is None:
+            data = self._buffer_completions(code, request)
+        return data
+
+    def request_completion(self, code, offset, callback):
+        """Return (request_id, completions) without waiting for the daemon
+        or the introspection.
+
+        The completions returned are the ones found in the analyzed module
+        or in the buffer, if richer completions are needed they are sent
+        from another thread with callback(request_id, completions). The
+        completions of a request are discarded when a newer one arrives."""
+        self._request_id += 1
+        self._completion_thread.set_last_request(self._request_id)
+        request = self._prepare_request(code, offset)
+        type_info = self._get_type(request, blocking=False)
+        if type_info is not None and not _needs_introspection(type_info[0]):
+            data = self._resolve_completions(request, type_info)
+            if data is not None:
+                return (self._request_id, data)
+        self._completion_thread.add_request(self._request_id, request,
+                                            type_info, callback)
+        return (self._request_id, self._buffer_completions(code, request))
+
+    def _prepare_request(self, code, offset):
+        """Return the segment of code to complete and the scopes."""
         token_code = self._tokenize_text(code[:offset])
         scopes = self._search_for_scope(token_code)
         # Find section to attempt for code completion (var_segment)
@@ -213,24 +272,44 @@ class CodeCompletion(object):
             word = word.rsplit('.', 1)[0].strip()
             if final_word == word:
                 word = ''
-        self.cdaemon.lock.acquire()
-        module = self.cdaemon.get_module(self.module_id)
-        if module:
-            imports = module.get_imports()
-            result = module.get_type(attr_name, word, scopes)
-        else:
-            result = {'found': False, 'type': None}
-        self.cdaemon.lock.release()
-        if result['found'] and result['type'] is not None:
+        return _Request(self.module_id, var_segment, attr_name, word,
+                        final_word, scopes)
+
+    def _get_type(self, request, blocking=True):
+        """Return (result, imports) with the type of the segment in the
+        module, None if the daemon is busy and blocking is False."""
+        if not self.cdaemon.lock.acquire(blocking):
+            return None
+        try:
+            module = self.cdaemon.get_module(request.module_id)
+            if module:
+                return (module.get_type(request.attr_name, request.word,
+                                        request.scopes),
+                        module.get_imports())
+            return ({'found': False, 'type': None}, [])
+        finally:
+            self.cdaemon.lock.release()
+
+    def _resolve_completions(self, request, type_info):
+        """Return the completions for the type of the segment, None if
+        they have to be searched in the buffer."""
+        result, imports = type_info
+        if _needs_introspection(result):
+            attr_name = request.attr_name
+            word = request.word
             prefix = attr_name
             if result['type'] != attr_name:
                 prefix = result['type']
-                word = final_word
+                word = request.final_word
             to_complete = "%s.%s" % (prefix, word)
             if result.get('main_attr_replace', False):
-                to_complete = var_segment.replace(attr_name, result['type'], 1)
-            imports = [imp.split('.')[0] for imp in imports]
-            data = completer.get_all_completions(to_complete, imports)
+                to_complete = request.var_segment.replace(
+                    attr_name, result['type'], 1)
+            data = self.database.get_completions(to_complete)
+            if data is None:
+                imports = [imp.split('.')[0] for imp in imports]
+                data = self.introspection.get_all_completions(to_complete,
+                                                              imports)
             # Move system attributes beginning in '__' (built_in_attribs)
             # to the end of the list.
             built_in_attribs = [d for d in data.get('attributes', [])
@@ -241,25 +320,71 @@ class CodeCompletion(object):
                 data['attributes'] += built_in_attribs
             if data:
                 return data
-            else:
-                result = {'found': None, 'type': None}
-
-        if result['type'] is not None and len(result['type']) > 0:
-            data = {'attributes': result['type']['attributes'],
+        elif result['type'] is not None and len(result['type']) > 0:
+            return {'attributes': result['type']['attributes'],
                 'functions': result['type']['functions']}
-        else:
-            clazzes = sorted(set(self.patClass.findall(code)))
-            funcs = sorted(set(self.patFunction.findall(code)))
-            attrs = sorted(set(self.patWords.split(code)))
-            if final_word in attrs:
-                attrs.remove(final_word)
-            if attr_name in attrs:
-                attrs.remove(attr_name)
-            filter_attrs = lambda x: (x not in funcs) and \
-                not x.isdigit() and (x not in self.keywords)
-            attrs = list(filter(filter_attrs, attrs))
-            funcs = [x for x in funcs if x not in clazzes]
-            data = {'attributes': attrs,
-                'functions': funcs,
-                'classes': clazzes}
+        return None
+
+    def _buffer_completions(self, code, request):
+        self.buffer_names.update(code)
+        data = self.index.search()
+        for name in (request.final_word, request.attr_name):
+            if name in data['attributes']:
+                data['attributes'].remove(name)
         return data
+
+
+def _needs_introspection(result):
+    return bool(result['found']) and result['type'] is not None
+
+
+class _Request(object):
+    """The segment of code to complete in a module."""
+
+    __slots__ = ('module_id', 'var_segment', 'attr_name', 'word',
+                 'final_word', 'scopes')
+
+    def __init__(self, module_id, var_segment, attr_name, word, final_word,
+                 scopes):
+        self.module_id = module_id
+        self.var_segment = var_segment
+        self.attr_name = attr_name
+        self.word = word
+        self.final_word = final_word
+        self.scopes = scopes
+
+
+class _CompletionThread(Thread):
+    """Resolve the completions that need the daemon or the introspection,
+    only the last request received is resolved."""
+
+    def __init__(self, code_completion):
+        super(_CompletionThread, self).__init__()
+        self.daemon = True
+        self._code_completion = code_completion
+        self._requests = Queue()
+        self._last_request = None
+
+    def set_last_request(self, request_id):
+        """Discard the requests older than request_id."""
+        self._last_request = request_id
+
+    def add_request(self, request_id, request, type_info, callback):
+        self._requests.put((request_id, request, type_info, callback))
+
+    def run(self):
+        while True:
+            request_id, request, type_info, callback = self._requests.get()
+            if request_id != self._last_request:
+                continue
+            try:
+                if type_info is None:
+                    type_info = self._code_completion._get_type(request)
+                data = self._code_completion._resolve_completions(
+                    request, type_info)
+            except Exception as reason:
+                logger.error('Completion of %r failed: %r' %
+                             (request.var_segment, reason))
+                continue
+            if data is not None and request_id == self._last_request:
+                callback(request_id, data)
@@ -100,12 +100,19 @@ def _load_symbol(s, dglobals, dlocals):
     return sym
 
 
+# Import statements already executed in the globals of this module
+_executed_imports = set()
+
+
 def _import_modules(imports, dglobals):
     '''If given, execute import statements'''
     if imports is not None:
         for stmt in imports:
+            if stmt in _executed_imports:
+                continue
             try:
                 exec(stmt, dglobals)
+                _executed_imports.add(stmt)
             except TypeError:
                 raise TypeError('invalid type: %s' % stmt)
             except Exception:
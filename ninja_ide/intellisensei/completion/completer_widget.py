@@ -24,11 +24,61 @@ from PyQt4.QtGui import QStackedLayout
 from PyQt4.QtGui import QListWidgetItem
 from PyQt4.QtGui import QIcon
 from PyQt4.QtCore import Qt
+from PyQt4.QtCore import QObject
+from PyQt4.QtCore import QTimer
 from PyQt4.QtCore import SIGNAL
 from PyQt4.QtGui import QListWidget
 
 from ninja_ide.core import settings
-from ninja_ide.tools.completion import code_completion
+from ninja_ide.core.file_handling.filesystem_notifications import (
+    NinjaFileSystemWatcher)
+from ninja_ide.gui.ide import IDE
+from ninja_ide.intellisensei.analyzer import analyzer_daemon
+from ninja_ide.intellisensei.completion import analysis_scheduler
+from ninja_ide.intellisensei.completion import code_completion
+from ninja_ide.intellisensei.completion import completion_index
+from ninja_ide.intellisensei.completion import completion_ranking
+
+
+# Maximum amount of completions shown
+MAX_PROPOSALS = 200
+# Milliseconds between the writes of the selections to the disk
+FLUSH_SELECTIONS_INTERVAL = 60000
+
+# The daemon is told about the changed files once for all the editors
+__watching_changes = False
+# The selections of all the editors are stored by a single timer
+__flush_timer = None
+
+
+def _watch_changes():
+    global __watching_changes
+    if not __watching_changes:
+        __watching_changes = True
+        QObject.connect(NinjaFileSystemWatcher,
+                        SIGNAL("fileChanged(int, QString)"), _file_changed)
+
+
+def _file_changed(event, path):
+    """Analyze again the module saved or changed on disk and link again
+    the modules that import it."""
+    if path.endswith('.py'):
+        analyzer_daemon.CompletionDaemon().invalidate_module(path)
+
+
+def _flush_selections():
+    """Store the selected completions periodically and before closing,
+    instead of writing the disk on each selection."""
+    global __flush_timer
+    if __flush_timer is None:
+        __flush_timer = QTimer()
+        QObject.connect(__flush_timer, SIGNAL("timeout()"),
+                        completion_ranking.flush_rankers)
+        __flush_timer.start(FLUSH_SELECTIONS_INTERVAL)
+        ninjaide = IDE.get_service('ide')
+        if ninjaide is not None:
+            QObject.connect(ninjaide, SIGNAL("goingDown()"),
+                            completion_ranking.flush_rankers)
 
 
 class CodeCompletionWidget(QFrame):
@@ -53,7 +103,17 @@ class CodeCompletionWidget(QFrame):
             'm': ":img/module"}
 
         self.cc = code_completion.CodeCompletion()
-        self._completion_results = {}
+        _watch_changes()
+        _flush_selections()
+        # Analyze the document when the user stops typing
+        self._scheduler = analysis_scheduler.AnalysisScheduler(
+            self.cc.analyze_file)
+        self._analysis_timer = QTimer(self)
+        self._analysis_timer.setSingleShot(True)
+        self._completion_results = completion_index.CompletionIndex()
+        self._ranker = completion_ranking.get_ranker()
+        # Only the completions of the last request are shown
+        self._request_id = None
         self._prefix = ''
         self.setVisible(False)
         self.source = ''
@@ -82,6 +142,10 @@ class CodeCompletionWidget(QFrame):
         self.connect(self._editor.document(),
             SIGNAL("cursorPositionChanged(QTextCursor)"),
             self.update_metadata)
+        self.connect(self._analysis_timer, SIGNAL("timeout()"),
+            self._run_pending_analysis)
+        self.connect(self, SIGNAL("completionsReady(int, PyQt_PyObject)"),
+            self._completions_ready)
 
     def _select_next_row(self, move=1):
         new_row = self.completion_list.currentRow() + move
@@ -106,19 +170,34 @@ class CodeCompletionWidget(QFrame):
                cursor.block().blockNumber() != self._block:
                 source = self._editor.text()
                 source = source.encode(self._editor.encoding)
-                self.cc.analyze_file(self._editor.file_path, source,
-                    self._editor.indent, self._editor.useTabs)
                 self._revision = self._editor.document().revision()
                 self._block = cursor.block().blockNumber()
+                self._scheduler.schedule(self._editor.file_path, source,
+                    self._editor.indent, self._editor.useTabs,
+                    self._revision)
+                self._start_analysis_timer()
+
+    def _start_analysis_timer(self):
+        delay = self._scheduler.next_delay()
+        if delay is not None:
+            self._analysis_timer.start(int(delay * 1000))
+
+    def _run_pending_analysis(self):
+        self._scheduler.run_pending()
+        self._start_analysis_timer()
 
     def insert_completion(self, insert, type_=ord('a')):
         if insert != self._prefix:
             closing = ''
             if type_ in (ord('f'), ord('c')):
                 closing = '()'
-            extra = len(self._prefix) - len(insert)
-            insertion = '%s%s' % (insert[extra:], closing)
-            self._editor.textCursor().insertText(insertion)
+            # The prefix only has to match a subsequence of the completion,
+            # so it is replaced with the whole completion
+            cursor = self._editor.textCursor()
+            cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor,
+                len(self._prefix))
+            cursor.insertText('%s%s' % (insert, closing))
+        self._ranker.record(insert)
         self.hide_completer()
 
     def _get_geometry(self):
@@ -160,23 +239,14 @@ class CodeCompletionWidget(QFrame):
 
     def set_completion_prefix(self, prefix, valid=True):
         self._prefix = prefix
-        proposals = []
-        proposals += [('m', item)
-            for item in self._completion_results.get('modules', [])
-            if item.startswith(prefix)]
-        proposals += [('c', item)
-            for item in self._completion_results.get('classes', [])
-            if item.startswith(prefix)]
-        proposals += [('a', item)
-            for item in self._completion_results.get('attributes', [])
-            if item.startswith(prefix)]
-        proposals += [('f', item)
-            for item in self._completion_results.get('functions', [])
-            if item.startswith(prefix)]
+        proposals = self._ranker.rank(prefix,
+            self._completion_results.candidates(), MAX_PROPOSALS)
         if proposals and valid:
             self.complete(proposals)
         else:
-            self.hide_completer()
+            # The completions of the request can still arrive
+            self._prefix = ''
+            self.hide()
 
     def _invalid_completion_position(self):
         result = False
@@ -194,11 +264,15 @@ class CodeCompletionWidget(QFrame):
            self._editor.cursor_inside_comment() or
            self._invalid_completion_position()):
             return
+        # The completion needs the module of the last version analyzed
+        self._scheduler.flush(self._editor.file_path)
+        self._ranker = self._get_ranker()
         source = self._editor.text()
         source = source.encode(self._editor.encoding)
         offset = self._editor.textCursor().position()
-        results = self.cc.get_completion(source, offset)
-        self._completion_results = results
+        self._request_id, results = self.cc.request_completion(
+            source, offset, self._emit_completions)
+        self._completion_results = completion_index.CompletionIndex(results)
         if force_completion:
             cursor = self._editor.textCursor()
             cursor.movePosition(QTextCursor.StartOfWord,
@@ -208,8 +282,34 @@ class CodeCompletionWidget(QFrame):
             prefix = self._editor._text_under_cursor()
         self.set_completion_prefix(prefix)
 
+    def _get_ranker(self):
+        """Return the ranker of the project of the file being edited."""
+        ninjaide = IDE.get_service('ide')
+        if ninjaide is None:
+            return completion_ranking.get_ranker('')
+        project = ninjaide.get_project_for_file(self._editor.file_path)
+        return completion_ranking.get_ranker(
+            project.path if project is not None else '')
+
+    def _emit_completions(self, request_id, results):
+        """Called from the thread of the completions, they are shown in
+        the thread of the widget."""
+        self.emit(SIGNAL("completionsReady(int, PyQt_PyObject)"),
+            request_id, results)
+
+    def _completions_ready(self, request_id, results):
+        if request_id != self._request_id:
+            return
+        self._completion_results = completion_index.CompletionIndex(results)
+        source = self._editor.text()
+        source = source.encode(self._editor.encoding)
+        offset = self._editor.textCursor().position()
+        prefix, valid = self.cc.get_prefix(source, offset)
+        self.set_completion_prefix(prefix, valid)
+
     def hide_completer(self):
         self._prefix = ''
+        self._request_id = None
         self.hide()
 
     def pre_key_insert_completion(self):
@@ -0,0 +1,555 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Completion database of the modules of an interpreter.
+
+The modules found in the sys.path of the interpreter are parsed with ast,
+without importing them, in a background process. The modules, classes,
+functions and attributes are stored in a SQLite database, used by the code
+completion before importing the modules to introspect them.
+
+Only complete answers are given: if a class inherits from a class that is
+not in the database, or a module imports everything from a module that
+could not be parsed (an extension module), the completion returns None.
+"""
+
+import os
+import ast
+import json
+import time
+import hashlib
+import sqlite3
+import subprocess
+from multiprocessing import Process
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins  # lint:ok
+
+from ninja_ide import resources
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.completion.completion_db')
+
+# Increase this value when the content of the database changes
+DB_VERSION = 3
+# Packages that are not indexed
+SKIP_PACKAGES = ('test', 'tests')
+# Modules parsed between each commit of the indexer
+COMMIT_EVERY = 50
+# Levels of 'from module import *' followed to complete a module
+MAX_STAR_DEPTH = 3
+
+_KINDS = ('attributes', 'modules', 'functions', 'classes')
+# Attributes of every module
+_MODULE_ATTRIBUTES = ('__doc__', '__file__', '__name__', '__package__')
+# Kinds only used inside the database
+_IMPORT = 'import'
+_STAR = '*'
+
+# {python_exec: indexer process} of the interpreters indexed this session
+__indexers = {}
+
+
+def database_path(python_exec):
+    """Return the path of the database for the interpreter python_exec."""
+    name = hashlib.md5(python_exec.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(resources.NINJA_KNOWLEDGE_PATH,
+                        'completion_%s.db' % name)
+
+
+class CompletionDatabase(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._initialize_db()
+
+    def _connect(self):
+        return sqlite3.connect(self._path)
+
+    def _initialize_db(self):
+        try:
+            completion_db = self._connect()
+            cur = completion_db.cursor()
+            cur.execute("PRAGMA user_version")
+            if cur.fetchone()[0] != DB_VERSION:
+                cur.execute("DROP TABLE IF EXISTS modules")
+                cur.execute("DROP TABLE IF EXISTS symbols")
+                cur.execute("DROP TABLE IF EXISTS stamp")
+                cur.execute("PRAGMA user_version=%d" % DB_VERSION)
+            cur.execute("create table if not exists "
+                        "modules(id integer PRIMARY KEY, name text UNIQUE, "
+                        "path text, mtime real, valid integer)")
+            cur.execute("create table if not exists "
+                        "symbols(module integer, parent text, name text, "
+                        "kind text, signature text)")
+            cur.execute("create index if not exists symbols_parent "
+                        "on symbols(module, parent)")
+            # The paths indexed the last time and their modification times
+            cur.execute("create table if not exists stamp(paths text)")
+            completion_db.commit()
+            completion_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not initialize the completion database: %r'
+                         % reason)
+
+    def get_completions(self, s):
+        """Return the completions of s ('package.module.Class.prefix') in
+        the format of completer.get_all_completions, or None if the
+        database can not give all the completions of s."""
+        if '.' not in s:
+            return None
+        path, prefix = s.rsplit('.', 1)
+        try:
+            completion_db = self._connect()
+            try:
+                members = self._resolve(completion_db.cursor(),
+                                        path.split('.'))
+            finally:
+                completion_db.close()
+        except sqlite3.Error as reason:
+            # The indexer could be writing, introspect the modules
+            logger.debug('Completion database not available: %r' % reason)
+            return None
+        if members is None:
+            return None
+        result = dict([(kind, []) for kind in _KINDS])
+        for name in sorted(members):
+            if name.startswith(prefix):
+                result[members[name]].append(name)
+        return result
+
+    def _resolve(self, cur, parts):
+        """Return {name: kind} with the members of the dotted parts."""
+        module = None
+        for index in range(len(parts), 0, -1):
+            name = '.'.join(parts[:index])
+            module = self._get_module(cur, name)
+            if module is not None:
+                break
+        if module is None:
+            return None
+        parent = ''
+        for part in parts[index:]:
+            if part.endswith('()'):
+                part = part[:-2]
+            if not part or '(' in part or '[' in part:
+                return None
+            cur.execute("SELECT kind, signature FROM symbols WHERE "
+                        "module=? AND parent=? AND name=?",
+                        (module[0], parent, part))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            if row[0] == 'classes':
+                parent = '%s.%s' % (parent, part) if parent else part
+            elif row[0] in ('modules', _IMPORT):
+                module = self._get_module(cur, row[1])
+                if module is None:
+                    return None
+                parent = ''
+            else:
+                return None
+        if parent:
+            return self._class_members(cur, module, parent, 0)
+        return self._module_members(cur, module, 0)
+
+    def _get_module(self, cur, name):
+        cur.execute("SELECT id, name FROM modules WHERE name=? AND valid=1",
+                    (name,))
+        return cur.fetchone()
+
+    def _module_members(self, cur, module, depth):
+        members = dict([(name, 'attributes') for name in _MODULE_ATTRIBUTES])
+        cur.execute("SELECT name, kind, signature FROM symbols WHERE "
+                    "module=? AND parent=''", (module[0],))
+        rows = cur.fetchall()
+        imports = {}
+        for name, kind, signature in rows:
+            if kind == _STAR:
+                star = self._get_module(cur, signature)
+                if star is None or depth >= MAX_STAR_DEPTH:
+                    return None
+                star_members = self._module_members(cur, star, depth + 1)
+                if star_members is None:
+                    return None
+                for star_name in star_members:
+                    if not star_name.startswith('_'):
+                        members.setdefault(star_name,
+                                           star_members[star_name])
+            elif kind == _IMPORT:
+                imports[name] = signature
+            else:
+                members[name] = kind
+        for name in imports:
+            if self._get_module(cur, imports[name]) is not None:
+                members[name] = 'modules'
+            else:
+                members[name] = 'attributes'
+        # Submodules of a package
+        prefix = module[1] + '.'
+        cur.execute("SELECT name FROM modules WHERE name > ? AND name < ? "
+                    "AND valid=1", (prefix, module[1] + '/'))
+        for (name,) in cur.fetchall():
+            name = name[len(prefix):]
+            if '.' not in name:
+                members.setdefault(name, 'modules')
+        return members
+
+    def _class_members(self, cur, module, parent, depth):
+        cur.execute("SELECT signature FROM symbols WHERE module=? AND "
+                    "parent=? AND name=? AND kind='classes'",
+                    ((module[0],) + tuple(_split_parent(parent))))
+        row = cur.fetchone()
+        if row is None or depth >= MAX_STAR_DEPTH:
+            return None
+        members = {}
+        cur.execute("SELECT name, kind FROM symbols WHERE module=? AND "
+                    "parent=?", (module[0], parent))
+        for name, kind in cur.fetchall():
+            members[name] = kind
+        for base in [base for base in row[0].split(',') if base]:
+            base_members = self._base_members(cur, module, base, depth)
+            if base_members is None:
+                return None
+            for name in base_members:
+                members.setdefault(name, base_members[name])
+        return members
+
+    def _base_members(self, cur, module, base, depth):
+        parts = base.split('.')
+        cur.execute("SELECT kind, signature FROM symbols WHERE module=? "
+                    "AND parent='' AND name=?", (module[0], parts[0]))
+        row = cur.fetchone()
+        if row is None:
+            return _builtin_members(base)
+        if row[0] == 'classes':
+            return self._class_members(cur, module, base, depth + 1)
+        if row[0] in ('modules', _IMPORT):
+            target = row[1].split('.') + parts[1:]
+            # The class is the last part, the module is the rest
+            base_module = self._get_module(cur, '.'.join(target[:-1]))
+            if base_module is not None:
+                return self._class_members(cur, base_module, target[-1],
+                                           depth + 1)
+        return None
+
+    def is_current(self, paths):
+        """Return True if paths are the ones indexed the last time and
+        none of their modules was added, removed or edited since then."""
+        try:
+            completion_db = self._connect()
+            try:
+                cur = completion_db.cursor()
+                cur.execute("SELECT paths FROM stamp")
+                row = cur.fetchone()
+            finally:
+                completion_db.close()
+        except sqlite3.Error:
+            return False
+        return row is not None and row[0] == _paths_stamp(paths)
+
+    def index(self, paths):
+        """Parse the modules found in paths and store their symbols, only
+        the files that changed since the last time are parsed again."""
+        start = time.time()
+        # Taken before parsing, the modules edited meanwhile are parsed
+        # the next time
+        stamp = _paths_stamp(paths)
+        completion_db = self._connect()
+        cur = completion_db.cursor()
+        cur.execute("SELECT name, id, path, mtime FROM modules")
+        known = dict([(row[0], row[1:]) for row in cur.fetchall()])
+        seen = set()
+        parsed = 0
+        for name, filename in find_modules(paths):
+            if name in seen:
+                continue
+            seen.add(name)
+            try:
+                mtime = os.path.getmtime(filename)
+            except OSError:
+                continue
+            previous = known.get(name, None)
+            if previous is not None and previous[1:] == (filename, mtime):
+                continue
+            symbols = parse_module(filename, name)
+            if previous is not None:
+                cur.execute("DELETE FROM symbols WHERE module=?",
+                            (previous[0],))
+                cur.execute("DELETE FROM modules WHERE id=?",
+                            (previous[0],))
+            # The modules that can not be parsed are stored to not parse
+            # them again until they change
+            cur.execute("INSERT INTO modules(name, path, mtime, valid) "
+                        "VALUES (?, ?, ?, ?)",
+                        (name, filename, mtime, int(symbols is not None)))
+            module_id = cur.lastrowid
+            cur.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?)",
+                            [(module_id,) + symbol
+                             for symbol in symbols or ()])
+            parsed += 1
+            if parsed % COMMIT_EVERY == 0:
+                completion_db.commit()
+        for name in set(known) - seen:
+            cur.execute("DELETE FROM symbols WHERE module=?",
+                        (known[name][0],))
+            cur.execute("DELETE FROM modules WHERE id=?", (known[name][0],))
+        cur.execute("DELETE FROM stamp")
+        cur.execute("INSERT INTO stamp VALUES (?)", (stamp,))
+        completion_db.commit()
+        completion_db.close()
+        logger.info('Completion database updated in %.2f seconds: '
+                    '%d modules, %d parsed' %
+                    (time.time() - start, len(seen), parsed))
+
+
+def _paths_stamp(paths):
+    """Return a digest of paths and of the modules found in them with
+    their modification times, it changes when a module is added, removed
+    or edited."""
+    digest = hashlib.sha1(json.dumps(paths).encode('utf-8'))
+    seen = set()
+    for name, filename in find_modules(paths):
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            mtime = None
+        text = repr((name, filename, mtime))
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8', 'backslashreplace')
+        digest.update(text)
+    return digest.hexdigest()
+
+
+def _builtin_members(name):
+    """Return the members of a builtin class like object or dict."""
+    builtin = getattr(builtins, name, None)
+    if not isinstance(builtin, type):
+        return None
+    members = {}
+    for member in dir(builtin):
+        if callable(getattr(builtin, member, None)):
+            members[member] = 'functions'
+        else:
+            members[member] = 'attributes'
+    return members
+
+
+def _split_parent(parent):
+    """Return (parent, name) of a dotted class name."""
+    if '.' in parent:
+        return parent.rsplit('.', 1)
+    return ('', parent)
+
+
+def find_modules(paths):
+    """Yield (module_name, filename) of the python files in paths."""
+    for folder in paths:
+        if not folder or not os.path.isdir(folder):
+            continue
+        pending = [(folder, '')]
+        while pending:
+            path, package = pending.pop()
+            try:
+                names = sorted(os.listdir(path))
+            except OSError:
+                continue
+            for name in names:
+                filename = os.path.join(path, name)
+                if name.endswith('.py'):
+                    module = name[:-3]
+                    if module == '__init__':
+                        if package:
+                            yield (package[:-1], filename)
+                    elif '.' not in module and '-' not in module:
+                        yield (package + module, filename)
+                elif name not in SKIP_PACKAGES and '.' not in name and \
+                        os.path.isfile(os.path.join(filename,
+                                                    '__init__.py')):
+                    pending.append((filename, '%s%s.' % (package, name)))
+
+
+def parse_module(filename, name):
+    """Return [(parent, name, kind, signature)] with the symbols of the
+    module, or None if it can not be parsed."""
+    try:
+        with open(filename) as f:
+            tree = ast.parse(f.read(), filename)
+    except Exception:
+        return None
+    package = name
+    if not filename.endswith('__init__.py'):
+        package = name.rpartition('.')[0]
+    symbols = []
+    _collect_symbols(tree.body, '', package, symbols)
+    return symbols
+
+
+def _collect_symbols(body, parent, package, symbols):
+    for node in body:
+        node_type = node.__class__.__name__
+        if node_type == 'FunctionDef':
+            symbols.append((parent, node.name, 'functions',
+                            _signature(node)))
+            if parent and node.name == '__init__':
+                _collect_self_attributes(node, parent, symbols)
+        elif node_type == 'ClassDef':
+            # Unknown bases (like calls) are stored as '?'
+            symbols.append((parent, node.name, 'classes',
+                            ','.join([_dotted_name(base) or '?'
+                                      for base in node.bases])))
+            name = '%s.%s' % (parent, node.name) if parent else node.name
+            _collect_symbols(node.body, name, package, symbols)
+        elif node_type == 'Assign':
+            for target in node.targets:
+                for name in _target_names(target):
+                    symbols.append((parent, name, 'attributes', ''))
+        elif node_type == 'Import' and not parent:
+            # Always a module, even the builtin ones that are not indexed
+            for alias in node.names:
+                if alias.asname:
+                    symbols.append(('', alias.asname, 'modules', alias.name))
+                else:
+                    top = alias.name.split('.')[0]
+                    symbols.append(('', top, 'modules', top))
+        elif node_type == 'ImportFrom' and not parent:
+            module = _absolute_module(node, package)
+            for alias in node.names:
+                if alias.name == '*':
+                    symbols.append(('', module, _STAR, module))
+                else:
+                    symbols.append(('', alias.asname or alias.name, _IMPORT,
+                                    '%s.%s' % (module, alias.name)))
+        elif node_type in ('If', 'While', 'For', 'With'):
+            _collect_symbols(node.body, parent, package, symbols)
+            _collect_symbols(getattr(node, 'orelse', []), parent, package,
+                             symbols)
+        elif node_type in ('TryExcept', 'TryFinally', 'Try'):
+            _collect_symbols(node.body, parent, package, symbols)
+            for handler in getattr(node, 'handlers', []):
+                _collect_symbols(handler.body, parent, package, symbols)
+            _collect_symbols(getattr(node, 'orelse', []), parent, package,
+                             symbols)
+            _collect_symbols(getattr(node, 'finalbody', []), parent,
+                             package, symbols)
+
+
+def _collect_self_attributes(function, parent, symbols):
+    for node in ast.walk(function):
+        if node.__class__ is ast.Assign:
+            for target in node.targets:
+                if target.__class__ is ast.Attribute and \
+                   _dotted_name(target.value) == 'self':
+                    symbols.append((parent, target.attr, 'attributes', ''))
+
+
+def _target_names(target):
+    if target.__class__ is ast.Name:
+        return [target.id]
+    elif target.__class__ in (ast.Tuple, ast.List):
+        names = []
+        for element in target.elts:
+            names += _target_names(element)
+        return names
+    return []
+
+
+def _dotted_name(node):
+    if node.__class__ is ast.Name:
+        return node.id
+    elif node.__class__ is ast.Attribute:
+        value = _dotted_name(node.value)
+        if value:
+            return '%s.%s' % (value, node.attr)
+    return ''
+
+
+def _absolute_module(node, package):
+    module = node.module or ''
+    if not node.level:
+        return module
+    parts = package.split('.') if package else []
+    if node.level > 1:
+        parts = parts[:1 - node.level]
+    if module:
+        parts.append(module)
+    return '.'.join(parts)
+
+
+def _signature(function):
+    args = function.args
+    names = [_dotted_name(arg) or getattr(arg, 'arg', '')
+             for arg in args.args]
+    if args.vararg:
+        names.append('*%s' % getattr(args.vararg, 'arg', args.vararg))
+    if args.kwarg:
+        names.append('**%s' % getattr(args.kwarg, 'arg', args.kwarg))
+    return '%s(%s)' % (function.name, ', '.join(names))
+
+
+def get_python_path(python_exec):
+    """Return the sys.path of the interpreter python_exec."""
+    try:
+        command = 'import sys, json; print(json.dumps(sys.path))'
+        process = subprocess.Popen([python_exec, '-c', command],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        output = process.communicate()[0]
+        if process.returncode == 0:
+            return json.loads(output.decode('utf-8'))
+    except (OSError, ValueError) as reason:
+        logger.error('Could not get the sys.path of %s: %r' %
+                     (python_exec, reason))
+    return []
+
+
+class _IndexerProcess(Process):
+
+    def __init__(self, python_exec):
+        super(_IndexerProcess, self).__init__()
+        self.daemon = True
+        self.python_exec = python_exec
+
+    def run(self):
+        if hasattr(os, 'nice'):
+            os.nice(10)
+        paths = [path for path in get_python_path(self.python_exec)
+                 if path and os.path.abspath(path) != os.getcwd()]
+        database = CompletionDatabase(database_path(self.python_exec))
+        if database.is_current(paths):
+            logger.debug('Completion database of %s is current' %
+                         self.python_exec)
+            return
+        try:
+            database.index(paths)
+        except sqlite3.Error as reason:
+            logger.error('Could not build the completion database: %r' %
+                         reason)
+
+
+def start_indexer(python_exec):
+    """Update the database of python_exec in a background process, only
+    the first time it is requested in the session."""
+    if python_exec in __indexers:
+        return
+    __indexers[python_exec] = _IndexerProcess(python_exec)
+    __indexers[python_exec].start()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import re
+from bisect import bisect_left, insort
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.completion import completion_ranking
+
+
+# When a name has more than one kind, the first one in this list is used
+KINDS = ('classes', 'functions', 'modules', 'attributes')
+
+_CLASS = re.compile("class (\w+?)\(")
+_FUNCTION = re.compile("(\w+?)\(")
+_WORDS = re.compile('\W+')
+
+
+class CompletionIndex(object):
+    """Sorted names available for completion, to find the ones starting
+    with a prefix with a binary search.
+
+    The same name can be added several times (from different sources),
+    it is kept until it is removed the same amount of times."""
+
+    def __init__(self, results=None):
+        self._names = []
+        # {name: {kind: count}}
+        self._kinds = {}
+        # The candidates to rank the names, created when they are needed
+        self._candidates = None
+        if results:
+            for kind in results:
+                self.add(kind, results[kind])
+
+    def add(self, kind, names):
+        self._candidates = None
+        for name in names:
+            kinds = self._kinds.get(name, None)
+            if kinds is None:
+                kinds = self._kinds[name] = {}
+                insort(self._names, name)
+            kinds[kind] = kinds.get(kind, 0) + 1
+
+    def remove(self, kind, names):
+        self._candidates = None
+        for name in names:
+            kinds = self._kinds.get(name, None)
+            if kinds is None or kind not in kinds:
+                continue
+            kinds[kind] -= 1
+            if kinds[kind] == 0:
+                del kinds[kind]
+            if not kinds:
+                del self._kinds[name]
+                del self._names[bisect_left(self._names, name)]
+
+    def search(self, prefix=''):
+        """Return {kind: [names]} with the names starting with prefix."""
+        result = dict([(kind, []) for kind in KINDS])
+        index = bisect_left(self._names, prefix)
+        names = self._names
+        while index < len(names) and names[index].startswith(prefix):
+            name = names[index]
+            result[self.kind(name)].append(name)
+            index += 1
+        return result
+
+    def kind(self, name):
+        """Return the kind used for name, of the ones it was added with."""
+        kinds = self._kinds[name]
+        for kind in KINDS:
+            if kind in kinds:
+                return kind
+
+    def candidates(self):
+        """Return the names prepared to be ranked by a CompletionRanker,
+        with the first letter of their kind."""
+        if self._candidates is None:
+            self._candidates = completion_ranking.create_candidates(
+                [(name, self.kind(name)[0]) for name in self._names])
+        return self._candidates
+
+    def __contains__(self, name):
+        return name in self._kinds
+
+    def __len__(self):
+        return len(self._names)
+
+
+class BufferNames(object):
+    """Keep in a CompletionIndex the words found in the text of a document.
+
+    The text is split in top level statements, only the statements that
+    changed since the last update are searched for words."""
+
+    def __init__(self, index, keywords=()):
+        self.index = index
+        self.keywords = keywords
+        # {span_key: [count, (classes, functions, attributes)]}
+        self._spans = {}
+
+    def update(self, source):
+        lines = source.split('\n')
+        spans = analyzer.split_top_level(lines) or [(0, len(lines))]
+        texts = {}
+        counts = {}
+        for start, end in spans:
+            text = '\n'.join(lines[start:end])
+            key = analyzer.fingerprint(text)
+            texts[key] = text
+            counts[key] = counts.get(key, 0) + 1
+        for key in list(self._spans.keys()):
+            if key not in counts:
+                entry = self._spans.pop(key)
+                for _ in range(entry[0]):
+                    self._remove_names(entry[1])
+        for key in counts:
+            entry = self._spans.get(key, None)
+            if entry is None:
+                entry = self._spans[key] = [0, self._find_names(texts[key])]
+            while entry[0] < counts[key]:
+                self._add_names(entry[1])
+                entry[0] += 1
+            while entry[0] > counts[key]:
+                self._remove_names(entry[1])
+                entry[0] -= 1
+
+    def _find_names(self, text):
+        classes = set(_CLASS.findall(text))
+        functions = set(_FUNCTION.findall(text)) - classes
+        attributes = [word for word in set(_WORDS.split(text))
+                      if word and word not in functions and
+                      word not in classes and not word.isdigit() and
+                      word not in self.keywords]
+        return (classes, functions, attributes)
+
+    def _add_names(self, names):
+        self.index.add('classes', names[0])
+        self.index.add('functions', names[1])
+        self.index.add('attributes', names[2])
+
+    def _remove_names(self, names):
+        self.index.remove('classes', names[0])
+        self.index.remove('functions', names[1])
+        self.index.remove('attributes', names[2])
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Order the completions by how well they match what was typed and by how
+many times they were selected in the project.
+
+The selections are counted in memory and written to the disk in batches
+by flush_rankers, called periodically and when the IDE goes down.
+
+The typed text matches a name if its characters appear in the name in the
+same order (ignoring the case). The names that can't contain the characters
+are discarded comparing bitmasks of the characters precomputed for each
+name, before searching the subsequence."""
+
+import os
+import re
+import sqlite3
+from heapq import nsmallest
+
+from ninja_ide import resources
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.completion.completion_ranking')
+
+db_path = os.path.join(resources.NINJA_KNOWLEDGE_PATH, 'selections.db')
+
+# Scores of the different kinds of match
+PREFIX_CASE = 400
+PREFIX = 300
+INITIALS = 200
+SUBSTRING = 150
+SUBSEQUENCE = 100
+# Score added each time a name was selected, up to MAX_SELECTIONS times
+SELECTION = 10
+MAX_SELECTIONS = 20
+MAX_SCORE = PREFIX_CASE + SELECTION * MAX_SELECTIONS
+# The system names beginning in '__' are kept after the others
+PRIVATE = -MAX_SCORE
+# Longer names are ranked as if they had this length
+MAX_LENGTH = 64
+
+# Bit of each character in the masks: letters, digits and '_'
+_BITS = dict([(chr(code), 1 << index) for index, code in
+              enumerate(list(range(ord('a'), ord('z') + 1)) +
+                        list(range(ord('0'), ord('9') + 1)) + [ord('_')])])
+_INITIALS = re.compile('(?:^|(?<=_))[A-Za-z0-9]|[A-Z]')
+
+__rankers = {}
+
+
+def char_mask(text):
+    """Return the bitmask of the characters of the lowercase text."""
+    mask = 0
+    for char in set(text):
+        mask |= _BITS.get(char, 0)
+    return mask
+
+
+def create_candidates(names):
+    """Return the data precomputed to rank the names, names is a list of
+    (name, kind) sorted by name. For each name the list contains:
+    (name, kind, lowercase name, mask, lowercase initials, order), the
+    order sorts the private names last, then by length and name."""
+    size = len(names)
+    candidates = []
+    for position, (name, kind) in enumerate(names):
+        lower = name.lower()
+        initials = ''.join(_INITIALS.findall(name)).lower()
+        order = min(len(name), MAX_LENGTH - 1) * size + position
+        if name.startswith('__'):
+            order -= PRIVATE * size * MAX_LENGTH
+        candidates.append((name, kind, lower, char_mask(lower), initials,
+                           order))
+    return candidates
+
+
+def get_ranker(project=''):
+    """Return the ranker shared by the editors of project."""
+    ranker = __rankers.get(project, None)
+    if ranker is None:
+        ranker = __rankers[project] = CompletionRanker(project)
+    return ranker
+
+
+def flush_rankers():
+    """Store the selections pending in all the rankers."""
+    for ranker in list(__rankers.values()):
+        ranker.flush()
+
+
+class CompletionRanker(object):
+    """Rank the candidates with the selections of one project, the
+    selections are stored in the disk."""
+
+    def __init__(self, project='', path=None):
+        self.project = project
+        self._path = path or db_path
+        self.selections = {}
+        # {name: score added by its selections}
+        self._boosts = {}
+        # {name: count} selected since the last flush
+        self._pending = {}
+        self._initialize_db()
+        self._load()
+
+    def _connect(self):
+        return sqlite3.connect(self._path)
+
+    def _initialize_db(self):
+        try:
+            selections_db = self._connect()
+            cur = selections_db.cursor()
+            cur.execute("create table if not exists "
+                        "selections(project text, name text, "
+                        "count integer, PRIMARY KEY (project, name))")
+            selections_db.commit()
+            selections_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not initialize the selections: %r' % reason)
+
+    def _load(self):
+        try:
+            selections_db = self._connect()
+            cur = selections_db.cursor()
+            cur.execute("SELECT name, count FROM selections "
+                        "WHERE project=?", (self.project,))
+            self.selections = dict(cur.fetchall())
+            selections_db.close()
+            for name, count in self.selections.items():
+                self._boosts[name] = SELECTION * min(count, MAX_SELECTIONS)
+        except sqlite3.Error as reason:
+            logger.error('Could not read the selections: %r' % reason)
+
+    def record(self, name):
+        """The user selected name, rank it higher the next times."""
+        count = self.selections.get(name, 0) + 1
+        self.selections[name] = count
+        self._boosts[name] = SELECTION * min(count, MAX_SELECTIONS)
+        self._pending[name] = count
+
+    def flush(self):
+        """Store the selections made since the last flush at once."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            selections_db = self._connect()
+            cur = selections_db.cursor()
+            cur.executemany("INSERT OR REPLACE INTO selections "
+                            "values (?, ?, ?)",
+                            [(self.project, name, count)
+                             for name, count in pending.items()])
+            selections_db.commit()
+            selections_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not store the selections: %r' % reason)
+            # Kept for the next flush, unless selected again meanwhile
+            for name, count in pending.items():
+                self._pending.setdefault(name, count)
+
+    def rank(self, pattern, candidates, limit=None):
+        """Return the [(kind, name)] of candidates matching pattern, the
+        best ranked first, then the shortest and in alphabetical order.
+
+        candidates is the list returned by create_candidates."""
+        boosts = self._boosts
+        lower_pattern = pattern.lower()
+        size = len(candidates)
+        # Each candidate is ranked with an integer to sort them quickly:
+        # (MAX_SCORE - score) * scale + the order of the candidate
+        scale = size * MAX_LENGTH
+        if not lower_pattern:
+            ranks = [(MAX_SCORE - boosts.get(item[0], 0)) * scale + item[5]
+                     for item in candidates]
+        elif len(lower_pattern) == 1:
+            # A single character is always a substring of the matches
+            ranks = [(MAX_SCORE - boosts.get(item[0], 0) -
+                      ((PREFIX_CASE if item[0][0] == pattern else PREFIX)
+                       if item[2][0] == lower_pattern else
+                       INITIALS if item[4][:1] == lower_pattern else
+                       SUBSTRING)) * scale + item[5]
+                     for item in candidates if lower_pattern in item[2]]
+        else:
+            pattern_mask = char_mask(lower_pattern)
+            search = re.compile('.*?'.join(
+                [re.escape(char) for char in lower_pattern])).search
+            length = len(lower_pattern)
+            ranks = [(MAX_SCORE - boosts.get(item[0], 0) -
+                      ((PREFIX_CASE if item[0].startswith(pattern)
+                        else PREFIX)
+                       if item[2].startswith(lower_pattern) else
+                       INITIALS if item[4].startswith(lower_pattern) else
+                       SUBSTRING if lower_pattern in item[2] else
+                       _subsequence_score(match, length))) * scale + item[5]
+                     for item, match in
+                     [(item, search(item[2])) for item in candidates
+                      if not pattern_mask & ~item[3]] if match]
+        if limit is None:
+            ranks.sort()
+        else:
+            ranks = nsmallest(limit, ranks)
+        names = [candidates[rank % size] for rank in ranks]
+        return [(item[1], item[0]) for item in names]
+
+
+def _subsequence_score(match, length):
+    """Score a subsequence match, lower as more characters are skipped."""
+    return max(0, SUBSEQUENCE - (match.end() - match.start() - length))
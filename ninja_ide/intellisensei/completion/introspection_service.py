@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+from threading import Lock
+from multiprocessing import Process, Pipe
+
+from ninja_ide.intellisensei.completion import completer
+from ninja_ide.intellisensei.completion import completion_index
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.intellisensei.completion.introspection')
+
+__service_instance = None
+# Seconds to wait for the process before considering it blocked
+TIMEOUT = 5
+# Amount of completions kept by the process
+CACHE_SIZE = 512
+
+
+def IntrospectionService():
+    global __service_instance
+    if __service_instance is None:
+        __service_instance = __IntrospectionService()
+    return __service_instance
+
+
+def shutdown_service():
+    global __service_instance
+    if __service_instance is not None:
+        __service_instance.shutdown()
+    __service_instance = None
+
+
+class LRUCache(object):
+    """Keep the last used values up to size."""
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def put(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class __IntrospectionService(object):
+    """Run completer.get_all_completions in a long-lived process, so the
+    modules are imported only once and outside the IDE process."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._process = None
+        self._connection = None
+        self._start()
+
+    def _start(self):
+        self._connection, child_connection = Pipe()
+        self._process = _IntrospectionProcess(child_connection)
+        self._process.start()
+
+    def _restart(self):
+        self._process.terminate()
+        self._connection.close()
+        self._start()
+
+    def get_all_completions(self, s, imports=None):
+        """Same as completer.get_all_completions."""
+        self._lock.acquire()
+        try:
+            return self._request(s, imports)
+        finally:
+            self._lock.release()
+
+    def _request(self, s, imports):
+        if not self._process.is_alive():
+            self._start()
+        try:
+            self._connection.send((s, imports))
+            if self._connection.poll(TIMEOUT):
+                return self._connection.recv()
+            logger.error('Introspection of %r took too long' % s)
+        except (EOFError, IOError) as reason:
+            logger.error('Introspection of %r failed: %r' % (s, reason))
+        # Blocked by an import or dead, start again with a clean process
+        self._restart()
+        return {}
+
+    def shutdown(self):
+        self._lock.acquire()
+        try:
+            self._connection.send(None)
+        except IOError:
+            pass
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+        self._lock.release()
+
+
+class _IntrospectionProcess(Process):
+
+    def __init__(self, connection):
+        super(_IntrospectionProcess, self).__init__()
+        self.daemon = True
+        self.connection = connection
+
+    def run(self):
+        cache = LRUCache(CACHE_SIZE)
+        while True:
+            try:
+                request = self.connection.recv()
+            except (EOFError, IOError):
+                break
+            if request is None:
+                break
+            s, imports = request
+            try:
+                result = self._get_completions(cache, s, imports)
+            except Exception as reason:
+                logger.error('get_all_completions fail: %r' % reason)
+                result = {}
+            self.connection.send(result)
+
+    def _get_completions(self, cache, s, imports):
+        """Return the completions from the cache if possible, the results
+        without prefix are kept in an index to search any prefix."""
+        dots = s.rsplit('.', 1)
+        if len(dots) == 1:
+            return completer.get_all_completions(s, imports)
+        path, prefix = dots
+        index = cache.get((path, ''))
+        if index is not None:
+            return index.search(prefix)
+        result = cache.get((path, prefix))
+        if result is None:
+            result = completer.get_all_completions(s, imports)
+            if not result:
+                return result
+            if prefix:
+                cache.put((path, prefix), result)
+            else:
+                cache.put((path, ''),
+                          completion_index.CompletionIndex(result))
+        return result
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import token as tkn
+from tokenize import generate_tokens, TokenError
+
+
+# Lines between each point where the tokenization can be resumed
+CHECKPOINT_LINES = 50
+
+
+class TokenCache(object):
+    """Keep the tokens of the text before the cursor between completion
+    requests.
+
+    Every CHECKPOINT_LINES lines the state of the tokenizer is saved
+    (the position, the tokens until there and the indentation stack), so
+    a new text is only tokenized from the last checkpoint before the
+    first change."""
+
+    def __init__(self, checkpoint_lines=CHECKPOINT_LINES):
+        self.checkpoint_lines = checkpoint_lines
+        self._text = ''
+        self._tokens = []
+        # [(offset, line_number, token_count, indent_stack)]
+        self._checkpoints = [(0, 0, 0, ())]
+
+    def tokenize(self, code):
+        """Return the list of (type, string, position, line) tokens of code.
+
+        The returned list is owned by the cache and must not be modified.
+        An unbalanced brace at the end is ignored, IndentationError is
+        raised as generate_tokens does."""
+        index = self._valid_checkpoint(code)
+        del self._checkpoints[index + 1:]
+        offset, line_number, token_count, indents = self._checkpoints[index]
+        del self._tokens[token_count:]
+        self._text = code
+        try:
+            self._tokenize_from(offset, line_number, list(indents))
+        except TokenError:
+            # Possible an unbalanced brace like: func(os.p| (| = cursor-end)
+            pass
+        return self._tokens
+
+    def _valid_checkpoint(self, code):
+        """Return the index of the last checkpoint whose previous text
+        is the same in code."""
+        for index in range(1, len(self._checkpoints)):
+            start = self._checkpoints[index - 1][0]
+            offset = self._checkpoints[index][0]
+            if offset > len(code) or \
+               not code.startswith(self._text[start:offset], start):
+                return index - 1
+        return len(self._checkpoints) - 1
+
+    def _tokenize_from(self, offset, line_number, indents):
+        lines = self._text[offset:].split('\n')
+        lines = [line + '\n' for line in lines[:-1]] + [lines[-1]]
+        starts = [offset]
+        for line in lines:
+            starts.append(starts[-1] + len(line))
+        # Restore the indentation stack of the tokenizer with one line for
+        # each level, the tokens of these lines are discarded
+        prefix = ['%spass\n' % indent for indent in indents]
+        shift = line_number - len(prefix)
+        source = iter(prefix + lines)
+        readline = lambda: next(source, '')
+        last_checkpoint = line_number
+        for tkn_type, tkn_str, pos, _, line in generate_tokens(readline):
+            if pos[0] <= len(prefix):
+                continue
+            row = pos[0] + shift
+            self._tokens.append((tkn_type, tkn_str, (row, pos[1]), line))
+            if tkn_type == tkn.INDENT:
+                indents.append(tkn_str)
+            elif tkn_type == tkn.DEDENT:
+                indents.pop()
+            elif tkn_type == tkn.NEWLINE and \
+                    row - last_checkpoint >= self.checkpoint_lines and \
+                    row - line_number < len(lines):
+                # The next line starts a new statement
+                last_checkpoint = row
+                self._checkpoints.append((starts[row - line_number], row,
+                                          len(self._tokens), tuple(indents)))
@@ -18,6 +18,7 @@ import _ast
 import ast
 
 from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.intellisensei.analyzer import parse_cache
 
 from ninja_ide.tools.logger import NinjaLogger
 
@@ -148,15 +149,24 @@ def _parse_function(symbol, with_docstrings):
 
 def obtain_symbols(source, with_docstrings=False, filename='',
                    simple=False, only_simple=False):
-    """Parse a module source code to obtain: Classes, Functions and Assigns."""
+    """Parse a module source code to obtain: Classes, Functions and Assigns.
+
+    The symbols of the same source are shared by all the callers, they
+    must not be modified."""
     try:
-        module = ast.parse(source)
-    except:
+        return parse_cache.get_cache().get_table(
+            source, ('symbols', with_docstrings, simple, only_simple),
+            lambda module: _obtain_symbols(module, with_docstrings, simple,
+                                           only_simple))
+    except (SyntaxError, TypeError, ValueError):
         logger_symbols.debug("The file contains syntax errors: %s" % filename)
         if simple:
             return {}, {}
         else:
             return {}
+
+
+def _obtain_symbols(module, with_docstrings, simple, only_simple):
     symbols = {}
     symbols_simplified = {}
     globalAttributes = {}
@@ -210,9 +220,9 @@ def obtain_symbols(source, with_docstrings=False, filename='',
 def obtain_imports(source='', body=None):
     if source:
         try:
-            module = ast.parse(source)
+            module = parse_cache.get_cache().parse(source)
             body = module.body
-        except:
+        except (SyntaxError, TypeError, ValueError):
             logger_imports.debug("A file contains syntax errors.")
     #Imports{} = {name: asname}, for example = {sys: sysAlias}
     imports = {}
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Search the symbols of the locator by the fuzzy match of their names.
+
+The text is matched ignoring the case, and the matches are ranked in
+tiers, the best first:
+
+    PREFIX       the name starts with the text
+    INITIALS     the initials of the words start with the text: 'gtt'
+                 for get_text_type or getTextType
+    BOUNDARY     the text is at the start of a word of the name
+    SUBSTRING    the text is inside the name
+    SUBSEQUENCE  the characters of the text are in the name in order,
+                 from the start of a word, the ones matching at the start
+                 of the words first
+
+The words are split by the non alphanumeric characters and by the
+uppercase letters of camelCase. Each tier is searched in the structures
+precomputed for the distinct names: the names and initials sorted to
+find the prefixes with bisect, the names containing each trigram, the
+names with a word starting with each character, and the bitmask of the
+characters of each name. The tiers are searched until enough symbols are
+found, so most searches don't depend on the amount of symbols indexed."""
+
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from ninja_ide.intellisensei.completion.completion_ranking import char_mask
+
+
+PREFIX = 0
+INITIALS = 1
+BOUNDARY = 2
+SUBSTRING = 3
+SUBSEQUENCE = 4
+
+# Length of the n-grams indexed
+GRAM = 3
+
+
+def base_name(name):
+    """Return name without the arguments of the classes and functions."""
+    index = name.find('(')
+    if index != -1:
+        return name[:index]
+    return name
+
+
+# The alphanumeric characters after other characters, and the uppercase
+# letters after lowercase letters or digits
+_WORD_START = re.compile(r'(?<![^\W_])[^\W_]|(?<=[a-z0-9])[A-Z]', re.UNICODE)
+
+
+def word_starts(name):
+    """Return the positions where the words of name start."""
+    return tuple([match.start() for match in _WORD_START.finditer(name)])
+
+
+def _append(postings, keys, name_id):
+    for key in keys:
+        posting = postings.get(key, None)
+        if posting is None:
+            posting = postings[key] = array('i')
+        posting.append(name_id)
+
+
+def _describe(name):
+    """Return (lowercase, word starts, lowercase initials) of name."""
+    starts = word_starts(name)
+    initials = ''.join([name[start] for start in starts]).lower()
+    return name.lower(), starts, initials
+
+
+def _subsequence(pattern):
+    return re.compile('.*?'.join([re.escape(char) for char in pattern]),
+                      re.UNICODE).search
+
+
+def _subsequence_cost(pattern, lower, starts):
+    """Return the amount of characters of pattern that don't continue the
+    previous one or start a word, matching the starts of the words when
+    possible."""
+    cost = 0
+    position = -1
+    for char in pattern:
+        if lower[position + 1:position + 2] == char:
+            position += 1
+            continue
+        following = [start for start in starts
+                     if start > position and lower[start] == char]
+        if following:
+            position = following[0]
+        else:
+            position = lower.find(char, position + 1)
+            if position == -1:
+                # Skipping to the words consumed characters needed later
+                return len(pattern)
+            cost += 1
+    return cost
+
+
+def _head(pattern, lower, starts):
+    """Return the first word start of lower with the first character of
+    pattern, or None."""
+    for start in starts:
+        if lower[start] == pattern[0]:
+            return start
+    return None
+
+
+def _rank(pattern, search, lower, starts, initials):
+    """Return the (tier, cost) of the match of pattern or None."""
+    if lower.startswith(pattern):
+        return PREFIX, 0
+    if initials.startswith(pattern):
+        return INITIALS, 0
+    position = lower.find(pattern)
+    if position != -1:
+        for start in starts:
+            if start >= position and lower.startswith(pattern, start):
+                return BOUNDARY, start
+        return SUBSTRING, position
+    head = _head(pattern, lower, starts)
+    if head is not None and search(lower, head) is not None:
+        return SUBSEQUENCE, _subsequence_cost(pattern, lower, starts)
+    return None
+
+
+def sort_matches(pattern, items, key=None):
+    """Return the items whose key (or the items if key is None) matches
+    pattern, the best first. For the short lists of the locator."""
+    lower_pattern = pattern.lower()
+    if not lower_pattern:
+        return list(items)
+    search = _subsequence(lower_pattern)
+    ranked = []
+    for position, item in enumerate(items):
+        lower, starts, initials = _describe(
+            key(item) if key is not None else item)
+        rank = _rank(lower_pattern, search, lower, starts, initials)
+        if rank is not None:
+            ranked.append((rank, len(lower), lower, position, item))
+    ranked.sort(key=lambda match: match[:4])
+    return [match[-1] for match in ranked]
+
+
+class FuzzyIndex(object):
+    """The names of the symbols, to find the best matches of a text.
+
+    The symbols are identified by an integer and have a name and a kind.
+    The data is kept for each distinct name: the names removed are kept
+    (without symbols) to be reused if they are added again."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Data of the names, by name id
+        self._lowers = []
+        self._starts = []
+        self._initials = []
+        self._symbols = []
+        # {name: name id}
+        self._ids = {}
+        # {kind: set of symbol ids}
+        self._kinds = {}
+        self._masks = []
+        # {character or n-gram: array of the name ids containing it}
+        self._chars = {}
+        self._grams = {}
+        # {character: array of the name ids with a word starting with it}
+        self._heads = {}
+        # [(lowercase, name id)] and [(initials, name id)], sorted before
+        # searching if there are new names
+        self._by_name = []
+        self._by_initials = []
+        self._sorted = True
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _name_id(self, name):
+        name_id = self._ids.get(name, None)
+        if name_id is None:
+            name_id = self._ids[name] = len(self._lowers)
+            lower, starts, initials = _describe(name)
+            self._lowers.append(lower)
+            self._starts.append(starts)
+            self._initials.append(initials)
+            self._symbols.append(set())
+            self._masks.append(char_mask(lower))
+            _append(self._chars, set(lower), name_id)
+            _append(self._heads, set([lower[start] for start in starts]),
+                    name_id)
+            _append(self._grams, set([lower[index:index + GRAM] for index
+                                      in range(len(lower) - GRAM + 1)]),
+                    name_id)
+            self._by_name.append((lower, name_id))
+            self._by_initials.append((initials, name_id))
+            self._sorted = False
+        return name_id
+
+    def add(self, symbol_id, name, kind):
+        self.add_all([(symbol_id, name, kind)])
+
+    def add_all(self, symbols):
+        """Add the (symbol id, name, kind) of symbols."""
+        with self._lock:
+            for symbol_id, name, kind in symbols:
+                names = self._symbols[self._name_id(base_name(name))]
+                if symbol_id not in names:
+                    names.add(symbol_id)
+                    kinds = self._kinds.get(kind, None)
+                    if kinds is None:
+                        kinds = self._kinds[kind] = set()
+                    kinds.add(symbol_id)
+                    self._count += 1
+
+    def remove(self, symbol_id, name, kind):
+        with self._lock:
+            name_id = self._ids.get(base_name(name), None)
+            if name_id is not None and symbol_id in self._symbols[name_id]:
+                self._symbols[name_id].discard(symbol_id)
+                self._kinds[kind].discard(symbol_id)
+                self._count -= 1
+
+    def match(self, pattern, kinds=None, limit=None):
+        """Return the ids of up to limit symbols of the kinds matching
+        pattern, the best ranked first, then by name."""
+        lower = pattern.lower()
+        results = []
+        with self._lock:
+            if not self._sorted:
+                self._by_name.sort()
+                self._by_initials.sort()
+                self._sorted = True
+            buckets = None
+            if kinds is not None:
+                buckets = [self._kinds[kind] for kind in kinds
+                           if kind in self._kinds]
+            seen = set()
+            tiers = (self._prefixed(self._by_name, lower, seen),
+                     self._prefixed(self._by_initials, lower, seen),
+                     self._substrings(lower, seen),
+                     self._subsequences(lower, seen))
+            for tier in tiers:
+                for name_id in tier:
+                    symbols = self._symbols[name_id]
+                    if buckets is not None:
+                        symbols = [symbol for bucket in buckets
+                                   for symbol in symbols & bucket]
+                    results.extend(sorted(symbols))
+                    if limit is not None and len(results) >= limit:
+                        return results[:limit]
+        return results
+
+    def _prefixed(self, names, pattern, seen):
+        """Yield the ids of the names whose keys start with pattern."""
+        index = bisect_left(names, (pattern,))
+        while index < len(names):
+            key, name_id = names[index]
+            if not key.startswith(pattern):
+                break
+            if name_id not in seen:
+                seen.add(name_id)
+                yield name_id
+            index += 1
+
+    def _candidates(self, pattern, postings):
+        """Return the shortest posting of the parts of pattern."""
+        shortest = None
+        for part in pattern:
+            posting = postings.get(part, None)
+            if posting is None:
+                return ()
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        return shortest or ()
+
+    def _substrings(self, pattern, seen):
+        if len(pattern) >= GRAM:
+            candidates = self._candidates(
+                [pattern[index:index + GRAM]
+                 for index in range(len(pattern) - GRAM + 1)], self._grams)
+        else:
+            candidates = self._candidates(pattern, self._chars)
+        ranked = []
+        for name_id in candidates:
+            lower = self._lowers[name_id]
+            position = lower.find(pattern)
+            if position == -1 or name_id in seen:
+                continue
+            tier = SUBSTRING
+            for start in self._starts[name_id]:
+                if start >= position and lower.startswith(pattern, start):
+                    tier = BOUNDARY
+                    position = start
+                    break
+            ranked.append((tier, position, len(lower), lower, name_id))
+        ranked.sort()
+        for match in ranked:
+            seen.add(match[-1])
+            yield match[-1]
+
+    def _subsequences(self, pattern, seen):
+        search = _subsequence(pattern)
+        pattern_mask = char_mask(pattern)
+        masks = self._masks
+        ranked = []
+        for name_id in self._heads.get(pattern[0], ()):
+            if pattern_mask & ~masks[name_id] or name_id in seen:
+                continue
+            lower = self._lowers[name_id]
+            starts = self._starts[name_id]
+            if search(lower, _head(pattern, lower, starts)) is None:
+                continue
+            ranked.append((_subsequence_cost(pattern, lower, starts),
+                           len(lower), lower, name_id))
+        ranked.sort()
+        for match in ranked:
+            seen.add(match[-1])
+            yield match[-1]
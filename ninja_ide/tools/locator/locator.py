@@ -18,8 +18,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import os
-import sqlite3
-import pickle
+import multiprocessing
 try:
     import Queue
 except:
@@ -29,24 +28,38 @@ from PyQt4.QtGui import QMessageBox
 from PyQt4.QtCore import QObject
 from PyQt4.QtCore import QThread
 from PyQt4.QtCore import QDir
-from PyQt4.QtCore import QFile
-from PyQt4.QtCore import QTextStream
+from PyQt4.QtCore import QTimer
 from PyQt4.QtCore import SIGNAL
 
-from ninja_ide import resources
 from ninja_ide import translations
 from ninja_ide.extensions import handlers
 from ninja_ide.gui.ide import IDE
 from ninja_ide.core.file_handling import file_manager
+from ninja_ide.core.file_handling.filesystem_notifications import (
+    NinjaFileSystemWatcher)
 from ninja_ide.core import settings
+from ninja_ide.tools import introspection
+from ninja_ide.tools.locator import project_snapshot
+from ninja_ide.tools.locator import symbol_extractor
+from ninja_ide.tools.locator import symbol_index
 
 from ninja_ide.tools.logger import NinjaLogger
 
 
 logger = NinjaLogger('ninja_ide.tools.locator')
 
-mapping_symbols = {}
 files_paths = {}
+# The projects crawled, updated with the changes of their files
+snapshot = project_snapshot.ProjectSnapshot(files_paths)
+
+# Milliseconds to wait for more changes before indexing them
+CHANGES_DELAY = 500
+# Levels of imports followed from a file to find the definitions
+IMPORT_DEPTH = 2
+# Files removed from the index in each tick of the collection, and
+# milliseconds between the ticks
+COLLECT_BATCH = 50
+COLLECT_INTERVAL = 200
 
 
 #@ FILES
@@ -67,24 +80,8 @@ FILTERS = {
     'tabs': '/',
     'lines': ':'}
 
-
-db_path = os.path.join(resources.NINJA_KNOWLEDGE_PATH, 'locator.db')
-
-
-def _initialize_db():
-    locator_db = sqlite3.connect(db_path)
-    cur = locator_db.cursor()
-    cur.execute("create table if not exists "
-                "locator(path text PRIMARY KEY, stat integer, data blob)")
-    locator_db.commit()
-    locator_db.close()
-
-
-# Initialize Database and open connection
-_initialize_db()
-
-
-#TODO: Clean non existent paths from the DB
+# Kinds of the symbols inside the files
+SYMBOL_KINDS = (FILTERS['classes'], FILTERS['functions'], FILTERS['attribs'])
 
 
 class GoToDefinition(QObject):
@@ -152,20 +149,120 @@ class ResultItem(object):
         return self.name[index]
 
 
+class Locations(object):
+    """The symbols of the index found by a query, sorted by name (or by
+    the rank of the match when searching a text).
+
+    The ResultItem are only created for the pages of symbols requested
+    (the ones shown by the locator), and kept to be shown again, the rest
+    are kept in the database."""
+
+    PAGE_SIZE = 500
+
+    def __init__(self, index, **query):
+        self._index = index
+        self._query = query
+        self._count = None
+        self._loaded = []
+        self._complete = False
+
+    def _load(self, stop=None):
+        """Load the pages of items until stop, or all if it's None."""
+        while not self._complete and (stop is None or
+                                      len(self._loaded) < stop):
+            rows = self._index.search(offset=len(self._loaded),
+                                      limit=self.PAGE_SIZE, **self._query)
+            self._loaded += [ResultItem(symbol_type=kind, name=name,
+                                        path=path, lineno=line)
+                             for kind, name, path, line in rows]
+            self._complete = len(rows) < self.PAGE_SIZE
+
+    def complete(self):
+        """Return the list of all the items if they are loaded, or None."""
+        if self._complete:
+            return self._loaded
+        return None
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = key.start or 0, key.stop
+            if start < 0 or (stop is not None and stop < 0):
+                start, stop, step = key.indices(len(self))
+            self._load(stop)
+            return self._loaded[start:stop]
+        if key < 0:
+            key += len(self)
+        self._load(key + 1)
+        if not 0 <= key < len(self._loaded):
+            raise IndexError(key)
+        return self._loaded[key]
+
+    def __len__(self):
+        if self._complete:
+            return len(self._loaded)
+        if self._count is None:
+            self._count = self._index.count(**self._query)
+        return self._count
+
+    def __nonzero__(self):
+        self._load(1)
+        return len(self._loaded) > 0
+
+    __bool__ = __nonzero__
+
+    def __iter__(self):
+        index = 0
+        while True:
+            self._load(index + self.PAGE_SIZE)
+            for item in self._loaded[index:]:
+                yield item
+            index = len(self._loaded)
+            if self._complete:
+                break
+
+
 class LocateSymbolsThread(QThread):
 
     def __init__(self):
         super(LocateSymbolsThread, self).__init__()
         self.results = []
         self._cancel = False
-        self.locations = []
         self.execute = None
-        self.dirty = False
         self._search = None
         self._isVariable = None
 
         # Locator Knowledge
-        self._locator_db = None
+        self._index = symbol_index.get_index()
+        # {path: mtime} of the files indexed before the crawl
+        self._indexed = {}
+        # Projects to crawl and ([paths to index], [paths to remove])
+        self._new_projects = []
+        self._changes = ([], [])
+        self._changes_timer = QTimer(self)
+        self._changes_timer.setSingleShot(True)
+        self.connect(self._changes_timer, SIGNAL("timeout()"),
+                     self.find_changes_location)
+        # Paths to remove from the index while the thread is idle
+        self._garbage = []
+        self._collect_timer = QTimer(self)
+        self.connect(self._collect_timer, SIGNAL("timeout()"),
+                     self._collect_garbage)
+        self.connect(self, SIGNAL("finished()"), self._start_collection)
+        self.connect(self, SIGNAL("finished()"), self._restart_changes)
+        # The compaction of the index can't be cancelled, the projects
+        # are crawled when it ends instead of waiting for it
+        self._compacting = False
+        self._crawl_after_compact = False
+        self.connect(self, SIGNAL("finished()"), self._end_compaction)
+
+    def watch_changes(self):
+        """Index the files of the projects when they change."""
+        self.connect(NinjaFileSystemWatcher,
+                     SIGNAL("fileChanged(int, QString)"), self.file_changed)
+
+    def file_changed(self, event, path):
+        if snapshot.file_changed(event, path):
+            self._changes_timer.start(CHANGES_DELAY)
 
     def find(self, search, filePath, isVariable):
         self.cancel()
@@ -177,17 +274,74 @@ class LocateSymbolsThread(QThread):
         self.start()
 
     def find_code_location(self):
+        """Crawl the projects opened since the last time, the rest are
+        kept updated by file_changed. If the watcher can't notify the
+        changes, all the projects are crawled and only the files modified
+        since they were indexed are parsed."""
+        if self._compacting:
+            self._crawl_after_compact = True
+            return
         self.cancel()
         self.wait()
         self._cancel = False
-        if not self.isRunning():
-            global mapping_symbols
-            global files_paths
-            mapping_symbols = {}
-            files_paths = {}
+        ide = IDE.get_service('ide')
+        projects = ide.filesystem.get_projects() if ide else {}
+        for path in snapshot.projects():
+            if path not in projects:
+                snapshot.remove_project(path)
+                NinjaFileSystemWatcher.remove_watch(path)
+        crawl_all = not NinjaFileSystemWatcher.watches_folders
+        self._new_projects = [nproject for nproject in projects.values()
+                              if crawl_all or
+                              not snapshot.has_project(nproject.path)]
+        for nproject in self._new_projects:
+            if not snapshot.has_project(nproject.path):
+                snapshot.add_project(nproject.path, nproject.extensions)
+                NinjaFileSystemWatcher.add_watch(nproject.path)
+        if self._new_projects and not self.isRunning():
             self.execute = self.locate_code
             self.start()
 
+    def find_changes_location(self):
+        if self.isRunning():
+            self._changes_timer.start(CHANGES_DELAY)
+        elif snapshot.has_pending():
+            self._changes = snapshot.take_pending()
+            self.execute = self.locate_changes
+            self.start()
+
+    def _restart_changes(self):
+        if snapshot.has_pending() and not self._changes_timer.isActive():
+            self._changes_timer.start(CHANGES_DELAY)
+
+    def _start_collection(self):
+        if self._garbage and not self._collect_timer.isActive():
+            self._collect_timer.start(COLLECT_INTERVAL)
+
+    def _collect_garbage(self):
+        """Remove a few files found by the last collection, and compact
+        the index in the thread when they are removed and it has enough
+        free space."""
+        if self.isRunning():
+            return
+        if self._garbage:
+            batch = self._garbage[:COLLECT_BATCH]
+            del self._garbage[:COLLECT_BATCH]
+            self._index.remove_files(batch)
+        else:
+            self._collect_timer.stop()
+            if self._index.needs_compact():
+                self._compacting = True
+                self.execute = self._index.compact
+                self.start()
+
+    def _end_compaction(self):
+        if self._compacting:
+            self._compacting = False
+            if self._crawl_after_compact:
+                self._crawl_after_compact = False
+                self.find_code_location()
+
     def find_file_code_location(self, path):
         self._file_path = path
         if not self._file_path:
@@ -198,44 +352,39 @@ class LocateSymbolsThread(QThread):
 
     def run(self):
         self.results = []
-        self.locations = []
+        # Load the names to search them before the locator is opened
+        self._index.load_matcher()
         self.execute()
         if self._cancel:
             self.results = []
-            self.locations = []
         self._cancel = False
         self._search = None
         self._isVariable = None
-        if self._locator_db is not None:
-            self._locator_db.commit()
-            self._locator_db.close()
-            self._locator_db = None
-
-    def _save_file_symbols(self, path, stat, data):
-        if self._locator_db is not None:
-            pdata = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
-            cur = self._locator_db.cursor()
-            cur.execute("INSERT OR REPLACE INTO locator values (?, ?, ?)",
-                        (path, stat, sqlite3.Binary(pdata)))
-            self._locator_db.commit()
-
-    def _get_file_symbols(self, path):
-        if self._locator_db is not None:
-            cur = self._locator_db.cursor()
-            cur.execute("SELECT * FROM locator WHERE path=:path",
-                        {'path': path})
-            return cur.fetchone()
+        self._indexed = {}
+        self._index.commit()
 
-    def locate_code(self):
-        self._locator_db = sqlite3.connect(db_path)
+    def _project_paths(self):
         ide = IDE.get_service('ide')
-        projects = ide.filesystem.get_projects()
-        if not projects:
-            return
-        projects = list(projects.values())
+        if ide is None:
+            return []
+        return list(ide.filesystem.get_projects().keys())
+
+    def locate_code(self):
+        projects = self._new_projects
+        self._new_projects = []
+        # The files of the projects crawled are kept
+        inside = tuple([nproject.path.rstrip(os.sep) + os.sep
+                        for nproject in projects])
+        self._garbage = [path for path in self._garbage
+                         if not path.startswith(inside)]
+        self._index.begin()
+        self._indexed = self._index.get_mtimes(
+            [nproject.path for nproject in projects])
         for nproject in projects:
             if self._cancel:
-                break
+                # Crawl it again the next time
+                snapshot.remove_project(nproject.path)
+                continue
             current_dir = QDir(nproject.path)
             #Skip not readable dirs!
             if not current_dir.isReadable():
@@ -243,12 +392,39 @@ class LocateSymbolsThread(QThread):
 
             queue_folders = Queue.Queue()
             queue_folders.put(current_dir)
-            files_paths[nproject.path] = list()
-            self.__locate_code_in_project(queue_folders, nproject)
-        self.dirty = True
-        self.get_locations()
+            project_files = []
+            self.__locate_code_in_project(queue_folders, nproject,
+                                          project_files)
+            self._index_files(project_files)
+            if self._cancel:
+                snapshot.remove_project(nproject.path)
+            else:
+                snapshot.set_files(nproject.path, project_files)
+                # Forget the files removed from the project
+                self._index.remove_files(
+                    set(self._index.get_mtimes([nproject.path])) -
+                    set(project_files))
+                self._index.mark_seen([nproject.path])
+        if settings.CLEAN_LOCATOR and not self._cancel:
+            settings.CLEAN_LOCATOR = False
+            self._index.commit()
+            # Removed in batches by _collect_garbage when the thread ends
+            self._garbage = self._index.garbage(self._project_paths())
+            logger.debug('Files to remove from the locator: %d' %
+                         len(self._garbage))
+
+    def locate_changes(self):
+        updated, removed = self._changes
+        self._changes = ([], [])
+        self._index.begin()
+        self._index.remove_files(removed)
+        self._index_files(updated)
+        if self._cancel:
+            # Indexed again by _restart_changes when the thread ends
+            snapshot.restore_pending(updated)
 
-    def __locate_code_in_project(self, queue_folders, nproject):
+    def __locate_code_in_project(self, queue_folders, nproject,
+                                 project_files):
         file_filter = QDir.Files | QDir.NoDotAndDotDot | QDir.Readable
         dir_filter = QDir.Dirs | QDir.NoDotAndDotDot | QDir.Readable
         while not self._cancel and not queue_folders.empty():
@@ -265,190 +441,151 @@ class LocateSymbolsThread(QThread):
             #all files in sub_dir first apply the filters
             current_files = current_dir.entryInfoList(
                 ['*{0}'.format(x) for x in nproject.extensions], file_filter)
-            #process all files in current dir!
-            global files_paths
-            for one_file in current_files:
-                try:
-                    self._grep_file_symbols(one_file.absoluteFilePath(),
-                                            one_file.fileName())
-                    files_paths[nproject.path].append(
-                        one_file.absoluteFilePath())
-                except Exception as reason:
-                    logger.error(
-                        '__locate_code_in_project, error: %r' % reason)
-                    logger.error(
-                        '__locate_code_in_project fail for file: %r' %
-                        one_file.absoluteFilePath())
+            project_files.extend([one_file.absoluteFilePath()
+                                  for one_file in current_files])
+
+    def _index_files(self, paths):
+        """Index the files changed since they were indexed. The Python
+        files are parsed by a pool of processes if there are many."""
+        exts = settings.SYNTAX.get('python')['extension']
+        parallel = []
+        serial = []
+        for path in paths:
+            try:
+                if self._indexed.get(path, None) == \
+                   symbol_extractor.get_mtime(path):
+                    continue
+            except OSError:
+                continue
+            file_ext = file_manager.get_file_extension(path)
+            if file_ext in exts and \
+               handlers.get_symbols_handler(file_ext) is introspection:
+                parallel.append(path)
+            else:
+                serial.append(path)
+        if len(parallel) < symbol_extractor.PARALLEL_MIN_FILES:
+            serial += parallel
+            parallel = []
+        else:
+            self.__locate_code_in_pool(parallel)
+        for path in serial:
+            if self._cancel:
+                break
+            try:
+                self._grep_file_symbols(path, file_manager.get_basename(path))
+            except Exception as reason:
+                logger.error('_index_files, error: %r' % reason)
+                logger.error('_index_files fail for file: %r' % path)
+
+    def __locate_code_in_pool(self, paths):
+        pool = multiprocessing.Pool(symbol_extractor.POOL_SIZE)
+        try:
+            for path, mtime, results, imports in pool.imap_unordered(
+                    symbol_extractor.extract_python_symbols, paths,
+                    symbol_extractor.CHUNK_SIZE):
+                if self._cancel:
+                    break
+                if mtime is None:
+                    logger.error('__locate_code_in_pool, error: %s' %
+                                 results)
+                    logger.error('__locate_code_in_pool fail for file: %r' %
+                                 path)
+                    continue
+                self._index.update_file(path, mtime, results, imports)
+        finally:
+            pool.terminate()
+            pool.join()
 
     def locate_file_code(self):
-        self._locator_db = sqlite3.connect(db_path)
         file_name = file_manager.get_basename(self._file_path)
         try:
             self._grep_file_symbols(self._file_path, file_name)
-            self.dirty = True
         except Exception as reason:
             logger.error('locate_file_code, error: %r' % reason)
 
     def go_to_definition(self):
-        self.dirty = True
+        """Find the definitions of the symbol in the index: those of the
+        file, or else of the nearest files it imports, or else those of
+        all the projects."""
         self.results = []
-        locations = self.get_locations()
+        roots = self._project_paths()
         if self._isVariable:
-            preResults = [
-                [file_manager.get_basename(x.path), x.path, x.lineno, '']
-                for x in locations
-                if (x.type == FILTERS['attribs']) and (x.name == self._search)]
+            kinds = (FILTERS['attribs'],)
         else:
-            preResults = [
-                [file_manager.get_basename(x.path), x.path, x.lineno, '']
-                for x in locations
-                if ((x.type == FILTERS['functions']) or
-                    (x.type == FILTERS['classes'])) and
-                   (x.name.startswith(self._search))]
-        for data in preResults:
-            file_object = QFile(data[1])
-            if not file_object.open(QFile.ReadOnly):
-                return
-
-            stream = QTextStream(file_object)
-            line_index = 0
-            line = stream.readLine()
-            while not self._cancel and not stream.atEnd():
-                if line_index == data[2]:
-                    data[3] = line
-                    self.results.append(data)
+            kinds = (FILTERS['functions'], FILTERS['classes'])
+        rows = self._index.definitions(self._search, kinds, roots)
+        if len(rows) > 1:
+            for scope in self._import_levels(self._filePath, roots):
+                scoped = [row for row in rows if row[2] in scope]
+                if scoped:
+                    rows = scoped
                     break
-                #take the next line!
-                line = stream.readLine()
-                line_index += 1
-
-    def get_locations(self):
-        if self.dirty:
-            self.convert_map_to_array()
-            self.dirty = False
-        return self.locations
+        self.results = [[file_manager.get_basename(path), path, line,
+                         preview]
+                        for kind, name, path, line, preview in rows]
+
+    def _import_levels(self, path, roots):
+        """Yield the set with path, then the sets of the files of the
+        projects imported at each level, up to IMPORT_DEPTH levels."""
+        scope = set([path])
+        level = [path]
+        files = None
+        yield scope
+        for depth in range(IMPORT_DEPTH):
+            modules = self._index.get_imports(level)
+            if not modules or self._cancel:
+                break
+            if files is None:
+                files = list(self._index.get_mtimes(roots).keys())
+            level = [imported for imported in
+                     symbol_extractor.imported_files(modules, files)
+                     if imported not in scope]
+            scope.update(level)
+            yield set(level)
+
+    def get_locations(self, text='', kind=None, path=None):
+        """Return the Locations of the projects with text in their name,
+        of the kind and inside the file path if they are given."""
+        query = {'text': text, 'path': path}
+        if kind is not None:
+            query['kinds'] = (kind,)
+        if path is None:
+            query['roots'] = self._project_paths()
+        return Locations(self._index, **query)
 
     def get_this_file_symbols(self, path):
-        global mapping_symbols
-        symbols = mapping_symbols.get(path, ())
+        symbols = []
         try:
-            if not symbols:
+            if not self._index.count(path=path):
                 file_name = file_manager.get_basename(path)
                 self._grep_file_symbols(path, file_name)
-                symbols = mapping_symbols.get(path, ())
-            symbols = sorted(symbols[1:], key=lambda item: item.name)
+            symbols = list(Locations(self._index, path=path,
+                                     kinds=SYMBOL_KINDS))
         except Exception as reason:
             logger.error('get_this_file_symbols, error: %r' % reason)
         return symbols
 
-    def convert_map_to_array(self):
-        global mapping_symbols
-        self.locations = [x for location in mapping_symbols
-                          for x in mapping_symbols[location]]
-        self.locations = sorted(self.locations, key=lambda item: item.name)
-
     def _grep_file_symbols(self, file_path, file_name):
-        #type - file_name - file_path
-        global mapping_symbols
         exts = settings.SYNTAX.get('python')['extension']
         file_ext = file_manager.get_file_extension(file_path)
-        if file_ext not in exts:
-            mapping_symbols[file_path] = [
-                ResultItem(symbol_type=FILTERS['non-python'], name=file_name,
-                           path=file_path, lineno=-1)]
-        else:
-            mapping_symbols[file_path] = [
-                ResultItem(symbol_type=FILTERS['files'], name=file_name,
-                           path=file_path, lineno=-1)]
-        data = self._get_file_symbols(file_path)
-        #FIXME: stat not int
-        mtime = int(os.stat(file_path).st_mtime)
-        if data is not None and (mtime == int(data[1])):
-            try:
-                results = pickle.loads(str(data[2]))
-                mapping_symbols[file_path] += results
-                return
-            except:
-                print "ResultItem couldn't be loaded, let's analyze it again'"
+        if self._indexed.get(file_path, None) == \
+           symbol_extractor.get_mtime(file_path):
+            return
         #obtain a symbols handler for this file extension
         symbols_handler = handlers.get_symbols_handler(file_ext)
-        if symbols_handler is None:
-            return
-        results = []
-        with open(file_path) as f:
-            content = f.read()
-            symbols = symbols_handler.obtain_symbols(
-                content,
-                filename=file_path)
-            self.__parse_symbols(symbols, results, file_path)
-
-        if results:
-            self._save_file_symbols(file_path, mtime, results)
-            mapping_symbols[file_path] += results
-
-    def __parse_symbols(self, symbols, results, file_path):
-        if "classes" in symbols:
-            self.__parse_class(symbols, results, file_path)
-        if 'attributes' in symbols:
-            self.__parse_attributes(symbols, results, file_path)
-        if 'functions' in symbols:
-            self.__parse_functions(symbols, results, file_path)
-
-    def __parse_class(self, symbols, results, file_path):
-        clazzes = symbols['classes']
-        for claz in clazzes:
-            line_number = clazzes[claz]['lineno'] - 1
-            members = clazzes[claz]['members']
-            results.append(ResultItem(symbol_type=FILTERS['classes'],
-                           name=claz, path=file_path,
-                           lineno=line_number))
-            if 'attributes' in members:
-                for attr in members['attributes']:
-                    line_number = members['attributes'][attr] - 1
-                    results.append(ResultItem(symbol_type=FILTERS['attribs'],
-                                   name=attr, path=file_path,
-                                   lineno=line_number))
-            if 'functions' in members:
-                for func in members['functions']:
-                    line_number = members['functions'][func]['lineno'] - 1
-                    results.append(ResultItem(
-                        symbol_type=FILTERS['functions'], name=func,
-                        path=file_path, lineno=line_number))
-                    self.__parse_symbols(
-                        members['functions'][func]['functions'],
-                        results, file_path)
-            if 'classes' in members:
-                self.__parse_class(members, results, file_path)
-
-    def __parse_attributes(self, symbols, results, file_path):
-        attributes = symbols['attributes']
-        for attr in attributes:
-            line_number = attributes[attr] - 1
-            results.append(ResultItem(symbol_type=FILTERS['attribs'],
-                           name=attr, path=file_path,
-                           lineno=line_number))
-
-    def __parse_functions(self, symbols, results, file_path):
-        functions = symbols['functions']
-        for func in functions:
-            line_number = functions[func]['lineno'] - 1
-            results.append(ResultItem(
-                symbol_type=FILTERS['functions'], name=func,
-                path=file_path, lineno=line_number))
-            self.__parse_symbols(functions[func]['functions'],
-                                 results, file_path)
+        mtime, results, imports = symbol_extractor.extract_symbols(
+            file_path, symbols_handler, file_ext in exts)
+        self._index.update_file(file_path, mtime, results, imports)
 
     def get_symbols_for_class(self, file_path, clazzName):
-        results = []
-        with open(file_path) as f:
-            content = f.read()
-            ext = file_manager.get_file_extension(file_path)
-            #obtain a symbols handler for this file extension
-            symbols_handler = handlers.get_symbols_handler(ext)
-            symbols = symbols_handler.obtain_symbols(content,
-                                                     filename=file_path)
-            self.__parse_symbols(symbols, results, file_path)
-        return results
+        ext = file_manager.get_file_extension(file_path)
+        #obtain a symbols handler for this file extension
+        symbols_handler = handlers.get_symbols_handler(ext)
+        mtime, results, imports = symbol_extractor.extract_symbols(
+            file_path, symbols_handler)
+        return [ResultItem(symbol_type=kind, name=name, path=file_path,
+                           lineno=line)
+                for kind, name, line, preview in results[1:]]
 
     def cancel(self):
         self._cancel = True
\ No newline at end of file
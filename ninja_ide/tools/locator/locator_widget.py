@@ -31,6 +31,8 @@ from ninja_ide.core.file_handling import file_manager
 from ninja_ide.tools import ui_tools
 from ninja_ide.gui.ide import IDE
 from ninja_ide.tools.locator import locator
+from ninja_ide.tools.locator import fuzzy_index
+from ninja_ide.tools.locator import narrowing_cache
 
 
 class LocatorWidget(QDialog):
@@ -59,6 +61,7 @@ class LocatorWidget(QDialog):
         self.connect(self.locate_symbols, SIGNAL("finished()"), self._cleanup)
         self.connect(self.locate_symbols, SIGNAL("terminated()"),
                      self._cleanup)
+        self.locate_symbols.watch_changes()
 
         # Locator things
         self.filterPrefix = re.compile(r'(@|<|>|-|!|\.|/|:)')
@@ -83,6 +86,8 @@ class LocatorWidget(QDialog):
             ("!", "NoPython")
         ]
         self._replace_symbol_type = {"<": "&lt;", ">": "&gt;"}
+        # Results of the prefixes typed, while they are extended
+        self._narrowing = narrowing_cache.NarrowingCache()
         self.reset_values()
 
         self._filter_actions = {
@@ -106,6 +111,7 @@ class LocatorWidget(QDialog):
         self.tempLocations = []
         self.items_in_page = 0
         self._line_jump = -1
+        self._narrowing.clear()
 
     def showEvent(self, event):
         """Method takes an event to show the Notification"""
@@ -120,6 +126,8 @@ class LocatorWidget(QDialog):
 
     def _cleanup(self):
         self.locate_symbols.wait()
+        # The results cached can be outdated
+        self._narrowing.clear()
 
     def explore_code(self):
         self.locate_symbols.find_code_location()
@@ -174,16 +182,21 @@ class LocatorWidget(QDialog):
         self._line_jump = -1
         self.items_in_page = 0
 
-        filterOptions = self.filterPrefix.split(self.__prefix.lstrip())
+        prefix = self.__prefix.lstrip()
+        filterOptions = self.filterPrefix.split(prefix)
         if filterOptions[0] == '':
             del filterOptions[0]
+        # The line jump is set by the filter, it can't be cached
+        if locator.FILTERS['lines'] in filterOptions:
+            self._narrowing.clear()
+        elif self._narrow(prefix, filterOptions):
+            return self._create_list_items(self.tempLocations)
 
         if len(filterOptions) == 0:
             self.tempLocations = self.locate_symbols.get_locations()
         elif len(filterOptions) == 1:
-            self.tempLocations = [
-                x for x in self.locate_symbols.get_locations()
-                if x.comparison.lower().find(filterOptions[0].lower()) > -1]
+            self.tempLocations = self.locate_symbols.get_locations(
+                filterOptions[0])
         else:
             index = 0
             if not self.tempLocations and (self.__pre_filters == filterOptions):
@@ -198,30 +211,49 @@ class LocatorWidget(QDialog):
             if self.tempLocations:
                 self.__pre_filters = filterOptions
                 self.__pre_results = self.tempLocations
+        if locator.FILTERS['lines'] not in filterOptions:
+            self._narrowing.push(prefix, self.tempLocations)
         return self._create_list_items(self.tempLocations)
 
+    def _narrow(self, prefix, filterOptions):
+        """Use the results cached for prefix, or filter the results of the
+        last prefix cached if only the text searched was extended."""
+        cached = self._narrowing.get(prefix)
+        if cached is None:
+            narrowable = self._narrowing.narrowable(prefix)
+            # A filter typed changes the symbols searched
+            if narrowable is None or not filterOptions or \
+               self.filterPrefix.search(prefix[len(narrowable[0]):]):
+                return False
+            cached = fuzzy_index.sort_matches(
+                filterOptions[-1].lstrip(), narrowable[1],
+                key=lambda x: x.comparison)
+            self._narrowing.push(prefix, cached)
+        self.tempLocations = cached
+        return True
+
     def _filter_generic(self, filterOptions, index):
         at_start = (index == 0)
         if at_start:
-            self.tempLocations = [
-                x for x in self.locate_symbols.get_locations()
-                if x.type == filterOptions[0] and
-                x.comparison.lower().find(filterOptions[1].lower()) > -1]
+            self.tempLocations = self.locate_symbols.get_locations(
+                filterOptions[1], kind=filterOptions[0])
         else:
             currentItem = self._root.currentItem()
-            if (filterOptions[index - 2] == locator.FILTERS['classes'] and
-                    currentItem):
+            if currentItem and \
+               filterOptions[index - 2] != locator.FILTERS['classes']:
+                self.tempLocations = self.locate_symbols.get_locations(
+                    filterOptions[index + 1], kind=filterOptions[index],
+                    path=currentItem[2])
+                return index + 2
+            if currentItem:
                 symbols = self.locate_symbols.get_symbols_for_class(
                     currentItem[2], currentItem[1])
                 self.tempLocations = symbols
-            elif currentItem:
-                global mapping_symbols
-                self.tempLocations = locator.mapping_symbols.get(
-                    currentItem[2], [])
-            self.tempLocations = [x for x in self.tempLocations
-                                  if x.type == filterOptions[index] and
-                                  x.comparison.lower().find(
-                                      filterOptions[index + 1].lower()) > -1]
+            self.tempLocations = fuzzy_index.sort_matches(
+                filterOptions[index + 1],
+                [x for x in self.tempLocations
+                 if x.type == filterOptions[index]],
+                key=lambda x: x.comparison)
         return index + 2
 
     def _filter_this_file(self, filterOptions, index):
@@ -244,9 +276,9 @@ class LocatorWidget(QDialog):
                 self.tempLocations = \
                     self.locate_symbols.get_this_file_symbols(
                         editorWidget.file_path)
-                search = filterOptions[index + 1].lstrip().lower()
-                self.tempLocations = [x for x in self.tempLocations
-                                      if x.comparison.lower().find(search) > -1]
+                self.tempLocations = fuzzy_index.sort_matches(
+                    filterOptions[index + 1].lstrip(), self.tempLocations,
+                    key=lambda x: x.comparison)
         else:
             del filterOptions[index + 1]
             del filterOptions[index]
@@ -261,10 +293,9 @@ class LocatorWidget(QDialog):
                 locator.ResultItem(
                     locator.FILTERS['files'],
                     opened[f].file_name, opened[f].file_path) for f in opened]
-            search = filterOptions[index + 1].lstrip().lower()
-            self.tempLocations = [
-                x for x in self.tempLocations
-                if x.comparison.lower().find(search) > -1]
+            self.tempLocations = fuzzy_index.sort_matches(
+                filterOptions[index + 1].lstrip(), self.tempLocations,
+                key=lambda x: x.comparison)
             index += 2
         else:
             del filterOptions[index + 1]
@@ -288,17 +319,13 @@ class LocatorWidget(QDialog):
                 else:
                     filterOptions.insert(0, locator.FILTERS['non-python'])
                 filterOptions.insert(1, editorWidget.file_path)
-            self.tempLocations = [
-                x for x in self.locate_symbols.get_locations()
-                if x.type == filterOptions[0] and
-                x.path == filterOptions[1]]
+            self.tempLocations = self.locate_symbols.get_locations(
+                kind=filterOptions[0], path=filterOptions[1])
         else:
             currentItem = self._root.currentItem()
             if currentItem:
-                self.tempLocations = [
-                    x for x in self.locate_symbols.get_locations()
-                    if x.type == currentItem[0] and
-                    x.path == currentItem[2]]
+                self.tempLocations = self.locate_symbols.get_locations(
+                    kind=currentItem[0], path=currentItem[2])
         if filterOptions[index + 1].isdigit():
             self._line_jump = int(filterOptions[index + 1]) - 1
         return index + 2
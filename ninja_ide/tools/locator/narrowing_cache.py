@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+
+class NarrowingCache(object):
+    """The results of the texts typed in the locator, while the user keeps
+    typing after them.
+
+    The results of a text are kept while the text typed starts with it:
+    deleting characters returns to the results cached, and adding
+    characters to the text searched can filter the last results instead
+    of searching all the symbols, because the symbols matching a text
+    also match the texts it starts with.
+
+    The results are lists, or objects with a complete method returning
+    the list of all the results if they are loaded or None."""
+
+    def __init__(self):
+        # [(text, results)], each text starts with the previous ones
+        self._stack = []
+
+    def __len__(self):
+        return len(self._stack)
+
+    def _drop(self, text):
+        while self._stack and not text.startswith(self._stack[-1][0]):
+            self._stack.pop()
+
+    def get(self, text):
+        """Return the results cached for text or None, forgetting the
+        results of the texts that text doesn't start with."""
+        self._drop(text)
+        if self._stack and self._stack[-1][0] == text:
+            return self._stack[-1][1]
+        return None
+
+    def narrowable(self, text):
+        """Return (cached text, [results]) of the longest text cached that
+        text starts with, if all its results are loaded, or None."""
+        self._drop(text)
+        if not self._stack:
+            return None
+        cached, results = self._stack[-1]
+        if not isinstance(results, list):
+            results = results.complete()
+        if results is None:
+            return None
+        return cached, results
+
+    def push(self, text, results):
+        self._drop(text)
+        if self._stack and self._stack[-1][0] == text:
+            self._stack.pop()
+        self._stack.append((text, results))
+
+    def clear(self):
+        self._stack = []
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import threading
+
+
+class ProjectSnapshot(object):
+    """The files of the projects known by the locator.
+
+    The files of a project are crawled once, when it is opened. After that
+    the snapshot is updated with the changes notified by the file system
+    watcher, and only the files that changed are indexed again.
+
+    The watchers can't always tell if a path was moved in or out of the
+    project, so the kind of change is read from the disk: the paths that
+    exist are (re)indexed and the rest are removed.
+
+    The projects are crawled in the locator thread while the changes are
+    registered from the GUI thread, so the snapshot is protected by a lock."""
+
+    def __init__(self, files=None):
+        # {project path: [file paths]}, the lists are replaced when they
+        # change, so they can be iterated from other threads
+        self.files = files if files is not None else {}
+        self._extensions = {}
+        # {file path: True to index it, False to remove it}
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    def add_project(self, project, extensions, files=()):
+        """Register project, the files are set when its crawl ends."""
+        with self._lock:
+            self._extensions[project] = tuple(extensions)
+            self.files[project] = list(files)
+
+    def set_files(self, project, files):
+        with self._lock:
+            if project in self._extensions:
+                self.files[project] = list(files)
+
+    def remove_project(self, project):
+        with self._lock:
+            self._extensions.pop(project, None)
+            self.files.pop(project, None)
+            prefix = project.rstrip(os.sep) + os.sep
+            for path in list(self._pending.keys()):
+                if path.startswith(prefix):
+                    del self._pending[path]
+
+    def has_project(self, project):
+        return project in self._extensions
+
+    def projects(self):
+        with self._lock:
+            return list(self._extensions.keys())
+
+    def project_for(self, path):
+        """Return the innermost project containing path, or None."""
+        found = None
+        with self._lock:
+            for project in self._extensions:
+                if path.startswith(project.rstrip(os.sep) + os.sep) and \
+                   (found is None or len(project) > len(found)):
+                    found = project
+        return found
+
+    def _accepts(self, project, path):
+        """The crawl only finds the visible files with the extensions of
+        the project."""
+        relative = os.path.relpath(path, project)
+        if [part for part in relative.split(os.sep) if part.startswith('.')]:
+            return False
+        return path.endswith(self._extensions[project])
+
+    def file_changed(self, event, path):
+        """Register the change of path notified by the watcher, return
+        True if there are changes to index."""
+        with self._lock:
+            project = self.project_for(path)
+            if project is None:
+                return bool(self._pending)
+            if os.path.isdir(path):
+                for folder, folders, files in os.walk(path):
+                    for name in files:
+                        file_path = os.path.join(folder, name)
+                        if self._accepts(project, file_path):
+                            self._pending[file_path] = True
+            elif os.path.isfile(path):
+                if self._accepts(project, path):
+                    self._pending[path] = True
+            else:
+                # Removed, or moved out: forget it and anything inside
+                prefix = path.rstrip(os.sep) + os.sep
+                for file_path in list(self.files.get(project, ())) + \
+                        list(self._pending.keys()):
+                    if file_path == path or file_path.startswith(prefix):
+                        self._pending[file_path] = False
+            return bool(self._pending)
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def take_pending(self):
+        """Return the ([paths to index], [paths to remove]) of the changes
+        registered, and update the files of the projects."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            updated = [path for path in pending if pending[path]]
+            removed = [path for path in pending if not pending[path]]
+            changed = {}
+            for path in pending:
+                project = self.project_for(path)
+                if project is not None:
+                    changed.setdefault(project, []).append(path)
+            for project, paths in changed.items():
+                files = [path for path in self.files.get(project, ())
+                         if path not in pending]
+                files += [path for path in paths if pending[path]]
+                self.files[project] = files
+        return updated, removed
+
+    def restore_pending(self, updated):
+        """Register again the paths taken to index that were not indexed,
+        unless they changed again meanwhile."""
+        with self._lock:
+            for path in updated:
+                if self.project_for(path) is not None:
+                    self._pending.setdefault(path, True)
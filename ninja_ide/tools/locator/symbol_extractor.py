@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Extract the symbols of the files indexed by the locator.
+
+This module doesn't depend on Qt, so the Python files of a crawl can be
+parsed by a pool of processes with extract_python_symbols.
+
+The modules imported by a Python file are stored as keys: the path of the
+module without the extension, absolute for the relative imports and
+relative to any folder for the others (a/b for "import a.b"). The files
+of the modules are found with imported_files."""
+
+import ast
+import os
+from multiprocessing import cpu_count
+
+from ninja_ide.intellisensei.analyzer import parse_cache
+from ninja_ide.tools import introspection
+
+
+# Kinds of the symbols, the prefixes of the filters of the locator
+FILE = '@'
+NON_PYTHON = '!'
+CLASS = '<'
+FUNCTION = '>'
+ATTRIBUTE = '-'
+
+# Processes parsing the files, one core is left for the interface
+POOL_SIZE = max(1, cpu_count() - 1)
+# Crawls with less Python files to parse are done in the locator thread
+PARALLEL_MIN_FILES = 64
+# Files sent to a process of the pool at once
+CHUNK_SIZE = 16
+
+
+def get_mtime(path):
+    """Return the mtime stored in the index for path."""
+    #FIXME: stat not int
+    return int(os.stat(path).st_mtime)
+
+
+def parse_symbols(symbols, results):
+    """Append to results the (kind, name, line) of the symbols returned
+    by the obtain_symbols of a symbols handler."""
+    if 'classes' in symbols:
+        _parse_class(symbols, results)
+    if 'attributes' in symbols:
+        _parse_attributes(symbols, results)
+    if 'functions' in symbols:
+        _parse_functions(symbols, results)
+
+
+def _parse_class(symbols, results):
+    clazzes = symbols['classes']
+    for claz in clazzes:
+        line_number = clazzes[claz]['lineno'] - 1
+        members = clazzes[claz]['members']
+        results.append((CLASS, claz, line_number))
+        if 'attributes' in members:
+            for attr in members['attributes']:
+                line_number = members['attributes'][attr] - 1
+                results.append((ATTRIBUTE, attr, line_number))
+        if 'functions' in members:
+            for func in members['functions']:
+                line_number = members['functions'][func]['lineno'] - 1
+                results.append((FUNCTION, func, line_number))
+                parse_symbols(members['functions'][func]['functions'],
+                              results)
+        if 'classes' in members:
+            _parse_class(members, results)
+
+
+def _parse_attributes(symbols, results):
+    attributes = symbols['attributes']
+    for attr in attributes:
+        line_number = attributes[attr] - 1
+        results.append((ATTRIBUTE, attr, line_number))
+
+
+def _parse_functions(symbols, results):
+    functions = symbols['functions']
+    for func in functions:
+        line_number = functions[func]['lineno'] - 1
+        results.append((FUNCTION, func, line_number))
+        parse_symbols(functions[func]['functions'], results)
+
+
+def import_keys(source, path):
+    """Return the keys of the modules imported at the top level of the
+    Python source of the file path."""
+    try:
+        body = parse_cache.get_cache().parse(source).body
+    except (SyntaxError, TypeError, ValueError):
+        return []
+    folder = os.path.dirname(path)
+    keys = []
+    for sym in body:
+        if sym.__class__ is ast.Import:
+            keys += [item.name.replace('.', os.sep) for item in sym.names]
+        elif sym.__class__ is ast.ImportFrom:
+            if getattr(sym, 'level', 0):
+                base = folder
+                for i in range(sym.level - 1):
+                    base = os.path.dirname(base)
+                parts = [base]
+            else:
+                parts = []
+            if sym.module:
+                parts += sym.module.split('.')
+            # The names imported can be modules of the package
+            if parts:
+                keys.append(os.path.join(*parts))
+            keys += [os.path.join(*(parts + [item.name]))
+                     for item in sym.names if item.name != '*']
+    return keys
+
+
+def imported_files(keys, paths):
+    """Return the Python files of paths that are modules of keys."""
+    exact = set([key for key in keys if os.path.isabs(key)])
+    suffixes = tuple([os.sep + key for key in keys if key not in exact])
+    found = []
+    for path in paths:
+        module, ext = os.path.splitext(path)
+        if ext != '.py':
+            continue
+        if os.path.basename(module) == '__init__':
+            module = os.path.dirname(module)
+        if module in exact or (suffixes and module.endswith(suffixes)):
+            found.append(path)
+    return found
+
+
+def extract_symbols(path, symbols_handler, python=True):
+    """Return the (mtime, [(kind, name, line, preview)], imports) of the
+    file path, its symbols found with symbols_handler if it's not None,
+    and the keys of the modules it imports if it's a Python file. The
+    preview is the text of the line of the symbol."""
+    mtime = get_mtime(path)
+    results = [(FILE if python else NON_PYTHON, os.path.basename(path), -1)]
+    imports = []
+    if symbols_handler is not None:
+        with open(path) as f:
+            content = f.read()
+        parse_symbols(symbols_handler.obtain_symbols(content, filename=path),
+                      results)
+        if python:
+            imports = import_keys(content, path)
+        lines = content.splitlines()
+        results = [(kind, name, line,
+                    lines[line] if 0 <= line < len(lines) else '')
+                   for kind, name, line in results]
+    else:
+        results = [result + ('',) for result in results]
+    return mtime, results, imports
+
+
+def extract_python_symbols(path):
+    """Return (path, mtime, symbols, imports) of a Python file, run in
+    the pool.
+
+    The errors are returned as (path, None, reason, []) to be logged by
+    the locator, without stopping the rest of the files."""
+    try:
+        mtime, results, imports = extract_symbols(path, introspection)
+        return path, mtime, results, imports
+    except Exception as reason:
+        return path, None, repr(reason), []
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from ninja_ide import resources
+from ninja_ide.tools.locator import fuzzy_index
+from ninja_ide.tools.logger import NinjaLogger
+
+
+logger = NinjaLogger('ninja_ide.tools.locator.symbol_index')
+
+db_path = os.path.join(resources.NINJA_KNOWLEDGE_PATH, 'locator.db')
+
+try:
+    unichr
+except NameError:
+    # Python 3
+    unichr = chr  # lint:ok
+
+# Greater than the characters of the names, to search them by prefix
+_LAST_CHAR = unichr(0xffff)
+
+# Files written in each transaction of a crawl
+BATCH_SIZE = 200
+# Symbols matched at least in each search of a text, to fill the page
+# after discarding the ones of other projects
+MIN_MATCHES = 500
+# Parameters of each query of the symbols by id
+MAX_PARAMETERS = 900
+# Version of the tables, the older tables are dropped to crawl again
+SCHEMA_VERSION = 3
+# The files outside the projects not crawled for these days are removed
+STALE_DAYS = 30
+# Bytes of the database, the files outside the projects crawled less
+# recently are removed to fit in MAX_DB_SIZE * SHRINK_RATIO
+MAX_DB_SIZE = 128 * 1024 * 1024
+SHRINK_RATIO = 0.8
+# Fraction of free pages of the database from which it is compacted
+COMPACT_RATIO = 0.25
+
+__index = None
+
+
+def comparison(name):
+    """Return the text compared to search name: without the arguments of
+    the classes and functions, in lowercase."""
+    index = name.find('(')
+    if index != -1:
+        name = name[:index]
+    return name.lower()
+
+
+def get_index():
+    """Return the index of the symbols shared by the locators."""
+    global __index
+    if __index is None:
+        __index = SymbolIndex()
+    return __index
+
+
+class SymbolIndex(object):
+    """Table with the symbols of the files of the projects, each row has
+    the name, kind, file, line and text of the line of a symbol. The
+    symbols are searched with queries, using the indexes on the name and
+    on the kind. The modules imported by each file are stored too, to
+    find the definitions in the files imported.
+
+    The writes of a crawl of the projects are done between begin and
+    commit, in the thread of the crawl, committing every BATCH_SIZE files.
+    The database is in WAL mode, so the locator can read the symbols
+    while they are written, and the commits don't wait for each fsync.
+
+    The texts are searched in a FuzzyIndex of the names, loaded with
+    load_matcher and kept updated with the writes. Before it's loaded,
+    the names containing the text are searched in the database.
+
+    Each file has the time it was last crawled, garbage returns the files
+    that don't exist or that weren't crawled recently. The caller removes
+    them with remove_files, and calls compact when needs_compact finds
+    enough free pages."""
+
+    def __init__(self, path=None, batch_size=BATCH_SIZE,
+                 max_size=MAX_DB_SIZE):
+        self._path = path or db_path
+        self._max_size = max_size
+        self._batch = None
+        self._batch_size = batch_size
+        self._batch_writes = 0
+        self._matcher = None
+        self._lock = threading.RLock()
+        self._initialize_db()
+
+    def _connect(self):
+        connection = sqlite3.connect(self._path)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _initialize_db(self):
+        try:
+            locator_db = self._connect()
+            cur = locator_db.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")
+            # The symbols were stored as a pickled list for each file
+            cur.execute("DROP TABLE IF EXISTS locator")
+            cur.execute("PRAGMA user_version")
+            version = cur.fetchone()[0]
+            if version < 2:
+                cur.execute("DROP TABLE IF EXISTS symbols")
+                cur.execute("DROP TABLE IF EXISTS files")
+            elif version < 3:
+                # The files are considered crawled when they were migrated
+                cur.execute("ALTER TABLE files ADD COLUMN "
+                            "seen integer DEFAULT %d" % int(time.time()))
+            if version < SCHEMA_VERSION:
+                cur.execute("PRAGMA user_version=%d" % SCHEMA_VERSION)
+            cur.execute("create table if not exists "
+                        "files(id integer PRIMARY KEY, path text UNIQUE, "
+                        "mtime integer, seen integer)")
+            cur.execute("create table if not exists "
+                        "symbols(name text, comparison text, kind text, "
+                        "file integer, line integer, preview text)")
+            cur.execute("create table if not exists "
+                        "imports(file integer, module text)")
+            cur.execute("create index if not exists "
+                        "symbols_name on symbols(name)")
+            cur.execute("create index if not exists "
+                        "symbols_kind on symbols(kind)")
+            cur.execute("create index if not exists "
+                        "symbols_file on symbols(file)")
+            cur.execute("create index if not exists "
+                        "imports_file on imports(file)")
+            locator_db.commit()
+            locator_db.close()
+        except sqlite3.Error as reason:
+            logger.error('Could not initialize the locator: %r' % reason)
+
+    def load_matcher(self):
+        """Load the names of the symbols in the matcher, if it's not
+        loaded and there are no writes pending."""
+        with self._lock:
+            if self._matcher is not None or self._batch is not None:
+                return
+            matcher = fuzzy_index.FuzzyIndex()
+            matcher.add_all(self._read("SELECT rowid, name, kind "
+                                       "FROM symbols", []))
+            self._matcher = matcher
+
+    def begin(self):
+        """Keep the writes in a transaction until commit is called."""
+        with self._lock:
+            if self._batch is None:
+                self._batch = self._connect()
+                self._batch_writes = 0
+
+    def commit(self):
+        with self._lock:
+            if self._batch is not None:
+                try:
+                    self._batch.commit()
+                    self._batch.close()
+                except sqlite3.Error as reason:
+                    logger.error('Could not store the symbols: %r' % reason)
+                self._batch = None
+
+    def _write(self, operation, *args):
+        locator_db = self._batch
+        try:
+            with self._lock:
+                if locator_db is None:
+                    locator_db = self._connect()
+                operation(locator_db.cursor(), *args)
+                if self._batch is None:
+                    locator_db.commit()
+                    locator_db.close()
+                else:
+                    self._batch_writes += 1
+                    if self._batch_writes >= self._batch_size:
+                        self._batch.commit()
+                        self._batch_writes = 0
+        except sqlite3.Error as reason:
+            logger.error('Could not store the symbols: %r' % reason)
+
+    def _unmatch_file(self, cur, file_id):
+        if self._matcher is not None:
+            cur.execute("SELECT rowid, name, kind FROM symbols WHERE file=?",
+                        (file_id,))
+            for symbol_id, name, kind in cur.fetchall():
+                self._matcher.remove(symbol_id, name, kind)
+
+    def _match_file(self, cur, file_id):
+        if self._matcher is not None:
+            cur.execute("SELECT rowid, name, kind FROM symbols WHERE file=?",
+                        (file_id,))
+            self._matcher.add_all(cur.fetchall())
+
+    def _read(self, query, args):
+        try:
+            locator_db = self._connect()
+            cur = locator_db.cursor()
+            cur.execute(query, args)
+            rows = cur.fetchall()
+            locator_db.close()
+            return rows
+        except sqlite3.Error as reason:
+            logger.error('Could not read the symbols: %r' % reason)
+            return []
+
+    def get_mtimes(self, roots=None):
+        """Return {path: mtime} of the files indexed inside roots (or of
+        all the files)."""
+        where, args = self._where(roots=roots)
+        return dict(self._read("SELECT path, mtime FROM files%s" % where,
+                               args))
+
+    def get_imports(self, paths):
+        """Return the keys of the modules imported by the files paths."""
+        modules = set()
+        for index in range(0, len(paths), MAX_PARAMETERS):
+            chunk = list(paths[index:index + MAX_PARAMETERS])
+            modules.update([row[0] for row in self._read(
+                "SELECT imports.module FROM imports JOIN files "
+                "ON imports.file = files.id WHERE files.path IN (%s)" %
+                ', '.join(['?'] * len(chunk)), chunk)])
+        return modules
+
+    def update_file(self, path, mtime, symbols, imports=()):
+        """Replace the symbols of path, symbols is a list of
+        (kind, name, line, preview), and the keys of the modules it
+        imports."""
+        self._write(self._update_file, path, mtime, symbols, imports)
+
+    def _update_file(self, cur, path, mtime, symbols, imports):
+        cur.execute("SELECT id FROM files WHERE path=?", (path,))
+        row = cur.fetchone()
+        seen = int(time.time())
+        if row is None:
+            cur.execute("INSERT INTO files(path, mtime, seen) "
+                        "values (?, ?, ?)", (path, mtime, seen))
+            file_id = cur.lastrowid
+        else:
+            file_id = row[0]
+            cur.execute("UPDATE files SET mtime=?, seen=? WHERE id=?",
+                        (mtime, seen, file_id))
+            self._unmatch_file(cur, file_id)
+            cur.execute("DELETE FROM symbols WHERE file=?", (file_id,))
+            cur.execute("DELETE FROM imports WHERE file=?", (file_id,))
+        cur.executemany("INSERT INTO symbols values (?, ?, ?, ?, ?, ?)",
+                        [(name, comparison(name), kind, file_id, line,
+                          preview)
+                         for kind, name, line, preview in symbols])
+        cur.executemany("INSERT INTO imports values (?, ?)",
+                        [(file_id, module) for module in set(imports)])
+        self._match_file(cur, file_id)
+
+    def remove_files(self, paths):
+        self._write(self._remove_files, paths)
+
+    def _remove_files(self, cur, paths):
+        for path in paths:
+            cur.execute("SELECT id FROM files WHERE path=?", (path,))
+            row = cur.fetchone()
+            if row is None:
+                continue
+            self._unmatch_file(cur, row[0])
+            cur.execute("DELETE FROM symbols WHERE file=?", (row[0],))
+            cur.execute("DELETE FROM imports WHERE file=?", (row[0],))
+            cur.execute("DELETE FROM files WHERE id=?", (row[0],))
+
+    def mark_seen(self, roots, now=None):
+        """Record that the files inside roots were crawled at now."""
+        where, args = self._where(roots=roots)
+        now = int(time.time()) if now is None else now
+        self._write(lambda cur: cur.execute(
+            "UPDATE files SET seen=?%s" % where, [now] + args))
+
+    def _pragmas(self, *pragmas):
+        values = []
+        for pragma in pragmas:
+            rows = self._read("PRAGMA %s" % pragma, [])
+            values.append(rows[0][0] if rows else 0)
+        return values
+
+    def size(self):
+        """Return the bytes of the pages in use of the database."""
+        pages, free, page_size = self._pragmas('page_count',
+                                               'freelist_count', 'page_size')
+        return (pages - free) * page_size
+
+    def needs_compact(self):
+        """Return if the free pages are at least COMPACT_RATIO of the
+        database."""
+        pages, free = self._pragmas('page_count', 'freelist_count')
+        return pages > 0 and free >= pages * COMPACT_RATIO
+
+    def garbage(self, roots, now=None):
+        """Return the paths of the files that don't exist, and of the files
+        outside roots not crawled for STALE_DAYS or, the least recently
+        crawled first, while the database is bigger than its maximum
+        size. They are removed later with remove_files."""
+        now = int(time.time()) if now is None else now
+        stale = now - STALE_DAYS * 24 * 60 * 60
+        inside = tuple([root.rstrip(os.sep) + os.sep for root in roots])
+        removed = []
+        foreign = []
+        rows = self._read("SELECT path, seen FROM files", [])
+        for path, seen in rows:
+            if not os.path.exists(path):
+                removed.append(path)
+            elif not (inside and path.startswith(inside)):
+                if (seen or 0) < stale:
+                    removed.append(path)
+                else:
+                    foreign.append((seen, path))
+        if not foreign:
+            return removed
+        # Assuming that the files have similar amounts of symbols, estimate
+        # the size without the files removed and remove the same fraction
+        # of the files as of the size to free
+        kept = len(rows) - len(removed)
+        size = float(self.size()) * kept / len(rows)
+        if size > self._max_size:
+            excess = 1 - self._max_size * SHRINK_RATIO / size
+            foreign.sort()
+            removed += [path for seen, path in
+                        foreign[:int(math.ceil(excess * kept))]]
+        return removed
+
+    def compact(self):
+        """Rebuild the database without the free pages and update the
+        statistics used to choose the indexes of the queries, if there
+        are no writes pending."""
+        with self._lock:
+            if self._batch is not None:
+                return False
+            try:
+                locator_db = self._connect()
+                # VACUUM can't run inside a transaction
+                locator_db.isolation_level = None
+                locator_db.execute("VACUUM")
+                locator_db.execute("ANALYZE")
+                locator_db.close()
+                return True
+            except sqlite3.Error as reason:
+                logger.error('Could not compact the locator: %r' % reason)
+                return False
+
+    def _where(self, text='', kinds=None, path=None, roots=None, name=None,
+               prefix=None, definition=None):
+        conditions = []
+        args = []
+        if text:
+            conditions.append("instr(symbols.comparison, ?) > 0")
+            args.append(text.lower())
+        if kinds:
+            conditions.append("symbols.kind IN (%s)" %
+                              ', '.join(['?'] * len(kinds)))
+            args += list(kinds)
+        if name is not None:
+            conditions.append("symbols.name = ?")
+            args.append(name)
+        if prefix:
+            conditions.append("symbols.name >= ? AND symbols.name < ?")
+            args += [prefix, prefix + _LAST_CHAR]
+        if definition:
+            # The name, followed by the arguments for classes and functions
+            conditions.append("(symbols.name = ? OR "
+                              "(symbols.name >= ? AND symbols.name < ?))")
+            args += [definition, definition + '(',
+                     definition + '(' + _LAST_CHAR]
+        if path is not None:
+            conditions.append("files.path = ?")
+            args.append(path)
+        if roots is not None:
+            if not roots:
+                conditions.append("0")
+            else:
+                conditions.append('(%s)' % ' OR '.join(
+                    ["substr(files.path, 1, ?) = ?"] * len(roots)))
+                for root in roots:
+                    root = root.rstrip(os.sep) + os.sep
+                    args += [len(root), root]
+        if not conditions:
+            return '', args
+        return ' WHERE ' + ' AND '.join(conditions), args
+
+    def search(self, offset=0, limit=None, **query):
+        """Return [(kind, name, path, line)] of the symbols sorted by name.
+
+        The symbols can be filtered by: text (contained in the name
+        ignoring the case and the arguments), kinds, path of the file,
+        roots (folders containing the file), name, prefix of the name,
+        and definition (name without the arguments). With a text and the
+        matcher loaded, the symbols are fuzzy matched and sorted by the
+        rank of the match."""
+        if query.get('text', '') and self._matcher is not None:
+            return self._search_matches(offset, limit, **query)
+        where, args = self._where(**query)
+        sql = ("SELECT symbols.kind, symbols.name, files.path, symbols.line "
+               "FROM symbols JOIN files ON symbols.file = files.id%s "
+               "ORDER BY symbols.name" % where)
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            args += [-1 if limit is None else limit, offset]
+        return self._read(sql, args)
+
+    def definitions(self, name, kinds=None, roots=None):
+        """Return [(kind, name, path, line, preview)] of the symbols
+        defining name (without the arguments), sorted by path and line."""
+        where, args = self._where(kinds=kinds, roots=roots, definition=name)
+        return self._read(
+            "SELECT symbols.kind, symbols.name, files.path, symbols.line, "
+            "symbols.preview FROM symbols JOIN files "
+            "ON symbols.file = files.id%s "
+            "ORDER BY files.path, symbols.line" % where, args)
+
+    def _search_matches(self, offset, limit, text, kinds=None, **query):
+        wanted = None if limit is None else offset + limit
+        size = wanted and max(wanted * 2, MIN_MATCHES)
+        while True:
+            symbols = self._matcher.match(text, kinds, size)
+            rows = self._rows(symbols, query)
+            # Match more symbols if too many were of other projects
+            if size is None or len(symbols) < size or len(rows) >= wanted:
+                break
+            size *= 4
+        return rows[offset:wanted]
+
+    def _rows(self, symbols, query):
+        """Return the rows of the ids in symbols found by query, in the
+        order of symbols."""
+        found = {}
+        where, args = self._where(**query)
+        where = ' AND '.join([where or ' WHERE 1', 'symbols.rowid IN (%s)'])
+        for index in range(0, len(symbols), MAX_PARAMETERS):
+            chunk = symbols[index:index + MAX_PARAMETERS]
+            for row in self._read(
+                    "SELECT symbols.rowid, symbols.kind, symbols.name, "
+                    "files.path, symbols.line FROM symbols JOIN files "
+                    "ON symbols.file = files.id%s" %
+                    (where % ', '.join(['?'] * len(chunk))), args + chunk):
+                found[row[0]] = row[1:]
+        return [found[symbol] for symbol in symbols if symbol in found]
+
+    def count(self, **query):
+        """Return the amount of symbols found by search with query."""
+        if query.get('text', '') and self._matcher is not None:
+            return len(self.search(**query))
+        where, args = self._where(**query)
+        rows = self._read("SELECT count(*) FROM symbols JOIN files "
+                          "ON symbols.file = files.id%s" % where, args)
+        return rows[0][0] if rows else 0
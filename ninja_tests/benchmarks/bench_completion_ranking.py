@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Time to rank 10000 completions with different patterns.
+
+The completions shown by the widget, the MAX_PROPOSALS best ranked, must
+be found within BUDGET milliseconds for every pattern. The time to rank
+all the matches is shown for reference.
+
+Run with: python -m ninja_tests.benchmarks.bench_completion_ranking
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from ninja_ide.intellisensei.completion import completer_widget
+from ninja_ide.intellisensei.completion import completion_index
+from ninja_ide.intellisensei.completion import completion_ranking
+
+
+REPETITIONS = 20
+SIZE = 10000
+# Milliseconds to rank the completions shown by the widget
+BUDGET = 5
+PATTERNS = ('', 'e', 'g', 'ge', 'gdi', 'upd', 'Tree', 'getdata', 'xyz')
+
+WORDS = ('get', 'set', 'data', 'item', 'value', 'path', 'name', 'index',
+         'file', 'open', 'close', 'read', 'write', 'update', 'remove', 'add',
+         'list', 'dict', 'type', 'model', 'view', 'module', 'class',
+         'function', 'parse', 'token', 'node', 'tree', 'editor', 'widget')
+
+
+def create_names(size):
+    """Return size names in the styles of the python code."""
+    generator = random.Random(1)
+    names = set()
+    while len(names) < size:
+        words = [generator.choice(WORDS)
+                 for i in range(generator.randint(1, 3))]
+        if generator.random() < 0.3:
+            name = ''.join([word.title() for word in words])
+        else:
+            name = '_'.join(words)
+        if generator.random() < 0.5:
+            name += str(generator.randint(0, 99))
+        names.add(name)
+    return sorted(names)
+
+
+def _best_time(function):
+    best = None
+    for i in range(REPETITIONS):
+        start = time.time()
+        function()
+        elapsed = (time.time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run():
+    """Print the times of each pattern, return False if any of them is
+    over the budget."""
+    # The candidates are prepared once for each request, like the widget
+    candidates = completion_index.CompletionIndex(
+        {'attributes': create_names(SIZE)}).candidates()
+    limit = completer_widget.MAX_PROPOSALS
+    handle, path = tempfile.mkstemp()
+    os.close(handle)
+    passed = True
+    try:
+        ranker = completion_ranking.CompletionRanker('', path)
+        print('%10s %8s %10s %14s' % ('pattern', 'matches', 'all (ms)',
+                                      'top %d (ms)' % limit))
+        for pattern in PATTERNS:
+            matches = len(ranker.rank(pattern, candidates))
+            shown = _best_time(lambda: ranker.rank(pattern, candidates,
+                                                   limit))
+            passed = passed and shown < BUDGET
+            print('%10r %8d %10.3f %14.3f %s' % (
+                pattern, matches,
+                _best_time(lambda: ranker.rank(pattern, candidates)),
+                shown, 'ok' if shown < BUDGET else 'OVER BUDGET'))
+    finally:
+        os.remove(path)
+    print('%s: top %d of %d candidates ranked within %d ms' % (
+        'PASS' if passed else 'FAIL', limit, SIZE, BUDGET))
+    return passed
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Round trip time between the completion daemon and the resolver process
+sending the whole module (as before) and sending only the changes.
+
+Run with: python -m ninja_tests.benchmarks.bench_daemon_protocol
+"""
+
+from __future__ import print_function
+
+import time
+from multiprocessing import Process, Queue
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.intellisensei.analyzer import protocol
+
+
+REPETITIONS = 20
+SIZES = (10, 50, 200, 800)
+
+CLASS_TEMPLATE = '''
+class Clazz{0}(object):
+
+    def __init__(self):
+        self.name = 'clazz'
+        self.items = []
+        self.value = {0}
+
+    def method(self, arg, default=None):
+        result = arg.split()
+        return result
+
+
+def function{0}(value):
+    data = value.strip()
+    return data
+
+attribute{0} = function{0}(' ')
+'''
+
+
+def create_source(size):
+    return 'import os\n' + ''.join(
+        [CLASS_TEMPLATE.format(i) for i in range(size)])
+
+
+def _resolver(queue_receive, queue_send):
+    """Answer as the resolver process does: with the whole module when
+    it is received complete, and with the patches otherwise."""
+    modules = {}
+    module_analyzer = analyzer.Analyzer()
+    while True:
+        message = queue_receive.get()
+        if message is None:
+            break
+        if message[0] == protocol.MODULE:
+            queue_send.put((message[1], message[2], []))
+            continue
+        module = protocol.build_module(message, modules.get(message[1]),
+                                       module_analyzer)
+        modules[message[1]] = module
+        snapshot = protocol.take_snapshot(module)
+        for address, type_data in protocol.iter_types(module):
+            if type_data.data_type == model.late_resolution:
+                type_data.data_type = 'resolved'
+        queue_send.put((protocol.RESOLVED, message[1],
+                        protocol.collect_patches(module, snapshot), []))
+
+
+def _round_trip(queue_send, queue_receive, message):
+    start = time.time()
+    for i in range(REPETITIONS):
+        queue_send.put(message)
+        queue_receive.get()
+    return (time.time() - start) / REPETITIONS * 1000
+
+
+def run():
+    queue_send, queue_receive = Queue(), Queue()
+    process = Process(target=_resolver, args=(queue_send, queue_receive))
+    process.start()
+    print('%8s %8s %14s %14s' % ('classes', 'lines', 'module (ms)',
+                                 'delta (ms)'))
+    try:
+        for size in SIZES:
+            source = create_source(size)
+            path_id = 'module%d' % size
+            module = analyzer.Analyzer().analyze(source)
+            # The process receives all the spans the first time
+            queue_send.put(protocol.create_update(path_id, module, ()))
+            queue_receive.get()
+            edited = source + '\nnew_attribute = os.path\n'
+            new_module = analyzer.Analyzer().analyze(edited, module)
+            delta = protocol.create_update(path_id, new_module,
+                                           set(module.spans))
+            full = (protocol.MODULE, path_id, new_module, True)
+            print('%8d %8d %14.3f %14.3f' % (
+                size, len(edited.splitlines()),
+                _round_trip(queue_send, queue_receive, full),
+                _round_trip(queue_send, queue_receive, delta)))
+    finally:
+        queue_send.put(None)
+        process.join()
+
+
+if __name__ == '__main__':
+    run()
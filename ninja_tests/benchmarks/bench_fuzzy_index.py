@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Time to find the best matches of the locator in 500000 symbols.
+
+Run with: python -m ninja_tests.benchmarks.bench_fuzzy_index
+"""
+
+from __future__ import print_function
+
+import random
+import time
+
+from ninja_ide.tools.locator import fuzzy_index
+from ninja_tests.benchmarks.bench_completion_ranking import create_names
+
+
+REPETITIONS = 5
+SYMBOLS = 500000
+NAMES = 200000
+LIMIT = 100
+KINDS = ('<', '>', '-')
+PATTERNS = ('e', 'ge', 'gdi', 'upd', 'tree', 'getdata', 'gtdt', 'tedwid',
+            'xyz')
+
+
+def _best_time(function):
+    best = None
+    for i in range(REPETITIONS):
+        start = time.time()
+        function()
+        elapsed = (time.time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run():
+    generator = random.Random(1)
+    names = create_names(NAMES)
+    index = fuzzy_index.FuzzyIndex()
+    symbols = [(symbol_id, generator.choice(names), generator.choice(KINDS))
+               for symbol_id in range(SYMBOLS)]
+    start = time.time()
+    index.add_all(symbols)
+    print('index %d symbols: %.1f s' % (SYMBOLS, time.time() - start))
+    print('%10s %14s %18s' % ('pattern', 'top %d (ms)' % LIMIT,
+                              'top %d kind (ms)' % LIMIT))
+    for pattern in PATTERNS:
+        print('%10r %14.3f %18.3f' % (
+            pattern, _best_time(lambda: index.match(pattern, limit=LIMIT)),
+            _best_time(lambda: index.match(pattern, ('<',), LIMIT))))
+
+
+if __name__ == '__main__':
+    run()
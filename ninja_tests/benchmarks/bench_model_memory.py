@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+"""Memory used by the analyzed modules of some files of NINJA-IDE.
+
+Run with: python -m ninja_tests.benchmarks.bench_model_memory [root]
+
+The files are read from root, by default the tree of the benchmark. The
+baseline is the model before its objects declared __slots__ and shared
+the referenced lines, in the parent of commit 6b0a07f. To measure it with
+the same files, run this benchmark in a checkout of that revision:
+
+    git worktree add /tmp/baseline 6b0a07f^
+    cp ninja_tests/benchmarks/bench_model_memory.py \
+        /tmp/baseline/ninja_tests/benchmarks/
+    cd /tmp/baseline
+    python -m ninja_tests.benchmarks.bench_model_memory <this tree>
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import sys
+import types
+
+from ninja_ide.intellisensei.analyzer import analyzer
+
+
+FILES = (
+    'ninja_ide/core/settings.py',
+    'ninja_ide/gui/editor/editor.py',
+    'ninja_ide/gui/main_panel/main_container.py',
+    'ninja_ide/intellisensei/analyzer/analyzer.py',
+    'ninja_ide/intellisensei/analyzer/model.py',
+    'ninja_ide/tools/locator/locator.py',
+)
+
+_SKIP = (type, types.ModuleType, types.FunctionType)
+
+
+def deep_size(obj):
+    """Return the bytes used by obj and the objects it references."""
+    seen = set()
+    size = 0
+    pending = [obj]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, _SKIP):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        pending.extend(gc.get_referents(item))
+    return size
+
+
+def run(root=None):
+    if root is None:
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+    print('%-48s %8s %12s' % ('file', 'lines', 'module (KB)'))
+    total = 0
+    for path in FILES:
+        with open(os.path.join(root, path)) as f:
+            source = f.read()
+        module = analyzer.Analyzer().analyze(source)
+        size = deep_size(module)
+        total += size
+        print('%-48s %8d %12.1f' % (path, len(source.splitlines()),
+                                    size / 1024.0))
+    print('%-48s %8s %12.1f' % ('total', '', total / 1024.0))
+
+
+if __name__ == '__main__':
+    run(*sys.argv[1:2])
@@ -34,6 +34,17 @@ def get_source_data(code, word=""):
     return data
 
 
+def get_buffer_data(code, word="", classes=(), modules=()):
+    """Return get_source_data(code, word) with the classes and the modules
+    of the analyzed module in their own kinds, like the completion index."""
+    data = get_source_data(code, word)
+    for kind, names in (('classes', classes), ('modules', modules)):
+        data['attributes'] = [name for name in data['attributes']
+                              if name not in names]
+        data[kind] = sorted(set(data.get(kind, [])) | set(names))
+    return data
+
+
 SOURCE_COMPLETION = """
 a = "ninja-ide"
 b = a.split()
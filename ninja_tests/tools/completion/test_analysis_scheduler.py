@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.completion import analysis_scheduler
+
+
+class AnalysisSchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.analyzed = []
+        self.scheduler = analysis_scheduler.AnalysisScheduler(
+            self._analyze, 1, lambda: self.now)
+
+    def _analyze(self, path, source, indent, use_tabs, version):
+        self.analyzed.append((path, source, version))
+
+    def test_burst_of_changes_is_analyzed_once(self):
+        for version in range(1, 6):
+            self.now += 0.5
+            self.scheduler.schedule('a.py', 'code%d' % version, '    ',
+                                    False, version)
+            self.assertEqual(self.scheduler.run_pending(), 0)
+        self.assertEqual(self.scheduler.next_delay(), 1)
+        self.now += 1
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.assertEqual(self.analyzed, [('a.py', 'code5', 5)])
+        self.assertEqual(self.scheduler.next_delay(), None)
+
+    def test_documents_are_debounced_separately(self):
+        self.scheduler.schedule('a.py', 'a', '    ', False, 1)
+        self.now += 0.5
+        self.scheduler.schedule('b.py', 'b', '    ', False, 1)
+        self.now += 0.5
+        self.scheduler.run_pending()
+        self.assertEqual(self.analyzed, [('a.py', 'a', 1)])
+        self.assertTrue(self.scheduler.is_pending('b.py'))
+        self.assertEqual(self.scheduler.next_delay(), 0.5)
+
+    def test_superseded_versions_are_dropped(self):
+        self.assertTrue(self.scheduler.schedule('a.py', 'new', '    ',
+                                                False, 3))
+        self.assertFalse(self.scheduler.schedule('a.py', 'old', '    ',
+                                                 False, 2))
+        self.assertTrue(self.scheduler.flush('a.py'))
+        self.assertFalse(self.scheduler.schedule('a.py', 'new', '    ',
+                                                 False, 3))
+        self.assertFalse(self.scheduler.flush('a.py'))
+        self.assertEqual(self.analyzed, [('a.py', 'new', 3)])
+
+    def test_cancel(self):
+        self.scheduler.schedule('a.py', 'a', '    ', False, 1)
+        self.scheduler.cancel('a.py')
+        self.now += 1
+        self.assertEqual(self.scheduler.run_pending(), 0)
+        self.assertEqual(self.analyzed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
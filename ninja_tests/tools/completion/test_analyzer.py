@@ -19,8 +19,8 @@ from __future__ import absolute_import
 import _ast
 import unittest
 
-from ninja_ide.tools.completion import analyzer
-from ninja_ide.tools.completion import model
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import model
 from ninja_tests.tools.completion import SOURCE_ANALYZER_NATIVE
 
 
@@ -41,9 +41,9 @@ class AnalyzerTestCase(unittest.TestCase):
     def test_imports(self):
         module = self.analyzer.analyze(SOURCE_ANALYZER_NATIVE)
 
-        type1 = model._TypeData(None, 'sys', 'import sys', None)
-        type2 = model._TypeData(None, 'os', 'import os', None)
-        type3 = model._TypeData(None, 'sys.exit', 'import sys.exit', None)
+        type1 = model.TypeData(None, 'sys', 'import sys', None)
+        type2 = model.TypeData(None, 'os', 'import os', None)
+        type3 = model.TypeData(None, 'sys.exit', 'import sys.exit', None)
         expected = {'sys': type1, 'os': type2, 'exit': type3}
 
         for imp in module.imports:
@@ -225,7 +225,7 @@ class AnalyzerTestCase(unittest.TestCase):
         func_args.sort()
         self.assertEqual(func_args, args_names)
         #For: var
-        type_var = model._TypeData(0, model.late_resolution, None, None)
+        type_var = model.TypeData(0, model.late_resolution, None, None)
         func_arg_obj = func.args['var']
         type_arg_func = func_arg_obj.data[0]
         self.assertEqual(func_arg_obj.name, 'var')
@@ -234,7 +234,7 @@ class AnalyzerTestCase(unittest.TestCase):
         self.assertEqual(type_arg_func.operation, type_var.operation)
         self.assertFalse(type_arg_func.is_native)
         #For: inte
-        type_var = model._TypeData(0, model.late_resolution, None, None)
+        type_var = model.TypeData(0, model.late_resolution, None, None)
         func_arg_obj = func.args['inte']
         type_arg_func = func_arg_obj.data[0]
         self.assertEqual(func_arg_obj.name, 'inte')
@@ -243,7 +243,7 @@ class AnalyzerTestCase(unittest.TestCase):
         self.assertEqual(type_arg_func.operation, type_var.operation)
         self.assertFalse(type_arg_func.is_native)
         #For: num
-        type_var = model._TypeData(0, '__builtin__.int', None, None)
+        type_var = model.TypeData(0, '__builtin__.int', None, None)
         func_arg_obj = func.args['num']
         type_arg_func = func_arg_obj.data[0]
         self.assertEqual(func_arg_obj.name, 'num')
@@ -252,7 +252,7 @@ class AnalyzerTestCase(unittest.TestCase):
         self.assertEqual(type_arg_func.operation, type_var.operation)
         self.assertTrue(type_arg_func.is_native)
         #For: li
-        type_var = model._TypeData(0, '__builtin__.str', None, None)
+        type_var = model.TypeData(0, '__builtin__.str', None, None)
         func_arg_obj = func.args['li']
         type_arg_func = func_arg_obj.data[0]
         self.assertEqual(func_arg_obj.name, 'li')
@@ -261,7 +261,7 @@ class AnalyzerTestCase(unittest.TestCase):
         self.assertEqual(type_arg_func.operation, type_var.operation)
         self.assertTrue(type_arg_func.is_native)
         #For: arggg
-        type_var = model._TypeData(0, '__builtin__.list', None, None)
+        type_var = model.TypeData(0, '__builtin__.list', None, None)
         func_arg_obj = func.args['arggg']
         type_arg_func = func_arg_obj.data[0]
         self.assertEqual(func_arg_obj.name, 'arggg')
@@ -270,7 +270,7 @@ class AnalyzerTestCase(unittest.TestCase):
         self.assertEqual(type_arg_func.operation, type_var.operation)
         self.assertTrue(type_arg_func.is_native)
         #For: kwarggg
-        type_var = model._TypeData(0, '__builtin__.dict', None, None)
+        type_var = model.TypeData(0, '__builtin__.dict', None, None)
         func_arg_obj = func.args['kwarggg']
         type_arg_func = func_arg_obj.data[0]
         self.assertEqual(func_arg_obj.name, 'kwarggg')
@@ -303,6 +303,101 @@ class AnalyzerTestCase(unittest.TestCase):
         self.assertTrue(result_data.is_native)
         self.assertFalse(result_data.from_import)
 
+###############################################################################
+# INCREMENTAL ANALYSIS
+###############################################################################
+
+    def test_split_top_level(self):
+        source = ("import os\n"
+                  "@decorator\n"
+                  "def func():\n"
+                  "    pass\n"
+                  "if os:\n"
+                  "    a = 1\n"
+                  "else:\n"
+                  "    a = 2\n")
+        spans = analyzer.split_top_level(source.split('\n'))
+        self.assertEqual(spans, [(0, 1), (1, 4), (4, 9)])
+
+    def test_incremental_reuse_unchanged_symbols(self):
+        old_module = self.analyzer.analyze(SOURCE_ANALYZER_NATIVE)
+        source = SOURCE_ANALYZER_NATIVE.replace('b = []', 'b = []\nc = {}')
+        module = self.analyzer.analyze(source, old_module)
+
+        self.assertTrue(module.classes['Test'] is old_module.classes['Test'])
+        self.assertTrue(module.functions['global_func'] is
+                        old_module.functions['global_func'])
+        result_a = sorted(module.attributes.keys())
+        self.assertEqual(result_a, ['a', 'b', 'c', 'man'])
+
+    def test_incremental_update_line_numbers(self):
+        old_module = self.analyzer.analyze(SOURCE_ANALYZER_NATIVE)
+        source = SOURCE_ANALYZER_NATIVE.replace('b = []', 'b = []\nc = {}')
+        module = self.analyzer.analyze(source, old_module)
+        expected = analyzer.Analyzer().analyze(source)
+
+        func = module.classes['Test'].functions['func_args']
+        expected_func = expected.classes['Test'].functions['func_args']
+        self.assertEqual(func.args['num'].data[0].lineno,
+                         expected_func.args['num'].data[0].lineno)
+        attr = module.classes['Test'].attributes['x']
+        expected_attr = expected.classes['Test'].attributes['x']
+        self.assertEqual(attr.data[0].lineno, expected_attr.data[0].lineno)
+        self.assertEqual(module.attributes['man'].data[0].lineno,
+                         expected.attributes['man'].data[0].lineno)
+
+    def test_incremental_with_syntax_error(self):
+        old_module = self.analyzer.analyze(SOURCE_ANALYZER_NATIVE)
+        source = SOURCE_ANALYZER_NATIVE + '\ndef broken():\n    x = = 1\n'
+        module = self.analyzer.analyze(source, old_module)
+
+        # The repaired statement is sent to the resolvers with the rest
+        self.assertEqual(len(module.spans), len(old_module.spans) + 1)
+        self.assertIn('Test', module.classes)
+        self.assertIn('broken', module.functions)
+        # but it is parsed again in the next analysis
+        broken = module.functions['broken']
+        module = self.analyzer.analyze(source, module)
+        self.assertIsNot(module.functions['broken'], broken)
+
+    def test_syntax_error_isolated_in_its_statement(self):
+        source = SOURCE_ANALYZER_NATIVE + (
+            '\nclass Broken(object):\n'
+            '    def method(self):\n'
+            '        self.a = = 1\n'
+            '    def other(self):\n'
+            '        self.b = 1\n'
+            '\nlast = 3\n')
+        module = self.analyzer.analyze(source)
+
+        self.assertIn('Test', module.classes)
+        self.assertIn('Broken', module.classes)
+        self.assertEqual(sorted(module.classes['Broken'].functions.keys()),
+                         ['method', 'other'])
+        self.assertIn('last', module.attributes)
+        self.assertEqual(module.attributes['last'].data[0].lineno,
+                         len(source.split('\n')) - 1)
+        # The repaired statement keeps the line numbers of the source
+        line = source.split('\n').index('        self.b = 1') + 1
+        attribute = module.classes['Broken'].attributes['b']
+        self.assertEqual(attribute.data[0].lineno, line)
+
+    def test_statement_that_can_not_be_fixed_is_discarded(self):
+        source = 'a = 1\nb = (1,\n\ndef func():\n    pass\n'
+        module = self.analyzer.analyze(source)
+
+        self.assertEqual(sorted(module.attributes.keys()), ['a'])
+        self.assertIn('func', module.functions)
+
+    def test_string_split_in_statements_is_parsed_whole(self):
+        source = 'text = """\nline\n"""\nvalue = 1\n'
+        old_module = self.analyzer.analyze(source)
+        source = source.replace('line', 'other line')
+        module = self.analyzer.analyze(source, old_module)
+
+        self.assertEqual(sorted(module.attributes.keys()), ['text', 'value'])
+        self.assertEqual(module.spans, {})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -16,11 +16,20 @@
 # along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
 from __future__ import absolute_import
 
+import threading
 import unittest
 
-from ninja_ide.tools.completion import code_completion
-from ninja_ide.tools.completion import completion_daemon
-from ninja_tests.tools.completion import get_source_data, SOURCE_COMPLETION
+from ninja_ide.intellisensei.completion import code_completion
+from ninja_ide.intellisensei.analyzer import analyzer_daemon
+from ninja_tests.tools.completion import get_buffer_data, SOURCE_COMPLETION
+
+
+analyzer_daemon.WAITING_BEFORE_START = 0
+
+
+# Names of SOURCE_COMPLETION in their own kinds in the completion index
+CLASSES = ['MyClass']
+MODULES = ['QtGui', 'os']
 
 
 class CodeCompletionTestCase(unittest.TestCase):
@@ -30,7 +39,7 @@ class CodeCompletionTestCase(unittest.TestCase):
         self.cc = code_completion.CodeCompletion()
 
     def tearDown(self):
-        completion_daemon.shutdown_daemon()
+        analyzer_daemon.shutdown_daemon()
 
 ###############################################################################
 # TESTS FOR BUILTIN COMPLETION
@@ -69,7 +78,8 @@ class CodeCompletionTestCase(unittest.TestCase):
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(SOURCE_COMPLETION, 'cat')
+        expected = get_buffer_data(SOURCE_COMPLETION, 'cat',
+                                   CLASSES, MODULES)
         self.assertEqual(expected, results)
 
     def test_builtin_list_completion_in_class_not_attr(self):
@@ -175,7 +185,8 @@ class CodeCompletionTestCase(unittest.TestCase):
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(SOURCE_COMPLETION, 's')
+        expected = get_buffer_data(SOURCE_COMPLETION, 's',
+                                   CLASSES, MODULES)
         self.assertEqual(expected, results)
 
     def test_builtin_int_completion_in_class_attr(self):
@@ -282,7 +293,8 @@ class CodeCompletionTestCase(unittest.TestCase):
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(source_code, 'self')
+        expected = get_buffer_data(source_code, 'self',
+                                   CLASSES, MODULES)
         self.assertEqual(expected, results)
 
     def test_builtin_dict_completion_in_class_attr_diff_func(self):
@@ -529,9 +541,59 @@ class CodeCompletionTestCase(unittest.TestCase):
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(source_code, 'invalid')
+        expected = get_buffer_data(source_code, 'invalid',
+                                   CLASSES, MODULES)
         self.assertEqual(expected, results)
 
+###############################################################################
+# TESTS FOR ASYNC COMPLETION
+###############################################################################
+
+    def _wait_completions(self, source_code, requests=1):
+        received = []
+        event = threading.Event()
+
+        def callback(request_id, results):
+            received.append((request_id, results))
+            event.set()
+        # The daemon is busy until all the requests are sent
+        self.cc.cdaemon.lock.acquire()
+        try:
+            for i in range(requests):
+                request_id, results = self.cc.request_completion(
+                    source_code, len(source_code), callback)
+        finally:
+            self.cc.cdaemon.lock.release()
+        event.wait(5)
+        return request_id, received
+
+    def test_request_completion_local(self):
+        global SOURCE_COMPLETION
+        source_code = SOURCE_COMPLETION + '\n        self.'
+        self.cc.analyze_file('', source_code)
+        received = []
+        request_id, results = self.cc.request_completion(
+            source_code, len(source_code),
+            lambda *args: received.append(args))
+        self.assertIn('print_function', results['functions'])
+        self.assertEqual([], received)
+
+    def test_request_completion_streamed(self):
+        global SOURCE_COMPLETION
+        source_code = SOURCE_COMPLETION + '\n        os.path.'
+        self.cc.analyze_file('', source_code)
+        request_id, received = self._wait_completions(source_code)
+        self.assertEqual(1, len(received))
+        self.assertEqual(request_id, received[0][0])
+        self.assertIn('expanduser', received[0][1]['functions'])
+
+    def test_request_completion_stale(self):
+        global SOURCE_COMPLETION
+        source_code = SOURCE_COMPLETION + '\n        os.path.'
+        self.cc.analyze_file('', source_code)
+        request_id, received = self._wait_completions(source_code, 3)
+        self.assertEqual([request_id], [item[0] for item in received])
+
 ###############################################################################
 # TESTS FOR COMPLETION SEGMENT
 ###############################################################################
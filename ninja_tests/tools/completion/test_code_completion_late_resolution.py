@@ -17,22 +17,38 @@
 from __future__ import absolute_import
 
 import _ast
+import os
+import shutil
+import tempfile
 import time
 import unittest
 
-from ninja_ide.tools.completion import analyzer
-from ninja_ide.tools.completion import model
-from ninja_ide.tools.completion import code_completion
-from ninja_ide.tools.completion import completion_daemon
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.intellisensei.completion import code_completion
+from ninja_ide.intellisensei.analyzer import analyzer_daemon
 from ninja_tests.tools.completion import (
-    get_source_data,
+    get_buffer_data,
     SOURCE_LATE_RESOLUTION,
     SOURCE_INHERITANCE
 )
 
 
-completion_daemon.shutdown_daemon()
-completion_daemon.WAITING_BEFORE_START = 0
+analyzer_daemon.shutdown_daemon()
+analyzer_daemon.WAITING_BEFORE_START = 0
+
+
+def wait_resolved(cc, timeout=10):
+    """Wait until the daemon has no module pending to be resolved."""
+    daemon = cc.cdaemon
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        daemon._dispatch_lock.acquire()
+        busy = daemon._pending or daemon._running
+        daemon._dispatch_lock.release()
+        if not busy and daemon.queue_receive.empty():
+            break
+        time.sleep(0.05)
 
 
 class AnalyzerLateResolutionTestCase(unittest.TestCase):
@@ -43,7 +59,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         self.analyzer = analyzer.Analyzer()
 
     def tearDown(self):
-        completion_daemon.shutdown_daemon()
+        analyzer_daemon.shutdown_daemon()
 
 ###############################################################################
 # For Python Imports
@@ -52,7 +68,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
     def test_var_attribute_assign(self):
         module = self.analyzer.analyze(SOURCE_LATE_RESOLUTION)
 
-        type1 = model._TypeData(None, 'os', 'import os', None)
+        type1 = model.TypeData(None, 'os', 'import os', None)
         type2 = model.Assign('p')
         type2.add_data(4, model.late_resolution, 'p = os.path', _ast.Attribute)
         expected = {'os': type1}
@@ -75,7 +91,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\np.'
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('pathsep', results['attributes'])
         self.assertIn('expanduser', results['functions'])
@@ -87,7 +103,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('pathsep', results['attributes'])
         self.assertIn('expanduser', results['functions'])
@@ -99,7 +115,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -109,7 +125,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -120,7 +136,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -131,9 +147,9 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(source_code, 'q')
+        expected = get_buffer_data(source_code, 'q', modules=['os'])
         self.assertEqual(results, expected)
 
     def test_simple_import_late_resolution_chained_func_1(self):
@@ -147,7 +163,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('exit', results['attributes'])
 
@@ -162,7 +178,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -177,7 +193,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('expanduser', results['functions'])
 
@@ -192,9 +208,10 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(source_code, 'a')
+        expected = get_buffer_data(source_code, 'a',
+                                   modules=['os', 'sys', 'threading'])
         self.assertEqual(expected, results)
 
     def test_simple_import_late_resolution_chained_func_5(self):
@@ -208,7 +225,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -223,7 +240,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('expanduser', results['functions'])
 
@@ -238,9 +255,10 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
-        expected = get_source_data(source_code, 'q')
+        expected = get_buffer_data(source_code, 'q',
+                                   modules=['os', 'sys', 'threading'])
         self.assertEqual(expected, results)
 
     def test_simple_import_late_resolution_local_symbols(self):
@@ -257,7 +275,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = {'attributes': ['a', 'q', 'value1'],
                     'functions': ['__init__', 'func', 'gfunc']}
@@ -277,7 +295,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = {'attributes': ['a', 'q', 'value1'],
                     'functions': ['__init__', 'func', 'gfunc']}
@@ -298,7 +316,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(str)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -313,7 +331,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(str)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -327,7 +345,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(str)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -348,7 +366,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(str)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -368,7 +386,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(str)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -391,7 +409,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(int)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -411,7 +429,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         expected = dir(int)
         __attrib = [d for d in expected if d[:2] == '__']
@@ -427,7 +445,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -439,7 +457,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -451,7 +469,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('Lock', results['attributes'])
 
@@ -464,7 +482,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('Lock', results['attributes'])
 
@@ -477,7 +495,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -491,7 +509,7 @@ class AnalyzerLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_LATE_RESOLUTION + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
 
@@ -504,7 +522,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         self.analyzer = analyzer.Analyzer()
 
     def tearDown(self):
-        completion_daemon.shutdown_daemon()
+        analyzer_daemon.shutdown_daemon()
 
     def test_simple_local_inheritance(self):
         new_code = ['class Son(Parent):',
@@ -516,7 +534,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_INHERITANCE + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('value', results['attributes'])
         self.assertIn('x', results['attributes'])
@@ -532,7 +550,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_INHERITANCE + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
         self.assertIn('x', results['attributes'])
@@ -547,7 +565,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_INHERITANCE + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('real', results['attributes'])
         self.assertIn('x', results['attributes'])
@@ -563,7 +581,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_INHERITANCE + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
         self.assertIn('real', results['attributes'])
@@ -585,7 +603,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_INHERITANCE + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
         self.assertIn('real', results['attributes'])
@@ -608,7 +626,7 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         source_code = SOURCE_INHERITANCE + '\n'.join(new_code)
         self.cc.analyze_file('', source_code)
         offset = len(source_code)
-        time.sleep(1)
+        wait_resolved(self.cc)
         results = self.cc.get_completion(source_code, offset)
         self.assertIn('acquire', results['attributes'])
         self.assertIn('real', results['attributes'])
@@ -618,5 +636,57 @@ class InheritanceLateResolutionTestCase(unittest.TestCase):
         self.assertIn('to_integral', results['functions'])
 
 
+class LinkedModulesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        code_completion.settings.SYNTAX = {'python': {'keywords': []}}
+        self.folder = tempfile.mkdtemp()
+        self.project = os.path.join(self.folder, 'shop')
+        os.mkdir(self.project)
+        open(os.path.join(self.project, '__init__.py'), 'w').close()
+        self.shapes = os.path.join(self.project, 'shapes.py')
+        self._write_shapes(['area'])
+        self.cc = code_completion.CodeCompletion()
+        analyzer_daemon.add_project_folder(self.project)
+
+    def tearDown(self):
+        analyzer_daemon.shutdown_daemon()
+        analyzer_daemon.PROJECTS.pop(self.project, None)
+        shutil.rmtree(self.folder)
+
+    def _write_shapes(self, methods):
+        lines = ['class Shape(object):']
+        for method in methods:
+            lines += ['    def %s(self):' % method, '        pass']
+        with open(self.shapes, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def test_dependents_linked_again_when_the_module_changes(self):
+        source_code = 'from shop import shapes\ns = shapes.Shape()\ns.'
+        main = os.path.join(self.project, 'main.py')
+        self.cc.analyze_file(main, source_code)
+        wait_resolved(self.cc)
+        results = self.cc.get_completion(source_code, len(source_code))
+        self.assertEqual(results['functions'], ['area'])
+
+        daemon = self.cc.cdaemon
+        linked = []
+        link_module = daemon._link_module
+
+        def record_link(path_id):
+            linked.append(path_id)
+            link_module(path_id)
+        daemon._link_module = record_link
+        self._write_shapes(['area', 'volume'])
+        daemon.invalidate_module(self.shapes)
+        deadline = time.time() + 10
+        while main not in linked and time.time() < deadline:
+            time.sleep(0.05)
+        wait_resolved(self.cc)
+        self.assertEqual(linked, [main])
+        results = self.cc.get_completion(source_code, len(source_code))
+        self.assertEqual(results['functions'], ['area', 'volume'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ninja_ide.intellisensei.completion import completion_db
+
+
+PACKAGE_INIT = '''from pkg.shapes import *
+from pkg import shapes as _shapes
+
+VERSION = 1
+'''
+
+SHAPES = '''import os
+
+try:
+    from math import pi
+except ImportError:
+    pi = 3.14
+
+
+def area(shape):
+    return shape.area()
+
+
+class Shape(object):
+
+    sides = 0
+
+    def __init__(self, name):
+        self.name = name
+
+    def area(self):
+        return 0
+
+
+class Circle(Shape):
+
+    def __init__(self, radius):
+        self.radius = radius
+
+
+class Unknown(get_base()):
+    pass
+'''
+
+
+class CompletionDatabaseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        package = os.path.join(self.folder, 'pkg')
+        os.mkdir(package)
+        with open(os.path.join(package, '__init__.py'), 'w') as f:
+            f.write(PACKAGE_INIT)
+        with open(os.path.join(package, 'shapes.py'), 'w') as f:
+            f.write(SHAPES)
+        with open(os.path.join(self.folder, 'broken.py'), 'w') as f:
+            f.write('def broken(:\n')
+        self.database_folder = tempfile.mkdtemp()
+        self.database = completion_db.CompletionDatabase(
+            os.path.join(self.database_folder, 'completion.db'))
+        self.database.index([self.folder])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        shutil.rmtree(self.database_folder)
+
+    def test_find_modules(self):
+        modules = sorted(completion_db.find_modules([self.folder]))
+        self.assertEqual([name for name, filename in modules],
+                         ['broken', 'pkg', 'pkg.shapes'])
+
+    def test_module_completions(self):
+        result = self.database.get_completions('pkg.shapes.')
+        self.assertEqual(result['functions'], ['area'])
+        self.assertEqual(result['classes'], ['Circle', 'Shape', 'Unknown'])
+        # os is not in the database, but it is imported as a module
+        self.assertEqual(result['modules'], ['os'])
+        self.assertIn('pi', result['attributes'])
+
+    def test_prefix(self):
+        result = self.database.get_completions('pkg.shapes.Ci')
+        self.assertEqual(result['classes'], ['Circle'])
+        self.assertEqual(result['functions'], [])
+
+    def test_star_import_and_submodules(self):
+        result = self.database.get_completions('pkg.')
+        self.assertEqual(result['functions'], ['area'])
+        self.assertIn('Shape', result['classes'])
+        self.assertIn('VERSION', result['attributes'])
+        self.assertEqual(result['modules'], ['_shapes', 'os', 'shapes'])
+
+    def test_class_members(self):
+        result = self.database.get_completions('pkg.shapes.Circle().')
+        self.assertIn('area', result['functions'])
+        self.assertIn('__init__', result['functions'])
+        self.assertIn('radius', result['attributes'])
+        self.assertIn('sides', result['attributes'])
+        self.assertIn('__doc__', result['attributes'])
+        self.assertIn('__setattr__', result['functions'])
+
+    def test_incomplete_answers(self):
+        self.assertEqual(
+            self.database.get_completions('pkg.shapes.Unknown().'), None)
+        self.assertEqual(self.database.get_completions('broken.'), None)
+        self.assertEqual(self.database.get_completions('missing.'), None)
+        self.assertEqual(
+            self.database.get_completions('pkg.shapes.area().'), None)
+
+    def test_update_changed_modules(self):
+        shapes = os.path.join(self.folder, 'pkg', 'shapes.py')
+        with open(shapes, 'a') as f:
+            f.write('\ndef perimeter(shape):\n    pass\n')
+        stat = os.stat(shapes)
+        os.utime(shapes, (stat.st_atime, stat.st_mtime + 10))
+        os.remove(os.path.join(self.folder, 'broken.py'))
+        self.database.index([self.folder])
+        result = self.database.get_completions('pkg.shapes.')
+        self.assertEqual(result['functions'], ['area', 'perimeter'])
+        self.assertEqual(
+            sorted(completion_db.find_modules([self.folder]))[0][0], 'pkg')
+
+    def test_index_is_current(self):
+        self.assertTrue(self.database.is_current([self.folder]))
+        self.assertFalse(self.database.is_current([self.folder, '/other']))
+        with open(os.path.join(self.folder, 'new.py'), 'w') as f:
+            f.write('value = 1\n')
+        stat = os.stat(self.folder)
+        os.utime(self.folder, (stat.st_atime, stat.st_mtime + 10))
+        self.assertFalse(self.database.is_current([self.folder]))
+        self.database.index([self.folder])
+        self.assertTrue(self.database.is_current([self.folder]))
+
+    def test_edited_module_is_not_current(self):
+        module = os.path.join(self.folder, 'pkg', 'mod.py')
+        with open(module, 'w') as f:
+            f.write('def old():\n    pass\n')
+        self.database.index([self.folder])
+        self.assertTrue(self.database.is_current([self.folder]))
+        stat = os.stat(self.folder)
+        with open(module, 'w') as f:
+            f.write('def new():\n    pass\n')
+        os.utime(module, (stat.st_atime, stat.st_mtime + 10))
+        # Editing a module in a package doesn't change the folder
+        os.utime(self.folder, (stat.st_atime, stat.st_mtime))
+        self.assertFalse(self.database.is_current([self.folder]))
+        self.database.index([self.folder])
+        self.assertEqual(self.database.get_completions('pkg.mod.')[
+            'functions'], ['new'])
+
+
+class StartIndexerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.started = []
+        test = self
+
+        class FakeIndexer(object):
+
+            def __init__(self, python_exec):
+                self.python_exec = python_exec
+
+            def start(self):
+                test.started.append(self.python_exec)
+        self._indexer = completion_db._IndexerProcess
+        completion_db._IndexerProcess = FakeIndexer
+
+    def tearDown(self):
+        completion_db._IndexerProcess = self._indexer
+        for python_exec in ('python_a', 'python_b'):
+            completion_db.__dict__['__indexers'].pop(python_exec, None)
+
+    def test_indexer_started_once_per_interpreter(self):
+        for i in range(3):
+            completion_db.start_indexer('python_a')
+        completion_db.start_indexer('python_b')
+        self.assertEqual(self.started, ['python_a', 'python_b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.completion import completion_index
+
+
+class CompletionIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = completion_index.CompletionIndex(
+            {'attributes': ['path', 'sep', 'pathsep'],
+             'functions': ['join', 'split'],
+             'classes': ['Popen'],
+             'modules': ['os']})
+
+    def test_search_prefix(self):
+        result = self.index.search('pa')
+        self.assertEqual(result['attributes'], ['path', 'pathsep'])
+        self.assertEqual(result['functions'], [])
+        self.assertEqual(result['classes'], [])
+
+    def test_search_all(self):
+        result = self.index.search()
+        self.assertEqual(result['attributes'], ['path', 'pathsep', 'sep'])
+        self.assertEqual(result['functions'], ['join', 'split'])
+        self.assertEqual(result['classes'], ['Popen'])
+        self.assertEqual(result['modules'], ['os'])
+
+    def test_kind_precedence(self):
+        self.index.add('attributes', ['join'])
+        self.assertEqual(self.index.search('j')['functions'], ['join'])
+        self.assertEqual(self.index.search('j')['attributes'], [])
+        self.index.remove('functions', ['join'])
+        self.assertEqual(self.index.search('j')['attributes'], ['join'])
+
+    def test_remove_counts(self):
+        self.index.add('attributes', ['sep'])
+        self.index.remove('attributes', ['sep'])
+        self.assertIn('sep', self.index)
+        self.index.remove('attributes', ['sep'])
+        self.assertNotIn('sep', self.index)
+        self.assertEqual(self.index.search('s')['functions'], ['split'])
+        self.assertEqual(len(self.index), 6)
+
+
+class BufferNamesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = completion_index.CompletionIndex()
+        self.buffer_names = completion_index.BufferNames(self.index,
+                                                         ('def', 'class'))
+
+    def test_names_of_source(self):
+        self.buffer_names.update('class Foo(object):\n'
+                                 '    def bar(self):\n'
+                                 '        return 1\n'
+                                 'value = Foo()\n')
+        result = self.index.search()
+        self.assertEqual(result['classes'], ['Foo'])
+        self.assertEqual(result['functions'], ['bar'])
+        self.assertEqual(result['attributes'],
+                         ['object', 'return', 'self', 'value'])
+
+    def test_update_changed_statements(self):
+        self.buffer_names.update('first = 1\nsecond = 2\n')
+        self.buffer_names.update('first = 1\nthird = 3\n')
+        result = self.index.search()
+        self.assertEqual(result['attributes'], ['first', 'third'])
+
+    def test_repeated_statements(self):
+        self.buffer_names.update('first = 1\nfirst = 1\n')
+        self.buffer_names.update('first = 1\n')
+        self.assertIn('first', self.index)
+        self.buffer_names.update('')
+        self.assertEqual(len(self.index), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
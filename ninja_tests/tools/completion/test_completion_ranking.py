@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ninja_ide.intellisensei.completion import completion_index
+from ninja_ide.intellisensei.completion import completion_ranking
+
+
+NAMES = ['__init__', 'get_data', 'GetDict', 'getattr', 'set_data',
+         'widget_data', 'update']
+
+
+class CompletionRankingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.folder, 'selections.db')
+        self.ranker = completion_ranking.CompletionRanker('project',
+                                                          self.db_path)
+        self.candidates = completion_ranking.create_candidates(
+            [(name, 'a') for name in sorted(NAMES)])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _rank(self, pattern, limit=None):
+        return [name for kind, name in
+                self.ranker.rank(pattern, self.candidates, limit)]
+
+    def test_char_mask(self):
+        self.assertEqual(completion_ranking.char_mask('ab'),
+                         completion_ranking.char_mask('baab'))
+        self.assertNotEqual(completion_ranking.char_mask('ab'),
+                            completion_ranking.char_mask('ac'))
+
+    def test_empty_pattern_shortest_first_and_private_last(self):
+        self.assertEqual(self._rank(''),
+                         ['update', 'GetDict', 'getattr', 'get_data',
+                          'set_data', 'widget_data', '__init__'])
+
+    def test_prefix_before_initials_and_subsequence(self):
+        self.assertEqual(self._rank('gd'),
+                         ['GetDict', 'get_data', 'widget_data'])
+
+    def test_case_of_the_prefix(self):
+        self.assertEqual(self._rank('Get')[0], 'GetDict')
+        self.assertEqual(self._rank('get')[0], 'getattr')
+
+    def test_names_without_the_characters_are_discarded(self):
+        self.assertEqual(self._rank('xyz'), [])
+        self.assertEqual(self._rank('ag'), [])
+        self.assertEqual(self._rank('upd'), ['update'])
+
+    def test_single_character(self):
+        self.assertEqual(self._rank('u'), ['update'])
+        self.assertEqual(self._rank('i'),
+                         ['GetDict', 'widget_data', '__init__'])
+
+    def test_limit(self):
+        self.assertEqual(self._rank('', 2), ['update', 'GetDict'])
+        self.assertEqual(self._rank('data', 1), ['get_data'])
+
+    def test_selections_rank_higher(self):
+        self.assertEqual(self._rank('data')[0], 'get_data')
+        self.ranker.record('widget_data')
+        self.ranker.record('widget_data')
+        self.assertEqual(self._rank('data')[0], 'widget_data')
+
+    def test_selections_are_stored_by_project(self):
+        self.ranker.record('set_data')
+        self.ranker.record('set_data')
+        self.ranker.flush()
+        ranker = completion_ranking.CompletionRanker('project', self.db_path)
+        self.assertEqual(ranker.selections, {'set_data': 2})
+        other = completion_ranking.CompletionRanker('other', self.db_path)
+        self.assertEqual(other.selections, {})
+
+    def test_selections_are_stored_in_batches(self):
+        self.ranker.record('set_data')
+        self.ranker.record('update')
+        ranker = completion_ranking.CompletionRanker('project', self.db_path)
+        self.assertEqual(ranker.selections, {})
+        self.ranker.flush()
+        self.ranker.record('update')
+        self.ranker.flush()
+        ranker = completion_ranking.CompletionRanker('project', self.db_path)
+        self.assertEqual(ranker.selections, {'set_data': 1, 'update': 2})
+
+    def test_flush_rankers(self):
+        rankers = completion_ranking.__dict__['__rankers']
+        rankers['flushed'] = completion_ranking.CompletionRanker(
+            'flushed', self.db_path)
+        rankers['flushed'].record('get_data')
+        completion_ranking.flush_rankers()
+        stored = completion_ranking.CompletionRanker('flushed', self.db_path)
+        self.assertEqual(stored.selections, {'get_data': 1})
+        rankers.pop('flushed')
+
+    def test_candidates_of_the_index(self):
+        index = completion_index.CompletionIndex(
+            {'attributes': ['value'], 'functions': ['run', 'value']})
+        candidates = index.candidates()
+        self.assertEqual([(item[0], item[1]) for item in candidates],
+                         [('run', 'f'), ('value', 'f')])
+        self.assertTrue(index.candidates() is candidates)
+        index.add('classes', ['Value'])
+        self.assertEqual(self.ranker.rank('val', index.candidates()),
+                         [('f', 'value'), ('c', 'Value')])
+
+
+if __name__ == '__main__':
+    unittest.main()
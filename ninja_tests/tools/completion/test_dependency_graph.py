@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.analyzer import dependency_graph
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = dependency_graph.DependencyGraph()
+        self.graph.pin('main.py')
+        self.graph.pin('other.py')
+        self.graph.set_dependencies('main.py', ['a.py', 'b.py'])
+        self.graph.set_dependencies('other.py', ['b.py'])
+        self.graph.set_dependencies('a.py', ['c.py'])
+
+    def test_edges(self):
+        self.assertEqual(self.graph.dependencies('main.py'),
+                         set(['a.py', 'b.py']))
+        self.assertEqual(self.graph.dependents('b.py'),
+                         set(['main.py', 'other.py']))
+
+    def test_replace_dependencies(self):
+        self.graph.set_dependencies('main.py', ['c.py'])
+        self.assertEqual(self.graph.dependents('a.py'), set())
+        self.assertEqual(self.graph.dependents('b.py'), set(['other.py']))
+        self.assertEqual(self.graph.dependents('c.py'),
+                         set(['a.py', 'main.py']))
+
+    def test_transitive_dependents(self):
+        self.assertEqual(self.graph.transitive_dependents('c.py'),
+                         ['a.py', 'main.py'])
+        self.assertEqual(sorted(self.graph.transitive_dependencies(
+                         'main.py')), ['a.py', 'b.py', 'c.py'])
+
+    def test_release_keeps_shared_modules(self):
+        released = self.graph.release('main.py')
+        self.assertEqual(released, set(['a.py', 'c.py', 'main.py']))
+        self.assertTrue('b.py' in self.graph)
+        self.assertFalse('a.py' in self.graph)
+        self.assertEqual(self.graph.release('other.py'),
+                         set(['other.py', 'b.py']))
+
+    def test_release_import_cycle(self):
+        self.graph.set_dependencies('c.py', ['a.py'])
+        released = self.graph.release('main.py')
+        self.assertEqual(released, set(['a.py', 'c.py', 'main.py']))
+        self.assertEqual(self.graph.dependents('b.py'), set(['other.py']))
+
+    def test_release_pinned_dependency(self):
+        self.graph.pin('a.py')
+        self.assertEqual(self.graph.release('main.py'), set(['main.py']))
+        self.assertEqual(self.graph.dependents('a.py'), set())
+        self.assertTrue(self.graph.is_pinned('a.py'))
+
+    def test_release_module_imported_by_other_module(self):
+        self.assertEqual(self.graph.release('a.py'), set())
+        self.assertTrue('a.py' in self.graph)
+        self.assertEqual(self.graph.dependents('c.py'), set(['a.py']))
+
+    def test_release_cycle_kept_by_pinned_module(self):
+        self.graph.set_dependencies('c.py', ['a.py'])
+        self.graph.set_dependencies('other.py', ['b.py', 'c.py'])
+        released = self.graph.release('main.py')
+        self.assertEqual(released, set(['main.py']))
+        self.assertEqual(self.graph.dependents('a.py'), set(['c.py']))
+
+
+if __name__ == '__main__':
+    unittest.main()
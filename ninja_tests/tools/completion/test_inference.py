@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import inference
+from ninja_ide.intellisensei.analyzer import model
+
+
+SOURCE = '''
+class Foo(object):
+
+    def create(self):
+        return Bar()
+
+    def copy(self):
+        with open('file') as f:
+            other = self.create()
+        return other
+
+
+class Bar(object):
+    pass
+
+
+def make():
+    return Foo()
+
+
+def build():
+    def inner():
+        return make()
+    while True:
+        result = inner()
+    return result.create()
+
+foo = make()
+bar = foo.create()
+built = build()
+try:
+    copied = foo.copy()
+except Exception:
+    pass
+unknown = missing()
+'''
+
+
+class InferenceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.module = analyzer.Analyzer().analyze(SOURCE)
+        self.inferred = inference.infer_call_types(self.module)
+
+    def _type_of(self, structure, name):
+        return structure.attributes[name].data[0].data_type
+
+    def test_module_calls(self):
+        foo = self.module.classes['Foo']
+        bar = self.module.classes['Bar']
+        self.assertEqual(self._type_of(self.module, 'foo'), foo)
+        self.assertEqual(self._type_of(self.module, 'bar'), bar)
+        self.assertEqual(self._type_of(self.module, 'copied'), bar)
+        self.assertEqual(self._type_of(self.module, 'unknown'),
+                         model.late_resolution)
+
+    def test_nested_scopes_and_blocks(self):
+        foo = self.module.classes['Foo']
+        build = self.module.functions['build']
+        self.assertEqual(self._type_of(build, 'result'), foo)
+        self.assertEqual(self._type_of(self.module, 'built'),
+                         self.module.classes['Bar'])
+        copy = foo.functions['copy']
+        self.assertEqual(self._type_of(copy, 'other'),
+                         self.module.classes['Bar'])
+        self.assertEqual(copy.get_data_type(), self.module.classes['Bar'])
+
+    def test_nothing_left_to_infer(self):
+        self.assertTrue(self.inferred > 0)
+        self.assertEqual(inference.infer_call_types(self.module), 0)
+
+    def test_find_callable(self):
+        foo = self.module.classes['Foo']
+        scopes = [self.module, foo, foo.functions['copy']]
+        self.assertEqual(inference.find_callable('self.create', scopes),
+                         foo.functions['create'])
+        # The methods are not visible without self
+        self.assertEqual(inference.find_callable('create', scopes), None)
+        self.assertEqual(inference.find_callable('make', scopes),
+                         self.module.functions['make'])
+
+    def test_calls_on_modules(self):
+        module = analyzer.Analyzer().analyze(
+            "import threading\n"
+            "def get():\n"
+            "    return threading\n"
+            "mod = get()\n"
+            "lock = mod.Lock()\n")
+        # The daemon resolves the return with the imports
+        module.functions['get'].return_type[0].data_type = 'threading'
+        inference.infer_call_types(module)
+        self.assertEqual(self._type_of(module, 'mod'), 'threading')
+        self.assertEqual(self._type_of(module, 'lock'), 'threading.Lock()')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.completion import introspection_service
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_discard_least_used(self):
+        cache = introspection_service.LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_get_missing(self):
+        cache = introspection_service.LRUCache(2)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(len(cache), 0)
+
+
+class IntrospectionServiceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.service = introspection_service.IntrospectionService()
+
+    def tearDown(self):
+        introspection_service.shutdown_service()
+
+    def test_singleton(self):
+        self.assertTrue(
+            self.service is introspection_service.IntrospectionService())
+
+    def test_module_completion(self):
+        result = self.service.get_all_completions('os.path.', ['import os'])
+        self.assertIn('join', result['functions'])
+        self.assertIn('sep', result['attributes'])
+
+    def test_completion_with_prefix(self):
+        self.service.get_all_completions('os.path.', ['import os'])
+        result = self.service.get_all_completions('os.path.jo', ['import os'])
+        self.assertEqual(result['functions'], ['join'])
+        self.assertEqual(result['attributes'], [])
+
+    def test_invalid_symbol(self):
+        result = self.service.get_all_completions('invalid_name.', [])
+        self.assertEqual(result, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,3 +14,80 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import model
+
+
+SOURCE = '''
+class Node(object):
+
+    def __init__(self):
+        self.child = Leaf()
+
+
+class Leaf(object):
+
+    def __init__(self):
+        self.value = 'text'
+'''
+
+
+class ModuleLookupsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.module = analyzer.Analyzer().analyze(SOURCE)
+        classes = self.module.classes
+        # The types resolved by the daemon
+        classes['Node'].attributes['child'].data[0].data_type = \
+            classes['Leaf']
+        self.module.add_attributes(
+            [('node', 0, classes['Node'], 'node = Node()', '=')])
+
+    def test_cached_lookup(self):
+        result = self.module.get_type('node', 'child.')
+        self.assertEqual(result['object'], self.module.classes['Leaf'])
+        self.assertEqual(len(self.module._lookups), 1)
+        self.module.classes['Node'].attributes.pop('child')
+        # The change was not notified, the cached result is used
+        self.assertEqual(self.module.get_type('node', 'child.'), result)
+        self.assertEqual(self.module.resolve_type('node', 'child.'),
+                         {'found': False, 'type': None})
+
+    def test_invalidate_lookups(self):
+        self.module.get_type('node', 'child.')
+        self.module.classes['Node'].attributes.pop('child')
+        model.invalidate_lookups()
+        self.assertEqual(self.module.get_type('node', 'child.'),
+                         {'found': False, 'type': None})
+
+    def test_returned_result_is_a_copy(self):
+        result = self.module.get_type('node', 'child.')
+        result['found'] = None
+        self.assertFalse(self.module.get_type('node', 'child.')['found'])
+
+    def test_lookups_are_bounded(self):
+        max_lookups = model.MAX_LOOKUPS
+        model.MAX_LOOKUPS = 2
+        try:
+            for name in ('a', 'b', 'c'):
+                self.module.get_type(name)
+            self.assertEqual(list(self.module._lookups), [('c', '', ())])
+        finally:
+            model.MAX_LOOKUPS = max_lookups
+
+    def test_misses_inside_a_scope_are_not_cached(self):
+        scope = ['Node', '__init__']
+        self.assertEqual(self.module.get_type('missing', '', scope),
+                         {'found': False, 'type': None})
+        self.assertEqual(self.module._lookups, {})
+        self.module.get_type('missing')
+        self.assertEqual(list(self.module._lookups), [('missing', '', ())])
+
+
+if __name__ == '__main__':
+    unittest.main()
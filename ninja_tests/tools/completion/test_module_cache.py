@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import model
+from ninja_ide.intellisensei.analyzer import module_cache
+from ninja_tests.tools.completion import SOURCE_ANALYZER_NATIVE
+
+
+class ModuleCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = module_cache.ModuleCache(
+            os.path.join(self.folder, 'modules.db'))
+        self.filename = os.path.join(self.folder, 'module.py')
+        with open(self.filename, 'w') as f:
+            f.write(SOURCE_ANALYZER_NATIVE)
+        self.module = analyzer.Analyzer().analyze(SOURCE_ANALYZER_NATIVE)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_empty_cache(self):
+        self.assertTrue(self.cache.is_empty())
+        self.assertEqual(self.cache.get(self.filename), None)
+
+    def test_put_and_get(self):
+        stat = self.cache.file_stat(self.filename)
+        self.cache.put(self.filename, self.module, stat)
+        self.assertFalse(self.cache.is_empty())
+        module, links = self.cache.get(self.filename)
+        self.assertEqual(sorted(module.classes.keys()), ['Test'])
+        self.assertEqual(sorted(module.attributes.keys()),
+                         ['a', 'b', 'man'])
+        self.assertEqual(links, [])
+
+    def test_modified_file_is_not_valid(self):
+        stat = self.cache.file_stat(self.filename)
+        self.cache.put(self.filename, self.module, stat)
+        with open(self.filename, 'a') as f:
+            f.write('\nnew_var = 3\n')
+        self.assertEqual(self.cache.get(self.filename), None)
+
+    def test_linked_paths(self):
+        linked = model.LinkedModule('/path/to/other.py', 'Clazz')
+        self.module.attributes['a'].data[0].data_type = linked
+        stat = self.cache.file_stat(self.filename)
+        self.cache.put(self.filename, self.module, stat)
+        links = self.cache.get(self.filename)[1]
+        self.assertEqual(links, ['/path/to/other.py'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ninja_ide.intellisensei.analyzer import package_map
+
+
+class PackageMapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project = os.path.join(self.folder, 'project')
+        self._create_package('pkg')
+        self._create_package(os.path.join('pkg', 'sub'))
+        os.makedirs(os.path.join(self.project, 'docs', 'images'))
+        self.map = package_map.PackageMap(
+            os.path.join(self.folder, 'packages.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _create_package(self, name):
+        folder = os.path.join(self.project, name)
+        os.makedirs(folder)
+        open(os.path.join(folder, '__init__.py'), 'w').close()
+
+    def test_crawl(self):
+        packages = self.map.crawl(self.project)
+        self.assertEqual(packages, {
+            'pkg': os.path.join(self.project, 'pkg'),
+            'pkg.sub': os.path.join(self.project, 'pkg', 'sub')})
+
+    def test_crawl_new_package(self):
+        self.map.crawl(self.project)
+        self._create_package(os.path.join('docs', 'ext'))
+        packages = self.map.crawl(self.project)
+        self.assertEqual(sorted(packages), ['docs.ext', 'pkg', 'pkg.sub'])
+
+    def test_unchanged_directories_are_not_listed(self):
+        self.map.crawl(self.project)
+        listed = []
+        list_directory = package_map.list_directory
+
+        def counting_list_directory(path):
+            listed.append(path)
+            return list_directory(path)
+        package_map.list_directory = counting_list_directory
+        try:
+            self.map.crawl(self.project)
+        finally:
+            package_map.list_directory = list_directory
+        self.assertEqual(listed, [])
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), 'symlinks not supported')
+    def test_symlink_loop(self):
+        os.symlink(self.project,
+                   os.path.join(self.project, 'pkg', 'sub', 'loop'))
+        packages = self.map.crawl(self.project)
+        self.assertEqual(sorted(packages), ['pkg', 'pkg.sub'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import unittest
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import parse_cache
+from ninja_ide.tools import introspection
+
+
+SOURCE = '''import os
+
+
+class Foo(object):
+
+    def method(self):
+        self.value = os.path
+
+
+def function():
+    pass
+
+data = Foo()
+'''
+
+
+class ParseCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = parse_cache.ParseCache(max_documents=2)
+
+    def test_source_parsed_once(self):
+        tree = self.cache.parse(SOURCE)
+        self.assertTrue(self.cache.parse(SOURCE) is tree)
+        self.assertTrue(self.cache.lookup(SOURCE) is tree)
+        self.assertEqual(self.cache.parses, 1)
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.edits, 1)
+
+    def test_lookup_does_not_parse(self):
+        self.assertEqual(self.cache.lookup(SOURCE), None)
+        self.assertEqual(self.cache.parses, 0)
+
+    def test_syntax_error_is_cached(self):
+        for i in range(2):
+            self.assertRaises(SyntaxError, self.cache.parse, 'def (:')
+        self.assertEqual(self.cache.parses, 1)
+
+    def test_bytes_and_unicode_cached_apart(self):
+        source = '# -*- coding: utf-8 -*-\na = 1\n'
+        text = source.decode('utf-8') if hasattr(source, 'decode') \
+            else source.encode('utf-8')
+        try:
+            self.cache.parse(text)
+        except SyntaxError:
+            # Python 2 doesn't parse a unicode with a coding declaration
+            pass
+        tree = self.cache.parse(source)
+        self.assertEqual(tree.body[0].targets[0].id, 'a')
+        self.assertEqual(self.cache.parses, 2)
+
+    def test_table_built_once(self):
+        built = []
+
+        def build(tree):
+            built.append(tree)
+            return len(tree.body)
+
+        self.assertEqual(self.cache.get_table(SOURCE, 'size', build), 4)
+        self.assertEqual(self.cache.get_table(SOURCE, 'size', build), 4)
+        self.assertEqual(len(built), 1)
+        self.assertTrue(built[0] is self.cache.parse(SOURCE))
+        self.assertEqual(self.cache.parses, 1)
+
+    def test_least_recently_used_dropped(self):
+        self.cache.parse('a = 1')
+        self.cache.parse('b = 1')
+        self.cache.parse('a = 1')
+        self.cache.parse('c = 1')
+        self.assertNotEqual(self.cache.lookup('a = 1'), None)
+        self.assertEqual(self.cache.lookup('b = 1'), None)
+
+    def test_parses_per_edit(self):
+        self.assertEqual(self.cache.parses_per_edit(), 0)
+        self.cache.parse('a = 1')
+        self.cache.parse('a = 1')
+        self.cache.parse('a = 2')
+        self.cache.add_partial_parse()
+        self.assertEqual(self.cache.parses_per_edit(), 1.5)
+
+
+class SharedParseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = parse_cache.get_cache()
+        self.cache.clear()
+
+    def _parses(self):
+        return self.cache.parses + self.cache.partial_parses
+
+    def test_consumers_share_one_parse(self):
+        source = SOURCE + '\nnew = 1\n'
+        parses = self._parses()
+        symbols, simplified = introspection.obtain_symbols(source,
+                                                           simple=True)
+        introspection.obtain_symbols(source, simple=True, only_simple=True)
+        introspection.obtain_imports(source)
+        module = analyzer.Analyzer().analyze(source)
+        self.assertEqual(self._parses() - parses, 1)
+        self.assertTrue(introspection.obtain_symbols(
+            source, simple=True)[0] is symbols)
+        self.assertIn('Foo', module.classes)
+        self.assertEqual(sorted(module.attributes.keys()), ['data', 'new'])
+
+    def test_edited_source_parses_only_the_changes(self):
+        old_module = analyzer.Analyzer().analyze(SOURCE)
+        parses = self.cache.parses
+        partial_parses = self.cache.partial_parses
+        source = SOURCE + '\nnew = 1\n'
+        module = analyzer.Analyzer().analyze(source, old_module)
+        self.assertEqual(self.cache.parses, parses)
+        self.assertEqual(self.cache.partial_parses - partial_parses, 1)
+        self.assertEqual(module.attributes['new'].data[0].lineno, 15)
+
+    def test_edited_source_uses_the_shared_ast(self):
+        old_module = analyzer.Analyzer().analyze(SOURCE)
+        source = SOURCE.replace('pass', 'return 1')
+        introspection.obtain_symbols(source)
+        parses = self._parses()
+        module = analyzer.Analyzer().analyze(source, old_module)
+        self.assertEqual(self._parses(), parses)
+        self.assertIn('function', module.functions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import pickle
+import unittest
+
+from ninja_ide.intellisensei.analyzer import analyzer
+from ninja_ide.intellisensei.analyzer import protocol
+from ninja_tests.tools.completion import SOURCE_ANALYZER_NATIVE
+
+
+class ProtocolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = analyzer.Analyzer()
+        self.module = self.analyzer.analyze(SOURCE_ANALYZER_NATIVE)
+        source = SOURCE_ANALYZER_NATIVE.replace('b = []', 'b = []\nc = 1')
+        self.new_module = self.analyzer.analyze(source, self.module)
+
+    def _transport(self, message):
+        return pickle.loads(pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+
+    def test_update_only_sends_new_spans(self):
+        message = protocol.create_update('path', self.new_module,
+                                         set(self.module.spans))
+        self.assertEqual(message[0], protocol.UPDATE)
+        self.assertEqual(len(message[2]), len(self.new_module.spans))
+        self.assertEqual(len(message[3]), 1)
+
+    def test_module_without_spans(self):
+        self.new_module.spans = {}
+        message = protocol.create_update('path', self.new_module, ())
+        self.assertEqual(message[0], protocol.MODULE)
+
+    def test_build_module_in_process(self):
+        first = protocol.create_update('path', self.module, ())
+        old_module = protocol.build_module(self._transport(first), None,
+                                           self.analyzer)
+        update = protocol.create_update('path', self.new_module,
+                                        set(self.module.spans))
+        module = protocol.build_module(self._transport(update), old_module,
+                                       self.analyzer)
+        self.assertEqual(sorted(module.attributes.keys()),
+                         ['a', 'b', 'c', 'man'])
+        self.assertTrue(module.classes['Test'] is
+                        old_module.classes['Test'])
+
+    def test_build_module_with_missing_spans(self):
+        update = protocol.create_update('path', self.new_module,
+                                        set(self.module.spans))
+        self.assertEqual(protocol.build_module(update, None, self.analyzer),
+                         None)
+
+    def test_apply_patches(self):
+        process_module = self._transport(self.module)
+        snapshot = protocol.take_snapshot(process_module)
+        func = process_module.functions['global_func']
+        func.attributes['obj'].data[0].data_type = 'os.path'
+        func.attributes['di'].data[0].data_type = \
+            process_module.classes['Test']
+        patches = protocol.collect_patches(process_module, snapshot)
+        self.assertEqual(len(patches), 2)
+
+        protocol.apply_patches(self.module, self._transport(patches))
+        func = self.module.functions['global_func']
+        self.assertEqual(func.attributes['obj'].data[0].data_type, 'os.path')
+        self.assertTrue(func.attributes['di'].data[0].data_type is
+                        self.module.classes['Test'])
+
+    def test_apply_patches_to_changed_line(self):
+        patches = [(('a', 'a', 0), 'a = 6', 'resolved')]
+        protocol.apply_patches(self.module, patches)
+        self.assertEqual(self.module.attributes['a'].data[0].data_type,
+                         '__builtin__.int')
+
+    def test_apply_patches_merges_the_bases_first(self):
+        module = self.analyzer.analyze(
+            'class Parent(Lock):\n'
+            '    pass\n'
+            'class Son(Parent):\n'
+            '    pass\n')
+        parent = module.classes['Parent']
+        son = module.classes['Son']
+        lock = ('threading.Lock().', {'attributes': ['locked'],
+                                      'functions': ['acquire']})
+        patches = [(('b', 'Son', 'Parent'), None,
+                    protocol.ClassReference('Parent')),
+                   (('b', 'Parent', 'Lock'), None, lock)]
+        protocol.apply_patches(module, patches)
+        self.assertIn('acquire', son.functions)
+        self.assertIn('locked', son.attributes)
+
+        son.bases['Parent'] = parent
+        self.assertEqual(protocol._parents_first([son, parent]),
+                         [parent, son])
+
+    def test_module_parent_restored(self):
+        module = self._transport(self.module)
+        self.assertTrue(module.classes['Test'].parent is module)
+        self.assertTrue(module.functions['global_func'].parent is module)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import unittest
+from tokenize import generate_tokens, TokenError
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO  # lint:ok
+
+from ninja_ide.intellisensei.completion import token_cache
+
+
+SOURCE = '''import os
+
+
+class Foo(object):
+
+    def __init__(self, value):
+        self.value = [value,
+                      os.path.sep]
+        if value:
+            self.other = """text
+            in two lines"""
+
+    def bar(self):
+        return self.value
+
+
+def main():
+    foo = Foo(1)
+    return foo.bar()
+'''
+
+
+def tokenize(code):
+    tokens = []
+    try:
+        for tkn_type, tkn_str, pos, _, line in \
+                generate_tokens(StringIO(code).readline):
+            tokens.append((tkn_type, tkn_str, pos, line))
+    except TokenError:
+        pass
+    return tokens
+
+
+class TokenCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = token_cache.TokenCache(checkpoint_lines=2)
+
+    def test_same_tokens(self):
+        for offset in range(0, len(SOURCE), 7):
+            code = SOURCE[:offset]
+            self.assertEqual(self.cache.tokenize(code), tokenize(code))
+
+    def test_checkpoints_keep_indentation(self):
+        self.cache.tokenize(SOURCE)
+        indents = [checkpoint[3] for checkpoint in self.cache._checkpoints]
+        self.assertIn(('    ', '        '), indents)
+
+    def test_edit_invalidates_checkpoints_below(self):
+        self.cache.tokenize(SOURCE)
+        checkpoints = list(self.cache._checkpoints)
+        edited = SOURCE.replace('return foo.bar()', 'return foo.value')
+        self.assertEqual(self.cache.tokenize(edited), tokenize(edited))
+        self.assertEqual(self.cache._checkpoints[:-1], checkpoints[:-1])
+        edited = SOURCE.replace('import os', 'import sys')
+        self.assertEqual(self.cache.tokenize(edited), tokenize(edited))
+
+    def test_unbalanced_brace(self):
+        code = SOURCE + 'foo.bar(os.pa'
+        self.assertEqual(self.cache.tokenize(code), tokenize(code))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from ninja_ide.tools.locator import fuzzy_index
+
+
+NAMES = ('get_text(self)', 'getTextType', 'set_text_editor', 'context',
+         'Editor(QWidget)', 'target', 'gadget_tag', 'editor.py')
+
+
+class FuzzyIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = fuzzy_index.FuzzyIndex()
+        for symbol_id, name in enumerate(NAMES):
+            self.index.add(symbol_id, name, '>' if '(' in name else '-')
+
+    def _names(self, pattern, kinds=None, limit=None):
+        return [NAMES[symbol_id]
+                for symbol_id in self.index.match(pattern, kinds, limit)]
+
+    def test_word_starts(self):
+        self.assertEqual(fuzzy_index.word_starts('getTextType'), (0, 3, 7))
+        self.assertEqual(fuzzy_index.word_starts('_set_text2'), (1, 5))
+        self.assertEqual(fuzzy_index.word_starts('HTTPServer'), (0,))
+
+    def test_tiers(self):
+        self.assertEqual(self._names('get'), [
+            # prefix
+            'get_text(self)', 'getTextType',
+            # substring, by position and length
+            'target', 'gadget_tag'])
+        self.assertEqual(self._names('text'), [
+            # boundary
+            'getTextType', 'get_text(self)', 'set_text_editor',
+            # substring
+            'context'])
+        self.assertEqual(self._names('gtt'), [
+            # initials
+            'getTextType',
+            # subsequence
+            'get_text(self)', 'gadget_tag'])
+
+    def test_subsequence_prefers_word_starts(self):
+        self.assertEqual(self._names('stedi'), ['set_text_editor'])
+        self.assertEqual(fuzzy_index.sort_matches('tx', ['taxes', 'the_xml']),
+                         ['the_xml', 'taxes'])
+
+    def test_arguments_not_matched(self):
+        self.assertEqual(self._names('qwidget'), [])
+        self.assertEqual(self._names('EDIT'),
+                         ['Editor(QWidget)', 'editor.py',
+                          'set_text_editor'])
+
+    def test_kinds_and_limit(self):
+        self.assertEqual(self._names('text', kinds=('-',)),
+                         ['getTextType', 'set_text_editor', 'context'])
+        self.assertEqual(self._names('t', limit=2),
+                         ['target', 'getTextType'])
+
+    def test_remove(self):
+        self.index.remove(1, 'getTextType', '-')
+        self.assertEqual(self._names('gtt'), ['get_text(self)',
+                                              'gadget_tag'])
+        self.index.add(1, 'getTextType', '-')
+        self.assertEqual(self._names('gtt')[0], 'getTextType')
+        self.assertEqual(len(self.index), len(NAMES))
+
+    def test_sort_matches(self):
+        self.assertEqual(
+            fuzzy_index.sort_matches('ed', ['context', 'set_text_editor',
+                                            'Editor', 'speed']),
+            ['Editor', 'set_text_editor', 'speed'])
+        self.assertEqual(fuzzy_index.sort_matches('', ['b', 'a']),
+                         ['b', 'a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
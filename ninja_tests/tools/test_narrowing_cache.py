@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import unittest
+
+from ninja_ide.tools.locator import narrowing_cache
+
+
+class PartialResults(object):
+
+    def __init__(self, items, loaded):
+        self.items = items
+        self.loaded = loaded
+
+    def complete(self):
+        return self.items if self.loaded else None
+
+
+class NarrowingCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = narrowing_cache.NarrowingCache()
+        self.cache.push('', PartialResults(['all'], False))
+        self.cache.push('<ed', ['Editor', 'TextEditor'])
+        self.cache.push('<edi', ['Editor'])
+
+    def test_backspace_returns_the_cached_results(self):
+        self.assertEqual(self.cache.get('<edi'), ['Editor'])
+        self.assertEqual(self.cache.get('<ed'), ['Editor', 'TextEditor'])
+        self.assertEqual(len(self.cache), 2)
+        # The results of the longer texts are forgotten
+        self.assertEqual(self.cache.get('<edx'), None)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_narrowable(self):
+        self.assertEqual(self.cache.narrowable('<edit'),
+                         ('<edi', ['Editor']))
+        self.assertEqual(self.cache.narrowable('<e'), None)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_narrowable_only_when_complete(self):
+        self.cache.clear()
+        results = PartialResults(['a', 'b'], False)
+        self.cache.push('a', results)
+        self.assertEqual(self.cache.narrowable('ab'), None)
+        results.loaded = True
+        self.assertEqual(self.cache.narrowable('ab'), ('a', ['a', 'b']))
+
+    def test_push_replaces_the_same_text(self):
+        self.cache.push('<edi', ['Edit'])
+        self.assertEqual(self.cache.get('<edi'), ['Edit'])
+        self.assertEqual(len(self.cache), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
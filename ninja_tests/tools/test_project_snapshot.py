@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ninja_ide.tools.locator import project_snapshot
+
+
+class ProjectSnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project = os.path.join(self.folder, 'project')
+        os.makedirs(os.path.join(self.project, 'pkg'))
+        self.path_a = self._write('a.py')
+        self.path_b = self._write('pkg', 'b.py')
+        self.files = {}
+        self.snapshot = project_snapshot.ProjectSnapshot(self.files)
+        self.snapshot.add_project(self.project, ('.py',),
+                                  [self.path_a, self.path_b])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, *names):
+        path = os.path.join(self.project, *names)
+        with open(path, 'w') as f:
+            f.write('x = 1\n')
+        return path
+
+    def test_project_for(self):
+        inner = os.path.join(self.project, 'pkg')
+        self.snapshot.add_project(inner, ('.py',))
+        self.assertEqual(self.snapshot.project_for(self.path_a),
+                         self.project)
+        self.assertEqual(self.snapshot.project_for(self.path_b), inner)
+        self.assertEqual(self.snapshot.project_for(self.project + 'x'),
+                         None)
+
+    def test_file_added_and_modified(self):
+        path_c = self._write('c.py')
+        self.assertTrue(self.snapshot.file_changed(1, path_c))
+        self.snapshot.file_changed(2, self.path_a)
+        updated, removed = self.snapshot.take_pending()
+        self.assertEqual(sorted(updated), sorted([path_c, self.path_a]))
+        self.assertEqual(removed, [])
+        self.assertEqual(sorted(self.files[self.project]),
+                         sorted([self.path_a, self.path_b, path_c]))
+        self.assertFalse(self.snapshot.has_pending())
+
+    def test_restore_pending(self):
+        path_c = self._write('c.py')
+        self.snapshot.file_changed(1, path_c)
+        self.snapshot.file_changed(2, self.path_a)
+        updated, removed = self.snapshot.take_pending()
+        os.remove(self.path_a)
+        self.snapshot.file_changed(3, self.path_a)
+        self.snapshot.restore_pending(updated)
+        self.assertEqual(self.snapshot.take_pending(),
+                         ([path_c], [self.path_a]))
+
+    def test_file_deleted(self):
+        os.remove(self.path_a)
+        self.snapshot.file_changed(3, self.path_a)
+        self.assertEqual(self.snapshot.take_pending(), ([], [self.path_a]))
+        self.assertEqual(self.files[self.project], [self.path_b])
+
+    def test_folder_moved_out(self):
+        os.rename(os.path.join(self.project, 'pkg'),
+                  os.path.join(self.folder, 'pkg'))
+        self.snapshot.file_changed(5, os.path.join(self.project, 'pkg'))
+        self.assertEqual(self.snapshot.take_pending(), ([], [self.path_b]))
+        self.assertEqual(self.files[self.project], [self.path_a])
+
+    def test_folder_moved_in(self):
+        folder = os.path.join(self.project, 'new')
+        os.makedirs(folder)
+        self._write('new', 'd.py')
+        self._write('new', 'notes.txt')
+        self.snapshot.file_changed(5, folder)
+        self.assertEqual(self.snapshot.take_pending(),
+                         ([os.path.join(folder, 'd.py')], []))
+
+    def test_ignored_changes(self):
+        self.snapshot.file_changed(1, self._write('notes.txt'))
+        os.makedirs(os.path.join(self.project, '.git'))
+        self.snapshot.file_changed(1, self._write('.git', 'hook.py'))
+        self.snapshot.file_changed(2, os.path.join(self.folder, 'out.py'))
+        self.assertFalse(self.snapshot.has_pending())
+
+    def test_remove_project(self):
+        self.snapshot.file_changed(2, self.path_a)
+        self.snapshot.remove_project(self.project)
+        self.assertFalse(self.snapshot.has_project(self.project))
+        self.assertFalse(self.snapshot.has_pending())
+        self.assertEqual(self.files, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from multiprocessing import Pool
+
+from ninja_ide.tools.locator import symbol_extractor
+
+
+SOURCE = '''
+import os.path
+from . import tools
+from ninja_ide.core import settings as s, file_manager
+VERSION = 1
+
+
+class Editor(object):
+
+    def __init__(self):
+        self.text = ''
+
+    def get_text(self):
+        def strip():
+            pass
+        return self.text
+'''
+
+
+class SymbolExtractorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'editor.py')
+        with open(self.path, 'w') as f:
+            f.write(SOURCE)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_extract_python_symbols(self):
+        path, mtime, results, imports = \
+            symbol_extractor.extract_python_symbols(self.path)
+        self.assertEqual(path, self.path)
+        self.assertEqual(mtime, int(os.stat(self.path).st_mtime))
+        self.assertEqual(results[0], ('@', 'editor.py', -1, ''))
+        self.assertEqual(sorted([result[:3] for result in results[1:]]),
+                         [('-', 'VERSION', 4), ('-', 'text', 10),
+                          ('<', 'Editor(object)', 7),
+                          ('>', '__init__()', 9), ('>', 'get_text()', 12),
+                          ('>', 'strip()', 13)])
+        previews = dict([(result[1], result[3]) for result in results])
+        self.assertEqual(previews['Editor(object)'],
+                         'class Editor(object):')
+        self.assertEqual(previews['text'], "        self.text = ''")
+        self.assertEqual(sorted(imports), sorted([
+            os.path.join('os', 'path'), self.folder,
+            os.path.join(self.folder, 'tools'),
+            os.path.join('ninja_ide', 'core'),
+            os.path.join('ninja_ide', 'core', 'settings'),
+            os.path.join('ninja_ide', 'core', 'file_manager')]))
+
+    def test_imported_files(self):
+        keys = [os.path.join('ninja_ide', 'core'),
+                os.path.join('core', 'settings'),
+                os.path.join(self.folder, 'tools')]
+        paths = [os.path.join('/ninja', 'ninja_ide', 'core', '__init__.py'),
+                 os.path.join('/ninja', 'ninja_ide', 'core', 'settings.py'),
+                 os.path.join('/ninja', 'ninja_ide', 'core', 'settings.ui'),
+                 os.path.join('/ninja', 'ninja_ide', 'mycore.py'),
+                 os.path.join(self.folder, 'tools.py'),
+                 os.path.join('/other', 'tools.py')]
+        self.assertEqual(symbol_extractor.imported_files(keys, paths),
+                         paths[:2] + paths[4:5])
+
+    def test_errors_returned(self):
+        path = os.path.join(self.folder, 'missing.py')
+        result = symbol_extractor.extract_python_symbols(path)
+        self.assertEqual(result[:2], (path, None))
+
+    def test_non_python_file(self):
+        path = os.path.join(self.folder, 'notes.txt')
+        with open(path, 'w') as f:
+            f.write('notes')
+        mtime, results, imports = symbol_extractor.extract_symbols(
+            path, None, False)
+        self.assertEqual(results, [('!', 'notes.txt', -1, '')])
+        self.assertEqual(imports, [])
+
+    def test_extract_in_pool(self):
+        pool = Pool(2)
+        try:
+            results = pool.map(symbol_extractor.extract_python_symbols,
+                               [self.path] * 3)
+        finally:
+            pool.terminate()
+            pool.join()
+        self.assertEqual(
+            results, [symbol_extractor.extract_python_symbols(self.path)] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of NINJA-IDE (http://ninja-ide.org).
+#
+# NINJA-IDE is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# any later version.
+#
+# NINJA-IDE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NINJA-IDE; If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ninja_ide.tools.locator import symbol_index
+
+
+class SymbolIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.index = symbol_index.SymbolIndex(
+            os.path.join(self.folder, 'locator.db'))
+        self.path_a = os.path.join('/project', 'a.py')
+        self.path_b = os.path.join('/project', 'pkg', 'b.py')
+        self.path_other = os.path.join('/other', 'c.py')
+        self.index.update_file(self.path_a, 10, [
+            ('@', 'a.py', -1, ''), ('<', 'Editor(QWidget)', 4, ''),
+            ('>', 'get_text(self, start=int)', 10, ''), ('-', 'text', 11, '')])
+        self.index.update_file(self.path_b, 20, [
+            ('@', 'b.py', -1, ''), ('>', 'text_editor()', 2, '')])
+        self.index.update_file(self.path_other, 30, [
+            ('@', 'c.py', -1, ''), ('-', 'text', 1, '')])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _names(self, **query):
+        return [row[1] for row in self.index.search(**query)]
+
+    def test_comparison(self):
+        self.assertEqual(symbol_index.comparison('Editor(QWidget)'),
+                         'editor')
+        self.assertEqual(symbol_index.comparison('text'), 'text')
+
+    def test_search_sorted_by_name(self):
+        self.assertEqual(self._names(),
+                         ['Editor(QWidget)', 'a.py', 'b.py', 'c.py',
+                          'get_text(self, start=int)', 'text', 'text',
+                          'text_editor()'])
+
+    def test_search_text_ignores_case_and_arguments(self):
+        self.assertEqual(self._names(text='EDIT'),
+                         ['Editor(QWidget)', 'text_editor()'])
+        self.assertEqual(self._names(text='widget'), [])
+
+    def test_search_by_kind_path_and_roots(self):
+        self.assertEqual(self._names(kinds=('-',)), ['text', 'text'])
+        self.assertEqual(self._names(kinds=('-',), roots=['/project']),
+                         ['text'])
+        self.assertEqual(self._names(path=self.path_b),
+                         ['b.py', 'text_editor()'])
+        self.assertEqual(self._names(roots=[]), [])
+
+    def test_search_by_name_and_prefix(self):
+        rows = self.index.search(name='text', roots=['/project'])
+        self.assertEqual(rows, [('-', 'text', self.path_a, 11)])
+        self.assertEqual(self._names(prefix='get'),
+                         ['get_text(self, start=int)'])
+
+    def test_pages(self):
+        self.assertEqual(self._names(offset=1, limit=2), ['a.py', 'b.py'])
+        self.assertEqual(self.index.count(text='text'), 4)
+
+    def test_update_replaces_the_symbols(self):
+        self.index.update_file(self.path_b, 21, [('@', 'b.py', -1, '')])
+        self.assertEqual(self._names(path=self.path_b), ['b.py'])
+        self.assertEqual(self.index.get_mtimes(['/project']),
+                         {self.path_a: 10, self.path_b: 21})
+
+    def test_remove_files(self):
+        self.index.remove_files([self.path_a])
+        self.assertEqual(self._names(roots=['/project']),
+                         ['b.py', 'text_editor()'])
+        self.assertEqual(sorted(self.index.get_mtimes()),
+                         sorted([self.path_b, self.path_other]))
+
+    def test_batch_written_on_commit(self):
+        self.index.begin()
+        self.index.update_file(self.path_other, 31, [('@', 'c.py', -1, '')])
+        self.assertEqual(self._names(path=self.path_other),
+                         ['c.py', 'text'])
+        self.index.commit()
+        self.assertEqual(self._names(path=self.path_other), ['c.py'])
+
+    def test_batch_committed_every_batch_size_files(self):
+        index = symbol_index.SymbolIndex(
+            os.path.join(self.folder, 'locator.db'), batch_size=2)
+        index.begin()
+        index.update_file(self.path_a, 11, [('@', 'a.py', -1, '')])
+        self.assertEqual(self._names(path=self.path_a),
+                         ['Editor(QWidget)', 'a.py',
+                          'get_text(self, start=int)', 'text'])
+        index.update_file(self.path_b, 21, [('@', 'b.py', -1, '')])
+        self.assertEqual(self._names(path=self.path_a), ['a.py'])
+        index.remove_files([self.path_other])
+        self.assertEqual(len(self.index.get_mtimes()), 3)
+        index.commit()
+        self.assertEqual(len(self.index.get_mtimes()), 2)
+
+    def test_write_ahead_log(self):
+        rows = self.index._read("PRAGMA journal_mode", [])
+        self.assertEqual(rows, [('wal',)])
+
+    def test_search_matches(self):
+        self.index.load_matcher()
+        self.assertEqual(self._names(text='te'),
+                         ['text', 'text', 'text_editor()',
+                          'get_text(self, start=int)'])
+        self.assertEqual(self._names(text='txed'), ['text_editor()'])
+        self.assertEqual(self._names(text='te', roots=['/project'],
+                                     kinds=('>',), offset=1),
+                         ['get_text(self, start=int)'])
+        self.assertEqual(self.index.count(text='tex'), 4)
+
+    def test_matcher_updated_with_the_writes(self):
+        self.index.load_matcher()
+        self.index.begin()
+        self.index.update_file(self.path_b, 21, [('<', 'TextEditor', 1, '')])
+        self.index.remove_files([self.path_other])
+        self.index.commit()
+        self.assertEqual(self._names(text='ted'), ['TextEditor'])
+        self.assertEqual(self._names(text='text'),
+                         ['text', 'TextEditor', 'get_text(self, start=int)'])
+
+    def test_old_pickled_table_dropped(self):
+        self.index._write(lambda cur: cur.execute(
+            "create table locator(path text, stat integer, data blob)"))
+        index = symbol_index.SymbolIndex(
+            os.path.join(self.folder, 'locator.db'))
+        tables = index._read("SELECT name FROM sqlite_master WHERE "
+                             "type='table'", [])
+        self.assertEqual(sorted([row[0] for row in tables]),
+                         ['files', 'imports', 'symbols'])
+
+    def test_older_schema_dropped(self):
+        self.index._write(lambda cur: cur.execute("PRAGMA user_version=1"))
+        index = symbol_index.SymbolIndex(
+            os.path.join(self.folder, 'locator.db'))
+        self.assertEqual(index.get_mtimes(), {})
+        self.assertEqual(index._read("PRAGMA user_version", []),
+                         [(symbol_index.SCHEMA_VERSION,)])
+
+    def test_definitions(self):
+        self.index.update_file(self.path_b, 21, [
+            ('@', 'b.py', -1, ''), ('>', 'get_text()', 3, 'def get_text():'),
+            ('>', 'get_texts()', 5, 'def get_texts():')])
+        rows = self.index.definitions('get_text', ('>', '<'))
+        self.assertEqual([row[2:] for row in rows],
+                         [(self.path_a, 10, ''),
+                          (self.path_b, 3, 'def get_text():')])
+        rows = self.index.definitions('text', ('-',), ['/project'])
+        self.assertEqual(rows, [('-', 'text', self.path_a, 11, '')])
+
+    def test_imports(self):
+        self.index.update_file(self.path_a, 11, [('@', 'a.py', -1, '')],
+                               ['pkg/b', 'os'])
+        self.assertEqual(self.index.get_imports([self.path_a]),
+                         set(['pkg/b', 'os']))
+        self.index.update_file(self.path_a, 12, [('@', 'a.py', -1, '')])
+        self.assertEqual(self.index.get_imports([self.path_a]), set())
+        self.index.update_file(self.path_a, 13, [('@', 'a.py', -1, '')],
+                               ['os'])
+        self.index.remove_files([self.path_a])
+        self.assertEqual(self.index.get_imports([self.path_a]), set())
+
+    def test_migrated_schema_kept(self):
+        self.index._write(lambda cur: cur.execute(
+            "CREATE TABLE old_files AS SELECT id, path, mtime FROM files"))
+        self.index._write(lambda cur: cur.execute("DROP TABLE files"))
+        self.index._write(lambda cur: cur.execute(
+            "ALTER TABLE old_files RENAME TO files"))
+        self.index._write(lambda cur: cur.execute("PRAGMA user_version=2"))
+        index = symbol_index.SymbolIndex(
+            os.path.join(self.folder, 'locator.db'))
+        self.assertEqual(len(index.get_mtimes()), 3)
+        seen = index._read("SELECT seen FROM files", [])
+        self.assertTrue(all([row[0] > 0 for row in seen]))
+
+    def _create_files(self, *names):
+        paths = []
+        for name in names:
+            path = os.path.join(self.folder, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('')
+            self.index.update_file(path, 1, [
+                ('@', name, -1, ''), ('-', 'value', 0, 'value = 1')])
+            paths.append(path)
+        return paths
+
+    def test_collect_missing_and_stale(self):
+        project = os.path.join(self.folder, 'project')
+        inside, recent, old = self._create_files(
+            os.path.join('project', 'a.py'), 'recent.py', 'old.py')
+        now = 1000000000
+        self.index.mark_seen([self.folder], now - 100)
+        self.index.mark_seen([project], now - 100 * 24 * 60 * 60)
+        self.index._write(lambda cur: cur.execute(
+            "UPDATE files SET seen=? WHERE path=?",
+            (now - 40 * 24 * 60 * 60, old)))
+        # The files of setUp don't exist
+        garbage = self.index.garbage([project], now)
+        self.assertEqual(len(garbage), 4)
+        self.assertTrue(old in garbage)
+        self.index.remove_files(garbage)
+        self.assertEqual(sorted(self.index.get_mtimes()),
+                         sorted([inside, recent]))
+
+    def test_collect_to_max_size(self):
+        paths = self._create_files(*['f%d.py' % i for i in range(100)])
+        now = int(time.time())
+        for position, path in enumerate(paths):
+            self.index._write(lambda cur: cur.execute(
+                "UPDATE files SET seen=? WHERE path=?",
+                (now - position, path)))
+        self.index.remove_files(self.index.garbage([], now))
+        self.index._max_size = self.index.size() // 2
+        garbage = self.index.garbage([], now)
+        self.assertTrue(0 < len(garbage) < 100)
+        self.index.remove_files(garbage)
+        mtimes = self.index.get_mtimes()
+        self.assertTrue(paths[0] in mtimes)
+        self.assertFalse(paths[-1] in mtimes)
+
+    def test_compact_with_enough_free_pages(self):
+        paths = [os.path.join(self.folder, 'f%d.py' % i) for i in range(100)]
+        for path in paths:
+            self.index.update_file(path, 1, [
+                ('-', 'value%d' % line, line, 'value = %r' % path)
+                for line in range(50)])
+        self.index.remove_files(paths[:10])
+        self.assertFalse(self.index.needs_compact())
+        self.index.remove_files(paths[10:])
+        self.assertTrue(self.index.needs_compact())
+        self.assertTrue(self.index.compact())
+        self.assertFalse(self.index.needs_compact())
+
+
+if __name__ == '__main__':
+    unittest.main()